@@ -1,31 +1,170 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, make_response, Response, stream_with_context, g
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
 import math
+import re
 import os
-import smtplib
+import base64
+import binascii
+import hashlib
+import json
+import threading
+import time
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart 
-from threading import Thread
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-import pytz
 import atexit
-from functools import wraps
+import signal
+import sys
+from functools import wraps, lru_cache
+from markupsafe import Markup
+from mailer import SettingsCache, build_message, open_smtp_connection, settings_from_config
+from dnsprobe import decode_records, encode_records
+from storage import configure_storage, database_ready, init_storage
+from outbox import outbox_counts, STATUS_FAILED, STATUS_HELD, STATUS_PENDING, STATUS_SENDING, STATUS_SENT
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from logconfig import configure_logging
+from domain_io import (EXPORT_MIMETYPES, detect_format, export_record, format_header, format_records,
+                       iter_rows, parse_batch_fields, parse_domain_row)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///domain.db'
+# 数据库地址和连接参数（DATABASE_URL，默认 sqlite:///domain.db，见 storage.py）
+configure_storage(app)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# 邮件投递：发送线程数（即SMTP会话池大小）和待发送队列长度
+app.config['MAIL_WORKERS'] = int(os.environ.get('MAIL_WORKERS', 2))
+app.config['MAIL_QUEUE_SIZE'] = int(os.environ.get('MAIL_QUEUE_SIZE', 1000))
+# SMTP配置快照的最长缓存秒数（本进程修改时立即生效，此值只影响其他进程的修改）
+app.config['SMTP_CONFIG_CACHE_TTL'] = int(os.environ.get('SMTP_CONFIG_CACHE_TTL', 300))
+# 域名列表每页数量和单页上限
+app.config['DOMAIN_PAGE_SIZE'] = 30
+app.config['DOMAIN_PAGE_SIZE_MAX'] = 100
+# 批量导入：每个事务插入的行数和返回的错误明细上限
+app.config['IMPORT_BATCH_SIZE'] = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+app.config['IMPORT_MAX_ERRORS'] = 1000
+# 批量操作单次最多的域名数
+app.config['BATCH_MAX_IDS'] = 1000
+# 导出时每次从数据库读取的行数
+app.config['EXPORT_WINDOW_SIZE'] = int(os.environ.get('EXPORT_WINDOW_SIZE', 1000))
+# 调度器主进程选举：多个进程共用一个数据库时只有持有租约的进程运行定时任务
+app.config['SCHEDULER_LEADER_ELECTION'] = os.environ.get('SCHEDULER_LEADER_ELECTION', 'true').lower() == 'true'
+app.config['SCHEDULER_LEASE_TTL'] = int(os.environ.get('SCHEDULER_LEASE_TTL', 15))
+app.config['SCHEDULER_LEASE_INTERVAL'] = int(os.environ.get('SCHEDULER_LEASE_INTERVAL', 5))
+# 提醒邮件发件箱：每批投递数、最多尝试次数、重试退避的初始/最大秒数、检查间隔秒数、已发送记录保留天数
+app.config['OUTBOX_BATCH_SIZE'] = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+app.config['OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+app.config['OUTBOX_RETRY_DELAY'] = int(os.environ.get('OUTBOX_RETRY_DELAY', 60))
+app.config['OUTBOX_RETRY_MAX_DELAY'] = int(os.environ.get('OUTBOX_RETRY_MAX_DELAY', 6 * 3600))
+app.config['OUTBOX_POLL_INTERVAL'] = int(os.environ.get('OUTBOX_POLL_INTERVAL', 10))
+app.config['OUTBOX_RETENTION_DAYS'] = int(os.environ.get('OUTBOX_RETENTION_DAYS', 30))
+# 提醒到期但未能发送（如SMTP未启用）时的重试间隔（秒）
+app.config['ALERT_RETRY_SECONDS'] = int(os.environ.get('ALERT_RETRY_SECONDS', 600))
+# RDAP注册信息自动刷新：RDAP_BASE_URL 设置后所有查询都发往该地址（用于本地测试）
+app.config['RDAP_REFRESH_ENABLED'] = os.environ.get('RDAP_REFRESH_ENABLED', 'true').lower() == 'true'
+app.config['RDAP_BOOTSTRAP_URL'] = os.environ.get('RDAP_BOOTSTRAP_URL') or None  # 为空时使用 IANA 的引导文件
+app.config['RDAP_BASE_URL'] = os.environ.get('RDAP_BASE_URL') or None
+app.config['RDAP_CONCURRENCY'] = int(os.environ.get('RDAP_CONCURRENCY', 20))
+app.config['RDAP_RATE_LIMIT'] = float(os.environ.get('RDAP_RATE_LIMIT', 5))
+app.config['RDAP_CACHE_TTL'] = int(os.environ.get('RDAP_CACHE_TTL', 6 * 3600))
+# DNS解析检查：DNS_RESOLVER 为 "host[:port]"，为空时使用系统DNS服务器
+app.config['DNS_PROBE_ENABLED'] = os.environ.get('DNS_PROBE_ENABLED', 'true').lower() == 'true'
+app.config['DNS_RESOLVER'] = os.environ.get('DNS_RESOLVER') or None
+app.config['DNS_PROBE_WORKERS'] = int(os.environ.get('DNS_PROBE_WORKERS', 32))
+app.config['DNS_PROBE_TIMEOUT'] = float(os.environ.get('DNS_PROBE_TIMEOUT', 2))
+app.config['DNS_PROBE_INTERVAL'] = int(os.environ.get('DNS_PROBE_INTERVAL', 60))  # 分钟
+# HTTPS证书检查：TLS_PROBE_ADDRESS 为 "host:port"，设置后所有域名都连接到该地址（用于本地测试）
+app.config['TLS_PROBE_ENABLED'] = os.environ.get('TLS_PROBE_ENABLED', 'true').lower() == 'true'
+app.config['TLS_PROBE_ADDRESS'] = os.environ.get('TLS_PROBE_ADDRESS') or None
+app.config['TLS_PROBE_WORKERS'] = int(os.environ.get('TLS_PROBE_WORKERS', 32))
+app.config['TLS_PROBE_TIMEOUT'] = float(os.environ.get('TLS_PROBE_TIMEOUT', 5))
+app.config['TLS_PROBE_INTERVAL'] = int(os.environ.get('TLS_PROBE_INTERVAL', 12))  # 小时
+# 运行指标：METRICS_TOKEN 设置后 /metrics 需要 "Authorization: Bearer <token>"
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN') or None
+# 日志：级别、格式（text 或 json）、每次检查最多记录完整异常的出错域名数
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'text')
+app.config['LOG_DOMAIN_ERROR_LIMIT'] = int(os.environ.get('LOG_DOMAIN_ERROR_LIMIT', 20))
+# 请求性能分析（默认关闭）：慢请求阈值（毫秒）、cProfile 结果目录、自动分析的请求比例、
+# 非管理员请求 cProfile 时需要的 X-Profile-Token
+app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+app.config['PROFILING_SLOW_MS'] = int(os.environ.get('PROFILING_SLOW_MS', 500))
+app.config['PROFILING_DIR'] = os.environ.get('PROFILING_DIR') or os.path.join(app.instance_path, 'profiles')
+app.config['PROFILING_SAMPLE_RATE'] = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+app.config['PROFILING_TOKEN'] = os.environ.get('PROFILING_TOKEN') or None
+# Web 进程是否同时运行定时任务（由单独的 worker 进程运行时设为 false）
+app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
 
-db = SQLAlchemy(app)
+# 数据库在 create_app 中绑定到应用（见 init_database_binding），导入本模块时不创建引擎
+db = SQLAlchemy()
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
+# 日志在 create_app 中配置（经过队列由后台线程写出，见 logconfig.py）
 logger = logging.getLogger(__name__)
 
+# 运行指标（进程内统计，由 /metrics 按 Prometheus 文本格式输出，见 metrics.py）
+metrics = Registry()
+HTTP_REQUESTS = metrics.counter('domain_monitor_http_requests_total', 'HTTP请求数',
+                                ['method', 'endpoint', 'status'])
+HTTP_LATENCY = metrics.histogram('domain_monitor_http_request_duration_seconds', 'HTTP请求处理耗时（秒）',
+                                 ['endpoint'])
+CHECK_RUNS = metrics.counter('domain_monitor_check_runs_total', '域名到期检查次数（按结果）', ['outcome'])
+CHECK_DURATION = metrics.histogram('domain_monitor_check_duration_seconds', '域名到期检查耗时（秒）')
+CHECK_DOMAINS = metrics.counter('domain_monitor_check_domains_scanned_total', '到期检查扫描的域名数')
+CHECK_ERRORS = metrics.counter('domain_monitor_check_domain_errors_total', '到期检查中处理出错的域名数')
+ALERTS = metrics.counter('domain_monitor_alerts_total', '安排发送的提醒数', ['kind', 'level'])
+OUTBOX_ENQUEUED = metrics.counter('domain_monitor_outbox_enqueued_total', '写入发件箱的邮件数', ['kind'])
+EMAILS = metrics.counter('domain_monitor_emails_total', '邮件发送次数（按结果）', ['outcome'])
+EMAIL_DURATION = metrics.histogram('domain_monitor_email_send_duration_seconds', '单封邮件发送耗时（秒）')
+MAIL_QUEUE_DEPTH = metrics.gauge('domain_monitor_mail_queue_depth', '邮件发送队列中等待的邮件数')
+OUTBOX_MESSAGES = metrics.gauge('domain_monitor_outbox_messages', '发件箱中各状态的邮件数', ['status'])
+
+def observe_email(ok, elapsed):
+    EMAILS.labels('sent' if ok else 'failed').inc()
+    EMAIL_DURATION.observe(elapsed)
+
+def record_check_run(func):
+    """统计到期检查的次数、耗时、扫描的域名数和安排的提醒数"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            summary = func(*args, **kwargs)
+        except Exception:
+            CHECK_RUNS.labels('error').inc()
+            raise
+        finally:
+            CHECK_DURATION.observe(time.perf_counter() - start)
+        if summary['skipped']:
+            outcome = 'skipped'
+        elif summary['errors']:
+            outcome = 'partial'
+        else:
+            outcome = 'ok'
+        CHECK_RUNS.labels(outcome).inc()
+        CHECK_DOMAINS.inc(summary['candidates'])
+        CHECK_ERRORS.inc(summary['errors'])
+        ALERTS.labels('domain', 'danger').inc(summary['danger'])
+        ALERTS.labels('domain', 'warning').inc(summary['warning'])
+        return summary
+    return wrapper
+
+# 请求指标钩子（web 模式下由 create_app 注册）
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # 按路由端点而不是URL统计，避免域名ID等路径参数产生大量标签
+        endpoint = request.endpoint or 'unmatched'
+        HTTP_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+    return response
+
+# 请求性能分析：SQL次数/耗时、Server-Timing 头、慢请求日志和按需 cProfile（见 profiling.py）
+request_profiler = None
+
 # 登录验证装饰器
 def login_required(f):
     @wraps(f)
@@ -52,7 +191,7 @@ class Domain(db.Model):
     name = db.Column(db.String(255), nullable=False)
     registrar = db.Column(db.String(255))
     registration_date = db.Column(db.DateTime)
-    expiration_date = db.Column(db.DateTime, nullable=False)
+    expiration_date = db.Column(db.DateTime, nullable=False, index=True)
     renewal_period = db.Column(db.String(50))
     renewal_price = db.Column(db.String(255))
     renewal_url = db.Column(db.String(500))
@@ -68,10 +207,87 @@ class Domain(db.Model):
     last_checked = db.Column(db.DateTime, default=datetime.utcnow)
     # 是否需要续期（永久域名不需要续期）
     needs_renewal = db.Column(db.Boolean, default=True)
+    # 下一次需要发送提醒的时间（UTC），为空表示不会再有提醒
+    next_alert_at = db.Column(db.DateTime, index=True)
+    # 进入警告/危险状态的时间（UTC），用于在数据库中按状态筛选，永久域名为空
+    warning_at = db.Column(db.DateTime)
+    danger_at = db.Column(db.DateTime)
+    # 最近一次DNS解析检查：状态、压缩保存的A/AAAA/NS记录（JSON）、检查时间和NS最近一次变化的时间
+    dns_status = db.Column(db.String(16))
+    dns_records = db.Column(db.String(2000))
+    dns_checked_at = db.Column(db.DateTime)
+    dns_ns_changed_at = db.Column(db.DateTime)
+    # HTTPS证书：叶子证书到期时间（UTC）、检查时间、最近一次检查的错误和证书提醒发送状态
+    tls_expires_at = db.Column(db.DateTime)
+    tls_checked_at = db.Column(db.DateTime)
+    tls_error = db.Column(db.String(255))
+    tls_warning_sent = db.Column(db.Boolean, default=False)
+    tls_danger_sent = db.Column(db.Boolean, default=False)
+    
+    # 仪表盘按用户分页，按到期日期排序
+    __table_args__ = (
+        db.Index('ix_domain_user_expiration', 'user_id', 'expiration_date', 'id'),
+    )
     
     def __repr__(self):
         return f'<Domain {self.name}>'
     
+    def next_alert_time(self, warning_sent=None, danger_sent=None):
+        """计算下一次提醒到期的时间
+        
+        提醒状态只会在 days_remaining() 跨过阈值时变化
+        
+        Args:
+            warning_sent / danger_sent: 覆盖当前的发送标志（用于计算发送提醒后的状态）
+        """
+        warning_sent = self.warning_sent if warning_sent is None else warning_sent
+        danger_sent = self.danger_sent if danger_sent is None else danger_sent
+        danger, warning = self._thresholds()
+        return Domain.alert_times(self.expiration_date, self.needs_renewal, warning, danger,
+                                  warning_sent, danger_sent)[0]
+    
+    def refresh_alert_times(self):
+        """域名信息或提醒状态变化后，重新计算 next_alert_at、warning_at 和 danger_at"""
+        danger, warning = self._thresholds()
+        self.next_alert_at, self.warning_at, self.danger_at = Domain.alert_times(
+            self.expiration_date, self.needs_renewal, warning, danger, self.warning_sent, self.danger_sent)
+    
+    @staticmethod
+    def alert_times(expiration_date, needs_renewal, warning_threshold, danger_threshold,
+                    warning_sent=False, danger_sent=False):
+        """按字段值计算 (next_alert_at, warning_at, danger_at)，批量写入时无需构造ORM对象
+        
+        永久域名三者都为空；危险提醒已发送后不再有下一次提醒
+        """
+        if needs_renewal is False or not expiration_date:
+            return None, None, None
+        # days_remaining() <= 阈值 等价于 当前时间 > 到期时间 - (阈值 + 1) 天
+        change_time = lambda threshold: expiration_date - timedelta(days=threshold + 1) + timedelta(seconds=1)
+        if danger_sent:
+            next_alert_at = None
+        else:
+            next_alert_at = change_time(danger_threshold if warning_sent else max(warning_threshold, danger_threshold))
+        return next_alert_at, change_time(warning_threshold), change_time(danger_threshold)
+    
+    def alert_level(self, days_remaining):
+        """按域名的警告/危险阈值判断提醒级别，域名到期和证书到期共用
+        
+        Returns:
+            str: 'danger'、'warning' 或 None
+        """
+        danger, warning = self._thresholds()
+        if days_remaining <= danger:
+            return 'danger'
+        if days_remaining <= warning:
+            return 'warning'
+        return None
+    
+    def _thresholds(self):
+        # 新建对象在写入数据库前还没有应用列默认值
+        danger = self.danger_threshold if self.danger_threshold is not None else 7
+        warning = self.warning_threshold if self.warning_threshold is not None else 30
+        return danger, warning
+    
     def days_remaining(self):
         if not self.needs_renewal:
             # 永久域名返回一个很大的数字
@@ -102,6 +318,94 @@ class Domain(db.Model):
                 return round((remaining_days / total_days) * 100, 1)
         return 0
 
+# 域名只读视图（页面渲染用）
+class DomainView:
+    """每个请求为每个域名构建一次的只读视图
+    
+    剩余天数、状态和进度用同一个请求时间一次算好，
+    模板中多次读取时不再重复调用 days_remaining() 和 datetime.utcnow()
+    """
+    __slots__ = (
+        'id', 'name', 'registrar', 'registration_date', 'expiration_date',
+        'renewal_period', 'renewal_price', 'renewal_url', 'currency',
+        'warning_threshold', 'danger_threshold', 'needs_renewal',
+        'days_remaining', 'status', 'status_label', 'progress_percentage',
+        'dns_status', 'dns_label', 'dns_level', 'dns_title', 'dns_ns_changed',
+        'tls_expires_at', 'tls_days_remaining', 'tls_status', 'tls_error'
+    )
+    
+    STATUS_LABELS = {'info': '永久', 'success': '正常', 'warning': '警告', 'danger': '危险'}
+    # DNS检查状态 -> (标签, 徽章颜色)
+    DNS_LABELS = {
+        'ok': ('解析正常', 'success'),
+        'nxdomain': ('域名不存在', 'danger'),
+        'no_address': ('无解析记录', 'warning'),
+        'timeout': ('解析超时', 'warning'),
+        'error': ('解析失败', 'warning'),
+    }
+    # NS记录变化后在页面上提示的时长
+    NS_CHANGE_NOTICE = timedelta(days=7)
+    
+    def __init__(self, domain, now):
+        setattr_ = object.__setattr__
+        for field in ('id', 'name', 'registrar', 'registration_date', 'expiration_date',
+                      'renewal_period', 'renewal_price', 'renewal_url', 'currency',
+                      'warning_threshold', 'danger_threshold', 'needs_renewal'):
+            setattr_(self, field, getattr(domain, field))
+        
+        expiration_date = domain.expiration_date
+        if not domain.needs_renewal:
+            days = 999999
+            status = 'info'
+        else:
+            days = max(0, (expiration_date - now).days) if expiration_date else 0
+            if days <= domain.danger_threshold:
+                status = 'danger'
+            elif days <= domain.warning_threshold:
+                status = 'warning'
+            else:
+                status = 'success'
+        
+        progress = 0
+        if domain.renewal_date and expiration_date:
+            total_days = (expiration_date - domain.renewal_date).days
+            if total_days > 0:
+                progress = round((days / total_days) * 100, 1)
+        
+        setattr_(self, 'days_remaining', days)
+        setattr_(self, 'status', status)
+        setattr_(self, 'status_label', self.STATUS_LABELS[status])
+        setattr_(self, 'progress_percentage', progress)
+        
+        dns_label, dns_level, dns_title = None, None, None
+        if domain.dns_status:
+            dns_label, dns_level = self.DNS_LABELS.get(domain.dns_status, ('解析失败', 'warning'))
+            records = decode_records(domain.dns_records)
+            dns_title = '\n'.join(f"{key}: {', '.join(values) or '无'}" for key, values in records.items())
+        setattr_(self, 'dns_status', domain.dns_status)
+        setattr_(self, 'dns_label', dns_label)
+        setattr_(self, 'dns_level', dns_level)
+        setattr_(self, 'dns_title', dns_title)
+        setattr_(self, 'dns_ns_changed', bool(
+            domain.dns_ns_changed_at and now - domain.dns_ns_changed_at < self.NS_CHANGE_NOTICE))
+        
+        tls_days, tls_status = None, None
+        if domain.tls_expires_at:
+            tls_days = max(0, (domain.tls_expires_at - now).days)
+            tls_status = domain.alert_level(tls_days) or 'success'
+        setattr_(self, 'tls_expires_at', domain.tls_expires_at)
+        setattr_(self, 'tls_days_remaining', tls_days)
+        setattr_(self, 'tls_status', tls_status)
+        setattr_(self, 'tls_error', domain.tls_error)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('DomainView 是只读的')
+
+def build_domain_views(domains, now=None):
+    """用同一个时间为一组域名构建只读视图"""
+    now = now or datetime.utcnow()
+    return [DomainView(domain, now) for domain in domains]
+
 # SMTP配置模型
 class SMTPConfig(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -113,10 +417,63 @@ class SMTPConfig(db.Model):
     mail_default_sender = db.Column(db.String(255), nullable=False)
     admin_email = db.Column(db.String(255), nullable=False)
     enabled = db.Column(db.Boolean, nullable=False, default=False)
+    # 汇总模式：每次检查的所有提醒合并为一封邮件
+    digest_mode = db.Column(db.Boolean, nullable=False, default=False)
     
     def __repr__(self):
         return f'<SMTPConfig {self.mail_server}>'
 
+# 提醒邮件发件箱（与提醒标志在同一事务中写入，由 get_outbox_dispatcher() 投递，见 outbox.py）
+class AlertOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # 提醒键（见 alert_key）：同一条提醒在投递完成前只写入一次
+    alert_key = db.Column(db.String(255), nullable=False, index=True)
+    # 幂等键：每封邮件唯一，重试时使用相同的 Message-ID；重置发送状态后的再次提醒在提醒键后加时间戳
+    idempotency_key = db.Column(db.String(255), nullable=False, unique=True)
+    kind = db.Column(db.String(20), nullable=False)  # domain / certificate / digest / digest_part
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(500), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default=STATUS_PENDING)  # pending / sending / sent / failed / held
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32))
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        # 投递器按状态和下次尝试时间取件
+        db.Index('ix_alert_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
+# 调度器主进程租约（每个租约名称一行，见 leader.py）
+class SchedulerLease(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, nullable=False)
+    acquired_at = db.Column(db.DateTime, nullable=False)
+
+# 每个用户的域名状态汇总（增删改时按增量维护，见 DomainSummaryDelta）
+class DomainSummary(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    danger_count = db.Column(db.Integer, nullable=False, default=0)
+    warning_count = db.Column(db.Integer, nullable=False, default=0)
+    healthy_count = db.Column(db.Integer, nullable=False, default=0)
+    permanent_count = db.Column(db.Integer, nullable=False, default=0)
+    # 最早到期（尚未到期）的需续期域名的到期时间
+    next_expiration = db.Column(db.DateTime)
+    # 计数的有效期：最早有域名跨过阈值或到期的时间，之后读取时重新统计；为空表示不会变化
+    valid_until = db.Column(db.DateTime)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+# 数据版本号（每种数据一行，见 bump_domain_data_version）：所有进程共享，用作首页缓存的键
+class DataVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
 # 初始化SMTP配置
 def init_smtp_config():
     with app.app_context():
@@ -129,12 +486,49 @@ def init_smtp_config():
                 mail_password='',
                 mail_default_sender='',
                 admin_email='',
-                enabled=False
+                enabled=False,
+                digest_mode=False
             )
             db.session.add(default_config)
             db.session.commit()
+            smtp_settings.invalidate()
             print("默认SMTP配置已创建")
 
+# 邮件警告级别对应的样式和文案
+EMAIL_ALERT_LEVELS = {
+    'danger': {
+        'primary_color': '#dc3545',  # 红色
+        'title': '【紧急】域名过期提醒',
+        'action_text': '请立即续费',
+        'icon': '⚠️',
+        'label': '危险'
+    },
+    'warning': {
+        'primary_color': '#ffc107',  # 黄色
+        'title': '【提醒】域名即将过期',
+        'action_text': '请考虑续费',
+        'icon': 'ℹ️',
+        'label': '警告'
+    }
+}
+
+# 邮件模板只编译一次
+@lru_cache(maxsize=None)
+def get_email_template(name):
+    return app.jinja_env.get_template(f'email/{name}.html')
+
+# 邮件头部（样式和标题栏）只与邮件类型和警告级别有关，预渲染后缓存
+@lru_cache(maxsize=None)
+def render_email_head(kind, title, primary_color, icon=''):
+    return Markup(get_email_template('head').render(
+        kind=kind, title=title, primary_color=primary_color, icon=icon
+    ))
+
+# 邮件页脚只随邮件类型和发送时间变化，同一分钟内发送的邮件共用
+@lru_cache(maxsize=16)
+def render_email_footer(kind, current_date):
+    return Markup(get_email_template('footer').render(kind=kind, current_date=current_date))
+
 # 创建美化的邮件模板
 def create_email_template(domain, days_remaining, alert_level):
     """创建美化的邮件模板
@@ -147,406 +541,1232 @@ def create_email_template(domain, days_remaining, alert_level):
     Returns:
         str: 美化后的HTML邮件内容
     """
+    level = EMAIL_ALERT_LEVELS[alert_level]
+    return get_email_template('alert').render(
+        head=render_email_head('alert', level['title'], level['primary_color'], level['icon']),
+        footer=render_email_footer('alert', datetime.now().strftime('%Y年%m月%d日 %H:%M')),
+        domain=domain,
+        days_remaining=days_remaining,
+        action_text=level['action_text']
+    )
+
+# 证书提醒邮件的标题和说明（颜色沿用 EMAIL_ALERT_LEVELS）
+EMAIL_CERTIFICATE_TITLES = {
+    'danger': ('【紧急】HTTPS证书过期提醒', '请立即更新证书'),
+    'warning': ('【提醒】HTTPS证书即将过期', '请及时更新证书')
+}
+
+# 创建证书到期提醒邮件模板
+def create_certificate_email_template(domain, days_remaining, alert_level):
+    """创建HTTPS证书到期提醒邮件
     
-    # 根据警告级别设置颜色和标题
-    if alert_level == 'danger':
-        primary_color = "#dc3545"  # 红色
-        title = "【紧急】域名过期提醒"
-        urgency_text = "即将过期"
-        action_text = "请立即续费"
-        icon = "⚠️"
-    else:
-        primary_color = "#ffc107"  # 黄色
-        title = "【提醒】域名即将过期"
-        urgency_text = "即将过期"
-        action_text = "请考虑续费"
-        icon = "ℹ️"
-    
-    # 格式化日期
-    expiration_date = domain.expiration_date.strftime('%Y年%m月%d日')
-    renewal_date = domain.renewal_date.strftime('%Y年%m月%d日') if domain.renewal_date else "未知"
-    current_date = datetime.now().strftime('%Y年%m月%d日 %H:%M')
-    
-    # 创建续费链接
-    renewal_link = domain.renewal_url or "#"
-    renewal_text = "立即续费" if domain.renewal_url else "暂无续费链接"
-    
-    html_template = f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            margin: 0;
-            padding: 0;
-            background-color: #f6f6f6;
-        }}
-        .container {{
-            max-width: 600px;
-            margin: 0 auto;
-            background-color: #ffffff;
-            border-radius: 8px;
-            overflow: hidden;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-        }}
-        .header {{
-            background: linear-gradient(135deg, {primary_color}, #ffffff);
-            color: white;
-            padding: 30px 20px;
-            text-align: center;
-        }}
-        .header h1 {{
-            margin: 0;
-            font-size: 24px;
-            font-weight: 600;
-        }}
-        .content {{
-            padding: 30px;
-        }}
-        .domain-info {{
-            background-color: #f8f9fa;
-            border-left: 4px solid {primary_color};
-            padding: 20px;
-            margin: 20px 0;
-            border-radius: 4px;
-        }}
-        .domain-name {{
-            font-size: 22px;
-            font-weight: bold;
-            color: {primary_color};
-            margin-bottom: 10px;
-        }}
-        .days-remaining {{
-            font-size: 36px;
-            font-weight: bold;
-            color: {primary_color};
-            text-align: center;
-            margin: 20px 0;
-        }}
-        .details {{
-            display: flex;
-            justify-content: space-between;
-            margin: 20px 0;
-            flex-wrap: wrap;
-        }}
-        .detail-item {{
-            flex: 1;
-            min-width: 200px;
-            margin: 10px;
-            padding: 15px;
-            background-color: #f8f9fa;
-            border-radius: 6px;
-            text-align: center;
-        }}
-        .detail-label {{
-            font-size: 14px;
-            color: #666;
-            margin-bottom: 5px;
-        }}
-        .detail-value {{
-            font-size: 16px;
-            font-weight: bold;
-        }}
-        .action-button {{
-            display: inline-block;
-            background-color: {primary_color};
-            color: white;
-            padding: 12px 30px;
-            text-decoration: none;
-            border-radius: 6px;
-            font-weight: bold;
-            margin: 20px 0;
-            text-align: center;
-        }}
-        .footer {{
-            background-color: #f8f9fa;
-            padding: 20px;
-            text-align: center;
-            font-size: 12px;
-            color: #666;
-            border-top: 1px solid #e9ecef;
-        }}
-        .alert-icon {{
-            font-size: 48px;
-            margin-bottom: 20px;
-        }}
-        @media (max-width: 600px) {{
-            .details {{
-                flex-direction: column;
-            }}
-            .detail-item {{
-                min-width: 100%;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div class="alert-icon">{icon}</div>
-            <h1>{title}</h1>
-        </div>
-        
-        <div class="content">
-            <p>尊敬的用户，您好：</p>
-            <p>系统检测到您监控的域名<strong>{domain.name}</strong>{urgency_text}，为避免服务中断，{action_text}。</p>
-            
-            <div class="domain-info">
-                <div class="domain-name">{domain.name}</div>
-                <div class="days-remaining">剩余 {days_remaining} 天</div>
-            </div>
-            
-            <div class="details">
-                <div class="detail-item">
-                    <div class="detail-label">注册商</div>
-                    <div class="detail-value">{domain.registrar or '未知'}</div>
-                </div>
-                <div class="detail-item">
-                    <div class="detail-label">续费日期</div>
-                    <div class="detail-value">{renewal_date}</div>
-                </div>
-                <div class="detail-item">
-                    <div class="detail-label">到期日期</div>
-                    <div class="detail-value">{expiration_date}</div>
-                </div>
-            </div>
-            
-            {f'<div style="text-align: center;"><a href="{renewal_link}" class="action-button">{renewal_text}</a></div>' if renewal_link != "#" else ''}
-            
-            <p style="color: #666; font-size: 14px; margin-top: 30px;">
-                <strong>温馨提示：</strong><br>
-                域名过期后将无法正常访问，可能导致业务中断、数据丢失和品牌损失。<br>
-                建议您提前完成续费操作，确保业务连续性。
-            </p>
-        </div>
-        
-        <div class="footer">
-            <p>此邮件由 <strong>域名监控系统</strong> 自动发送</p>
-            <p>发送时间：{current_date}</p>
-            <p>如果您有任何疑问，请查看系统设置或联系管理员</p>
-            <p style="margin-top: 10px; font-size: 10px; color: #999;">
-                此为系统自动发送的邮件，请勿直接回复
-            </p>
-        </div>
-    </div>
-</body>
-</html>
-"""
-    return html_template
+    Args:
+        domain: 域名对象（使用 tls_expires_at）
+        days_remaining: 证书剩余天数
+        alert_level: 警告级别 ('danger' 或 'warning')
+    """
+    level = EMAIL_ALERT_LEVELS[alert_level]
+    title, action_text = EMAIL_CERTIFICATE_TITLES[alert_level]
+    return get_email_template('certificate').render(
+        head=render_email_head('alert', title, level['primary_color'], level['icon']),
+        footer=render_email_footer('alert', datetime.now().strftime('%Y年%m月%d日 %H:%M')),
+        domain=domain,
+        days_remaining=days_remaining,
+        action_text=action_text
+    )
+
+# 创建汇总提醒邮件模板
+def create_digest_email_template(alerts):
+    """创建汇总提醒邮件模板
+    
+    Args:
+        alerts: (域名对象, 剩余天数, 警告级别) 列表
+    
+    Returns:
+        str: 按危险程度和剩余天数排序的HTML表格邮件
+    """
+    level_order = {'danger': 0, 'warning': 1}
+    alerts = sorted(alerts, key=lambda item: (level_order[item[2]], item[1], item[0].name))
+    danger_count = sum(1 for _, _, level in alerts if level == 'danger')
+    header_level = EMAIL_ALERT_LEVELS['danger' if danger_count else 'warning']
+    return get_email_template('digest').render(
+        head=render_email_head('digest', '域名到期汇总提醒', header_level['primary_color']),
+        footer=render_email_footer('digest', datetime.now().strftime('%Y年%m月%d日 %H:%M')),
+        alerts=alerts,
+        levels=EMAIL_ALERT_LEVELS,
+        danger_count=danger_count,
+        warning_count=len(alerts) - danger_count
+    )
+
+# 创建SMTP测试邮件模板
+def create_test_email_template(config, title, intro, outro, show_next_steps=False):
+    """创建SMTP测试邮件模板"""
+    current_date = datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')
+    return get_email_template('test').render(
+        head=render_email_head('test', title, '#007bff', '✅'),
+        footer=render_email_footer('test', current_date),
+        config=config,
+        intro=intro,
+        outro=outro,
+        show_next_steps=show_next_steps,
+        current_date=current_date
+    )
+
+# SMTP配置加载（只在缓存未命中时查询数据库）
+def load_smtp_settings():
+    with app.app_context():
+        config = SMTPConfig.query.first()
+        return settings_from_config(config) if config else None
+
+# SMTP配置快照：检查任务和发送线程都从这里读取，update_smtp_config 提交后替换
+smtp_settings = SettingsCache(load_smtp_settings, ttl=app.config['SMTP_CONFIG_CACHE_TTL'])
+
+# 进程内共享的投递器和查询器在第一次使用时才创建：只导入模块、初始化数据库或处理请求的进程
+# 不创建用不到的对象，也不因此提前建立数据库引擎
+def lazy_instance(factory):
+    """把无参的构造函数包装为只构造一次的访问函数（线程安全），已创建的对象在 .instance 中"""
+    lock = threading.Lock()
+
+    @wraps(factory)
+    def get():
+        if get.instance is None:
+            with lock:
+                if get.instance is None:
+                    get.instance = factory()
+        return get.instance
+
+    get.instance = None
+    return get
+
+# 常驻邮件投递器：固定数量的发送线程复用已登录的SMTP会话
+@lazy_instance
+def get_mail_dispatcher():
+    from mailer import MailDispatcher
+
+    return MailDispatcher(
+        smtp_settings.get,
+        workers=app.config['MAIL_WORKERS'],
+        queue_size=app.config['MAIL_QUEUE_SIZE'],
+        observer=observe_email
+    )
+
+MAIL_QUEUE_DEPTH.set_function(
+    lambda: get_mail_dispatcher.instance.queue.qsize() if get_mail_dispatcher.instance else 0)
+
+# 发件箱投递器：只在调度器主进程（或命令行检查脚本）中运行投递线程
+@lazy_instance
+def get_outbox_dispatcher():
+    from outbox import OutboxDispatcher
+
+    with app.app_context():
+        return OutboxDispatcher(
+            db.engine, AlertOutbox.__table__, get_mail_dispatcher(),
+            batch_size=app.config['OUTBOX_BATCH_SIZE'],
+            max_attempts=app.config['OUTBOX_MAX_ATTEMPTS'],
+            base_delay=app.config['OUTBOX_RETRY_DELAY'],
+            max_delay=app.config['OUTBOX_RETRY_MAX_DELAY'],
+            poll_interval=app.config['OUTBOX_POLL_INTERVAL']
+        )
+
+def wake_outbox_dispatcher():
+    """通知本进程的发件箱投递线程有新邮件（投递器还没有创建时本进程不投递，不需要通知）"""
+    if get_outbox_dispatcher.instance is not None:
+        get_outbox_dispatcher.instance.wake()
+
+def outbox_message_counts():
+    counts = {(status,): 0 for status in (STATUS_PENDING, STATUS_SENDING, STATUS_SENT, STATUS_FAILED, STATUS_HELD)}
+    # 直接查询发件箱表：只处理请求的进程抓取指标时不创建投递器
+    with app.app_context():
+        rows = outbox_counts(db.engine, AlertOutbox.__table__)
+    counts.update({(status,): count for status, count in rows.items()})
+    return counts
+
+OUTBOX_MESSAGES.set_function(outbox_message_counts)
+
+def alert_key(kind, domain_id, level, expires_at):
+    """提醒键：同一个域名在同一个到期日期的同一级别提醒只有一条"""
+    return f"{kind}:{domain_id}:{level}:{expires_at.strftime('%Y-%m-%d')}"
+
+def enqueue_alerts(messages, recipient, chunk_size=500):
+    """把提醒邮件写入发件箱（只添加到会话，由调用方与提醒标志一起提交）
+    
+    同一提醒键的上一封邮件还在等待投递时不再重复写入；已发送或已失败的（例如重置邮件发送状态后再次提醒）
+    作为新邮件写入
+    
+    Args:
+        messages: (提醒键, 类型, 主题, 正文) 列表
+    
+    Returns:
+        int: 写入的邮件数
+    """
+    keys = [message[0] for message in messages]
+    latest = {}
+    for start in range(0, len(keys), chunk_size):
+        rows = db.session.query(AlertOutbox.alert_key, AlertOutbox.status).filter(
+            AlertOutbox.alert_key.in_(keys[start:start + chunk_size])
+        ).order_by(AlertOutbox.id)
+        # 按ID顺序覆盖，留下每个提醒键最新一封邮件的状态
+        latest.update(rows.all())
+    now = datetime.utcnow()
+    queued = 0
+    for key, kind, subject, body in messages:
+        status = latest.get(key)
+        if status in (STATUS_PENDING, STATUS_SENDING):
+            continue
+        idempotency_key = key if status is None else f"{key}:{now.strftime('%Y%m%d%H%M%S%f')}"
+        db.session.add(AlertOutbox(
+            alert_key=key, idempotency_key=idempotency_key, kind=kind, recipient=recipient,
+            subject=subject, body=body, status=STATUS_PENDING, attempts=0, next_attempt_at=now, created_at=now
+        ))
+        OUTBOX_ENQUEUED.labels(kind).inc()
+        queued += 1
+    return queued
 
 # 邮件发送函数
 def send_email_async(subject, recipient, body):
-    """异步发送邮件"""
-    def send_email(app, subject, recipient, body):
-        # 在新线程中创建应用上下文
-        with app.app_context():
-            try:
-                config = SMTPConfig.query.first()
-                if not config or not config.enabled:
-                    print("❌ SMTP未启用或未配置")
-                    return False
-                
-                print(f"📧 开始发送邮件到: {recipient}")
-                print(f"📨 主题: {subject}")
-                print(f"🔧 使用服务器: {config.mail_server}:{config.mail_port}")
-                print(f"👤 用户名: {config.mail_username}")
-                
-                msg = MIMEMultipart()
-                msg['From'] = config.mail_default_sender
-                msg['To'] = recipient
-                msg['Subject'] = subject
-                
-                msg.attach(MIMEText(body, 'html'))
-                
-                # 根据端口选择连接方式
-                if config.mail_port == 465:
-                    # 端口465使用SSL连接
-                    print(f"🔐 使用SSL连接 (端口465)")
-                    server = smtplib.SMTP_SSL(config.mail_server, config.mail_port)
-                else:
-                    # 其他端口使用普通连接，可能需要TLS
-                    print(f"🔐 使用普通连接，TLS: {config.mail_use_tls}")
-                    server = smtplib.SMTP(config.mail_server, config.mail_port)
-                    if config.mail_use_tls:
-                        server.starttls()
-                        print("🔐 TLS已启用")
-                
-                print("🔑 正在登录...")
-                server.login(config.mail_username, config.mail_password)
-                print("✅ 登录成功")
-                
-                print("📤 正在发送邮件...")
-                server.send_message(msg)
-                server.quit()
-                print(f"✅ 邮件已成功发送至 {recipient}")
-                return True
-            except Exception as e:
-                print(f"❌ 发送邮件失败: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return False
-    
-    # 在新线程中发送邮件，避免阻塞主程序
-    # 传递app实例和其他参数
-    thread = Thread(target=send_email, args=(app, subject, recipient, body))
-    thread.start()
-    print(f"🧵 邮件发送任务已在后台线程启动")
+    """异步发送邮件（放入投递队列，由后台发送线程发送）"""
+    queued = get_mail_dispatcher().submit(subject, recipient, body)
+    if queued and logger.isEnabledFor(logging.DEBUG):
+        logger.debug('邮件已加入发送队列', extra={'recipient': recipient, 'subject': subject})
+    return queued
 
 # 测试邮件发送函数
-def send_test_email(config, subject, recipient, body):
+def send_test_email(settings, subject, recipient, body):
     """同步发送测试邮件"""
+    start = time.perf_counter()
+    fields = {'recipient': recipient, 'smtp_server': f'{settings.mail_server}:{settings.mail_port}'}
     try:
-        msg = MIMEMultipart()
-        msg['From'] = config.mail_default_sender
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'html'))
-        
-        print(f"🔧 测试邮件 - 使用服务器: {config.mail_server}:{config.mail_port}")
-        
-        # 根据端口选择连接方式
-        if config.mail_port == 465:
-            # 端口465使用SSL连接
-            print(f"🔐 测试邮件 - 使用SSL连接 (端口465)")
-            server = smtplib.SMTP_SSL(config.mail_server, config.mail_port)
-        else:
-            # 其他端口使用普通连接，可能需要TLS
-            print(f"🔐 测试邮件 - 使用普通连接，TLS: {config.mail_use_tls}")
-            server = smtplib.SMTP(config.mail_server, config.mail_port)
-            if config.mail_use_tls:
-                server.starttls()
-                print("🔐 测试邮件 - TLS已启用")
-        
-        print("🔑 测试邮件 - 正在登录...")
-        server.login(config.mail_username, config.mail_password)
-        print("✅ 测试邮件 - 登录成功")
-        
-        print("📤 测试邮件 - 正在发送...")
+        msg = build_message(settings, subject, recipient, body)
+        server = open_smtp_connection(settings)
         server.send_message(msg)
         server.quit()
-        print(f"✅ 测试邮件已发送至 {recipient}")
+        logger.info('测试邮件已发送', extra={**fields, 'duration': time.perf_counter() - start, 'outcome': 'sent'})
         return True
-    except Exception as e:
-        print(f"❌ 发送测试邮件失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception('发送测试邮件失败', extra={**fields, 'duration': time.perf_counter() - start,
+                                                 'outcome': 'failed'})
         return False
 
+# 查询提醒已到期的域名
+def find_alert_candidates(now, shard=None):
+    """只取出 next_alert_at 已到期的域名
+    
+    next_alert_at 在域名增改、续费和重置时预先算好，
+    查询走 next_alert_at 索引，扫描量只与需要提醒的域名数量相关。
+    不在SQL中按到期日期排序：SQLite 会为了省去排序改走 expiration_date 索引扫描整张表
+    
+    Args:
+        shard: plan_shards 返回的分片，为空时检查所有域名
+    """
+    query = Domain.query.filter(
+        Domain.needs_renewal == True,
+        Domain.next_alert_at <= now
+    )
+    if shard is not None:
+        query = query.filter(shard_clause(shard))
+    return sorted(query.all(), key=lambda domain: domain.expiration_date)
+
+# 域名表分片（供命令行检查脚本在多个进程中并行检查）
+def plan_shards(count, mode='range'):
+    """把域名表切分为 count 个分片
+    
+    range: 按ID范围切分为连续区间 ('range', 起始ID, 结束ID)，左闭右开
+    hash: 按ID取模 ('hash', 分片数, 余数)，ID不连续时分布更均匀
+    """
+    if mode == 'hash':
+        return [('hash', count, remainder) for remainder in range(count)]
+    low, high = db.session.query(db.func.min(Domain.id), db.func.max(Domain.id)).one()
+    if low is None:
+        return []
+    step = max(1, math.ceil((high - low + 1) / count))
+    return [('range', start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+def shard_clause(shard):
+    """分片对应的查询条件"""
+    if shard[0] == 'range':
+        return db.and_(Domain.id >= shard[1], Domain.id < shard[2])
+    if shard[0] == 'hash':
+        return Domain.id % shard[1] == shard[2]
+    raise ValueError(f'未知的分片类型: {shard[0]}')
+
+def describe_shard(shard):
+    if shard is None:
+        return '全部'
+    if shard[0] == 'range':
+        return f'ID [{shard[1]}, {shard[2]})'
+    return f'ID % {shard[1]} == {shard[2]}'
+
+# 批量标记提醒已发送
+def mark_alerts_sent(danger_ids, warning_ids, next_alerts=None, chunk_size=400):
+    """用一条UPDATE语句（按批次分块）更新所有提醒标志和下次提醒时间，并只提交一次
+    
+    Args:
+        next_alerts: {域名ID: 新的 next_alert_at}，包含本次检查过的所有域名
+    """
+    next_alerts = next_alerts or {}
+    ids = list(dict.fromkeys(danger_ids + warning_ids + list(next_alerts)))
+    if not ids:
+        return
+    danger_set = set(danger_ids)
+    warning_set = set(warning_ids)
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        chunk_danger = [i for i in chunk if i in danger_set]
+        chunk_warning = [i for i in chunk if i in warning_set]
+        values = {
+            'danger_sent': db.case((Domain.id.in_(chunk_danger), True), else_=Domain.danger_sent),
+            'warning_sent': db.case((Domain.id.in_(chunk_warning), True), else_=Domain.warning_sent),
+        }
+        chunk_next = {i: next_alerts[i] for i in chunk if i in next_alerts}
+        if chunk_next:
+            values['next_alert_at'] = db.case(chunk_next, value=Domain.id, else_=Domain.next_alert_at)
+        db.session.execute(
+            db.update(Domain)
+            .where(Domain.id.in_(chunk))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+# 汇总提醒邮件
+def digest_message(alerts):
+    """把 (域名对象, 剩余天数, 警告级别) 列表合并为一封汇总邮件，返回发件箱消息"""
+    danger_count = sum(1 for _, _, level in alerts if level == 'danger')
+    subject = (f"【域名到期汇总】{len(alerts)} 个域名即将过期"
+               f"（危险 {danger_count} / 警告 {len(alerts) - danger_count}）")
+    body = create_digest_email_template(alerts)
+    return digest_key('digest', alerts), 'digest', subject, body
+
+def digest_key(prefix, alerts):
+    """汇总邮件（或汇总片段）的提醒键由其中每条提醒的提醒键决定"""
+    member_keys = sorted(alert_key('domain', domain.id, level, domain.expiration_date)
+                         for domain, _, level in alerts)
+    return f"{prefix}:" + hashlib.sha256('|'.join(member_keys).encode('utf-8')).hexdigest()[:32]
+
+# 分片检查的汇总片段
+def enqueue_digest_part(alerts, recipient):
+    """把一个分片的提醒作为暂存的汇总片段写入发件箱（只添加到会话，由调用方与提醒标志一起提交）
+    
+    片段的正文为 [域名ID, 剩余天数, 警告级别] 的JSON列表，投递器不发送，由 merge_digest_parts 合并
+    """
+    key = digest_key('digest_part', alerts)
+    now = datetime.utcnow()
+    db.session.add(AlertOutbox(
+        alert_key=key, idempotency_key=key, kind='digest_part', recipient=recipient,
+        subject=f"汇总片段（{len(alerts)} 个域名）",
+        body=json.dumps([[domain.id, days_remaining, level] for domain, days_remaining, level in alerts]),
+        status=STATUS_HELD, attempts=0, next_attempt_at=now, created_at=now
+    ))
+
+def merge_digest_parts(recipient, chunk_size=500):
+    """把发件箱中暂存的汇总片段合并为一封汇总邮件
+    
+    汇总邮件的写入和片段的删除在同一个事务中提交；之前中断未合并的片段在下次合并时一起发出。
+    其他进程同时合并了同一批片段时回滚，不重复写入
+    
+    Returns:
+        int: 写入的邮件数
+    """
+    with app.app_context():
+        parts = (AlertOutbox.query.filter_by(kind='digest_part', status=STATUS_HELD)
+                 .order_by(AlertOutbox.id).all())
+        if not parts:
+            return 0
+        days = {}
+        for part in parts:
+            for domain_id, days_remaining, level in json.loads(part.body):
+                days[domain_id] = (days_remaining, level)
+        ids = list(days)
+        merged = []
+        for start in range(0, len(ids), chunk_size):
+            for domain in Domain.query.filter(Domain.id.in_(ids[start:start + chunk_size])):
+                merged.append((domain, *days[domain.id]))
+        part_ids = [part.id for part in parts]
+        deleted = db.session.execute(
+            db.delete(AlertOutbox)
+            .where(AlertOutbox.id.in_(part_ids), AlertOutbox.status == STATUS_HELD)
+        ).rowcount
+        if deleted == len(part_ids):
+            try:
+                queued = enqueue_alerts([digest_message(merged)], recipient) if merged else 0
+                db.session.commit()
+            except IntegrityError:
+                deleted = 0
+        if deleted != len(part_ids):
+            db.session.rollback()
+            logger.warning('其他进程已合并相同的汇总片段，本次不做修改', extra={
+                'parts': len(part_ids), 'outcome': 'skipped'})
+            return 0
+        wake_outbox_dispatcher()
+        logger.info('汇总片段已合并', extra={'parts': len(part_ids), 'alerts': len(merged), 'emails': queued})
+        return queued
+
 # 修复域名检查函数
-def check_domain_expiry():
-    """检查所有域名的到期状态并发送提醒"""
+@record_check_run
+def check_domain_expiry(shard=None, defer_digest=False):
+    """检查所有域名（或一个分片）的到期状态并发送提醒
+    
+    每个域名的检查细节只在 DEBUG 级别记录，INFO 级别每次检查只有开始和汇总两条
+    
+    Args:
+        shard: plan_shards 返回的分片，为空时检查所有域名
+        defer_digest: 汇总模式下不写入汇总邮件，而是把提醒作为暂存的汇总片段与提醒标志一起提交，
+            由调用方用 merge_digest_parts 合并各分片的片段后发送
+    
+    Returns:
+        dict: 本次检查的统计，alerts 为 (域名ID, 剩余天数, 警告级别) 列表
+    """
+    start = time.perf_counter()
+    summary = {'shard': shard, 'skipped': None, 'candidates': 0, 'alerts': [],
+               'danger': 0, 'warning': 0, 'emails': 0, 'errors': 0, 'elapsed': 0.0}
+    shard_name = describe_shard(shard)
     with app.app_context():
-        print("=" * 60)
-        print("🔍 开始执行域名检查任务...")
-        
         # 检查SMTP是否启用
-        config = SMTPConfig.query.first()
-        if not config:
-            print("❌ SMTP配置不存在，跳过域名检查")
-            return
-            
-        if not config.enabled:
-            print("❌ SMTP未启用，跳过域名检查")
-            return
-            
-        print(f"✅ SMTP配置正常: {config.mail_server}:{config.mail_port}")
-        print(f"📧 管理员邮箱: {config.admin_email}")
-        print(f"🔐 发件人: {config.mail_default_sender}")
+        config = smtp_settings.get()
+        if not config or not config.enabled:
+            summary['skipped'] = 'SMTP配置不存在' if not config else 'SMTP未启用'
+            logger.warning('跳过域名检查: %s', summary['skipped'],
+                           extra={'shard': shard_name, 'outcome': 'skipped'})
+            return summary
         
-        domains = Domain.query.all()
-        print(f"🌐 发现 {len(domains)} 个域名需要检查")
+        now = datetime.utcnow()
+        domains = find_alert_candidates(now, shard)
+        summary['candidates'] = len(domains)
+        logger.info('开始域名检查', extra={'shard': shard_name, 'candidates': len(domains),
+                                           'smtp_server': f'{config.mail_server}:{config.mail_port}'})
         
         if len(domains) == 0:
-            print("ℹ️ 没有域名需要检查")
-            return
-        
-        sent_count = 0
+            summary['elapsed'] = time.perf_counter() - start
+            logger.info('没有域名需要检查', extra={'shard': shard_name, 'duration': summary['elapsed'],
+                                                 'outcome': 'ok'})
+            return summary
+        
+        digest_mode = config.digest_mode
+        # 逐个域名的记录只在 DEBUG 级别输出，关闭时不构造附加字段
+        debug = logger.isEnabledFor(logging.DEBUG)
+        error_log_limit = app.config['LOG_DOMAIN_ERROR_LIMIT']
+        
+        danger_ids = []
+        warning_ids = []
+        next_alerts = {}
+        alerts = []
+        messages = []
         for domain in domains:
+            # 默认保持原状态重新计算下次提醒时间，发送提醒后再按新状态覆盖
+            next_alerts[domain.id] = domain.next_alert_time()
             try:
-                # 跳过永久域名
-                if not domain.needs_renewal:
-                    print(f"\n📋 检查域名: {domain.name}")
-                    print(f"  ℹ️ 永久域名，跳过检查")
-                    continue
-                
                 days_remaining = domain.days_remaining()
-                print(f"\n📋 检查域名: {domain.name}")
-                print(f"  剩余天数: {days_remaining}")
-                print(f"  危险阈值: {domain.danger_threshold}")
-                print(f"  警告阈值: {domain.warning_threshold}")
-                print(f"  危险邮件已发送: {domain.danger_sent}")
-                print(f"  警告邮件已发送: {domain.warning_sent}")
-                print(f"  续费日期: {domain.renewal_date}")
-                print(f"  到期日期: {domain.expiration_date}")
                 
                 # 检查是否需要发送提醒
-                if days_remaining <= domain.danger_threshold:
-                    if not domain.danger_sent:
-                        print(f"  ⚠️ 域名 {domain.name} 达到危险阈值，需要发送提醒邮件")
-                        # 发送危险级别提醒
+                alert_level = domain.alert_level(days_remaining)
+                if alert_level is None or (alert_level == 'warning' and domain.warning_sent):
+                    if debug:
+                        logger.debug('域名无需提醒', extra={
+                            'domain': domain.name, 'days_remaining': days_remaining,
+                            'alert_level': alert_level, 'warning_sent': domain.warning_sent})
+                    continue
+                
+                if not digest_mode:
+                    if alert_level == 'danger':
                         subject = f"【紧急】域名 {domain.name} 即将过期！剩余 {days_remaining} 天"
-                        
-                        # 使用美化模板
-                        body = create_email_template(domain, days_remaining, 'danger')
-                        
-                        print(f"  📤 准备发送危险提醒邮件到: {config.admin_email}")
-                        
-                        # 确保在应用上下文中调用异步邮件发送
-                        send_email_async(subject, config.admin_email, body)
-                        
-                        # 标记已发送提醒
-                        domain.danger_sent = True
-                        db.session.commit()
-                        sent_count += 1
-                        print(f"  ✅ 危险提醒邮件已安排发送 - 域名: {domain.name}")
                     else:
-                        print(f"  ℹ️ 域名 {domain.name} 危险提醒已发送过，跳过")
-                
-                elif days_remaining <= domain.warning_threshold:
-                    if not domain.warning_sent:
-                        print(f"  ⚠️ 域名 {domain.name} 达到警告阈值，需要发送提醒邮件")
-                        # 发送警告级别提醒
                         subject = f"【提醒】域名 {domain.name} 即将过期，剩余 {days_remaining} 天"
-                        
-                        # 使用美化模板
-                        body = create_email_template(domain, days_remaining, 'warning')
-                        
-                        print(f"  📤 准备发送警告提醒邮件到: {config.admin_email}")
-                        
-                        # 确保在应用上下文中调用异步邮件发送
-                        send_email_async(subject, config.admin_email, body)
-                        
-                        # 标记已发送提醒
-                        domain.warning_sent = True
-                        db.session.commit()
-                        sent_count += 1
-                        print(f"  ✅ 警告提醒邮件已安排发送 - 域名: {domain.name}")
-                    else:
-                        print(f"  ℹ️ 域名 {domain.name} 警告提醒已发送过，跳过")
+                    
+                    # 使用美化模板
+                    body = create_email_template(domain, days_remaining, alert_level)
+                    messages.append((alert_key('domain', domain.id, alert_level, domain.expiration_date),
+                                     'domain', subject, body))
+                
+                alerts.append((domain, days_remaining, alert_level))
+                # 记录待标记的域名，循环结束后统一更新
+                if alert_level == 'danger':
+                    danger_ids.append(domain.id)
+                    next_alerts[domain.id] = None
                 else:
-                    print(f"  ✅ 域名 {domain.name} 状态正常")
+                    warning_ids.append(domain.id)
+                    next_alerts[domain.id] = domain.next_alert_time(warning_sent=True)
+                if debug:
+                    logger.debug('域名提醒已安排', extra={
+                        'domain': domain.name, 'days_remaining': days_remaining, 'alert_level': alert_level})
                         
-            except Exception as e:
-                print(f"  ❌ 处理域名 {domain.name} 时出错: {str(e)}")
-                import traceback
-                traceback.print_exc()
+            except Exception:
+                summary['errors'] += 1
+                # 只有前几个出错的域名记录完整的异常，其余降为 DEBUG，出错总数见汇总
+                log = logger.exception if summary['errors'] <= error_log_limit else logger.debug
+                log('处理域名时出错', extra={'domain': domain.name, 'shard': shard_name, 'outcome': 'error'})
                 continue
         
-        print(f"\n📊 域名检查完成，共安排发送 {sent_count} 封提醒邮件")
-        print("=" * 60)
+        # 汇总模式：所有提醒合并为一封邮件
+        if digest_mode and alerts and not defer_digest:
+            messages.append(digest_message(alerts))
+        
+        # 提醒邮件与提醒标志、下次提醒时间在同一个事务中提交
+        try:
+            sent_count = enqueue_alerts(messages, config.admin_email)
+            if digest_mode and alerts and defer_digest:
+                enqueue_digest_part(alerts, config.admin_email)
+            mark_alerts_sent(danger_ids, warning_ids, next_alerts)
+        except IntegrityError:
+            # 另一个检查进程同时写入了相同的提醒，本次的标志和邮件一起回滚
+            db.session.rollback()
+            summary.update(skipped='其他检查进程已写入相同的提醒', elapsed=time.perf_counter() - start)
+            logger.warning('其他检查进程已写入相同的提醒，本次检查不做修改', extra={
+                'shard': shard_name, 'duration': summary['elapsed'], 'outcome': 'skipped'})
+            return summary
+        wake_outbox_dispatcher()
+        
+        summary.update(
+            alerts=[(domain.id, days_remaining, alert_level) for domain, days_remaining, alert_level in alerts],
+            danger=len(danger_ids),
+            warning=len(warning_ids),
+            emails=sent_count,
+            elapsed=time.perf_counter() - start
+        )
+        logger.info('域名检查完成', extra={
+            'shard': shard_name, 'candidates': len(domains), 'danger': len(danger_ids),
+            'warning': len(warning_ids), 'emails': sent_count, 'errors': summary['errors'],
+            'digest': bool(digest_mode), 'duration': summary['elapsed'],
+            'outcome': 'partial' if summary['errors'] else 'ok'})
+        return summary
+
+# RDAP注册信息查询器（进程内共享，查询结果按 RDAP_CACHE_TTL 缓存）
+@lazy_instance
+def get_rdap_refresher():
+    from rdap import IANA_BOOTSTRAP_URL, RDAPRefresher
+
+    return RDAPRefresher(
+        bootstrap_url=app.config['RDAP_BOOTSTRAP_URL'] or IANA_BOOTSTRAP_URL,
+        base_url=app.config['RDAP_BASE_URL'],
+        concurrency=app.config['RDAP_CONCURRENCY'],
+        rate_limit=app.config['RDAP_RATE_LIMIT'],
+        cache_ttl=app.config['RDAP_CACHE_TTL']
+    )
+
+def refresh_domain_registrations(user_id=None, batch_size=500):
+    """通过RDAP并发查询域名的到期日期和注册商，分批写回数据库
+    
+    到期日期被注册商自动续费延后时，按续费处理：重置提醒状态并把续费日期设为当前时间
+    
+    Args:
+        user_id: 只刷新该用户的域名，为空时刷新全部需要续期的域名
+    
+    Returns:
+        dict: 查询和更新统计
+    """
+    with app.app_context():
+        query = db.session.query(Domain.id, Domain.name).filter(Domain.needs_renewal == True)
+        if user_id is not None:
+            query = query.filter(Domain.user_id == user_id)
+        rows = query.all()
+        if not rows:
+            return {'checked': 0, 'updated': 0, 'errors': 0, 'lookups_per_second': 0.0}
+        
+        results, stats = get_rdap_refresher().refresh([name for _, name in rows])
+        found = {}
+        for domain_id, name in rows:
+            result = results.get(name.strip().lower())
+            if result and not result.error and result.expiration_date:
+                found[domain_id] = result
+        
+        now = datetime.utcnow()
+        updated = 0
+        ids = list(found)
+        for start in range(0, len(ids), batch_size):
+            summary_delta = DomainSummaryDelta(now)
+            for domain in Domain.query.filter(Domain.id.in_(ids[start:start + batch_size])).all():
+                result = found[domain.id]
+                changed = False
+                if result.registrar and result.registrar != domain.registrar:
+                    domain.registrar = result.registrar
+                    changed = True
+                # 页面只精确到日期，日期相同时不覆盖手动填写的到期日期
+                if result.expiration_date.date() != domain.expiration_date.date():
+                    summary_delta.remove(domain)
+                    if result.expiration_date > domain.expiration_date:
+                        domain.renewal_date = now
+                        domain.warning_sent = False
+                        domain.danger_sent = False
+                    domain.expiration_date = result.expiration_date
+                    domain.refresh_alert_times()
+                    summary_delta.add(domain)
+                    changed = True
+                updated += changed
+            summary_delta.apply()
+            db.session.commit()
+    
+    if updated:
+        schedule_next_alert_check()
+        bump_domain_data_version()
+    
+    logger.info('RDAP刷新完成', extra={'checked': len(rows), 'updated': updated, 'errors': stats['errors'],
+                                       'cache_hits': stats['cache_hits'],
+                                       'lookups_per_second': stats['lookups_per_second']})
+    return {
+        'checked': len(rows),
+        'updated': updated,
+        'errors': stats['errors'],
+        'lookups_per_second': round(stats['lookups_per_second'], 1)
+    }
+
+# DNS解析检查器
+@lazy_instance
+def get_dns_prober():
+    from dnsprobe import DNSProber, parse_resolver
+
+    return DNSProber(
+        resolver=parse_resolver(app.config['DNS_RESOLVER']) if app.config['DNS_RESOLVER'] else None,
+        workers=app.config['DNS_PROBE_WORKERS'],
+        timeout=app.config['DNS_PROBE_TIMEOUT']
+    )
+
+def probe_domain_dns(user_id=None, batch_size=500):
+    """并发检查域名的 A/AAAA/NS 解析，分批写回检查结果
+    
+    NS记录与上次检查不同时记录变化时间，页面上会提示一段时间
+    
+    Args:
+        user_id: 只检查该用户的域名，为空时检查全部域名
+    
+    Returns:
+        dict: 检查统计
+    """
+    with app.app_context():
+        query = db.session.query(Domain.id, Domain.name, Domain.dns_status, Domain.dns_records)
+        if user_id is not None:
+            query = query.filter(Domain.user_id == user_id)
+        # 名称为空的域名无法查询，跳过
+        rows = [row for row in query if row.name and row.name.strip()]
+        if not rows:
+            return {'checked': 0, 'failed': 0, 'ns_changed': 0, 'probes_per_second': 0.0}
+        
+        results, stats = get_dns_prober().probe_all([row.name for row in rows])
+        now = datetime.utcnow()
+        updates = []
+        changed = ns_changed = 0
+        for row in rows:
+            result = results.get(row.name.strip().lower())
+            if result is None:
+                continue
+            # 查询本身失败（超时、DNS服务器不可用）时保留上次的记录，恢复后仍能比较NS变化
+            records = row.dns_records if result.status in ('timeout', 'error') else encode_records(result)
+            update = {'id': row.id, 'dns_status': result.status, 'dns_records': records, 'dns_checked_at': now}
+            old_ns = decode_records(row.dns_records)['NS']
+            # 只在两次都查到NS时比较，避免把一次查询失败当成NS变化
+            if old_ns and result.ns and old_ns != result.ns:
+                update['dns_ns_changed_at'] = now
+                ns_changed += 1
+                logger.warning('域名NS记录已变化', extra={'domain': row.name, 'old_ns': ','.join(old_ns),
+                                                       'new_ns': ','.join(result.ns)})
+            if result.status != row.dns_status or records != row.dns_records:
+                changed += 1
+            updates.append(update)
+        
+        # 按主键批量更新，不加载ORM对象
+        for start in range(0, len(updates), batch_size):
+            db.session.execute(db.update(Domain), updates[start:start + batch_size])
+        db.session.commit()
+    
+    if changed:
+        bump_domain_data_version()
+    
+    logger.info('DNS检查完成', extra={'checked': stats['probes'], 'failed': stats['failed'],
+                                      'ns_changed': ns_changed, 'probes_per_second': stats['probes_per_second']})
+    return {
+        'checked': len(rows),
+        'failed': stats['failed'],
+        'ns_changed': ns_changed,
+        'probes_per_second': round(stats['probes_per_second'], 1)
+    }
+
+# HTTPS证书检查器
+@lazy_instance
+def get_tls_prober():
+    from tlsprobe import TLSProber, parse_address
+
+    return TLSProber(
+        workers=app.config['TLS_PROBE_WORKERS'],
+        timeout=app.config['TLS_PROBE_TIMEOUT'],
+        address=parse_address(app.config['TLS_PROBE_ADDRESS']) if app.config['TLS_PROBE_ADDRESS'] else None
+    )
+
+def probe_domain_certificates(user_id=None, batch_size=500):
+    """并发读取域名HTTPS证书的到期时间，分批写回后按阈值发送证书提醒
+    
+    证书到期时间延后（证书已更新）时重置证书提醒状态；检查失败时保留上次的到期时间
+    
+    Args:
+        user_id: 只检查该用户的域名，为空时检查全部域名
+    
+    Returns:
+        dict: 检查统计
+    """
+    with app.app_context():
+        query = db.session.query(Domain.id, Domain.name, Domain.tls_expires_at, Domain.tls_error)
+        if user_id is not None:
+            query = query.filter(Domain.user_id == user_id)
+        # 名称为空的域名无法连接，跳过
+        rows = [row for row in query if row.name and row.name.strip()]
+        if not rows:
+            return {'checked': 0, 'failed': 0, 'alerts': 0, 'probes_per_second': 0.0}
+        
+        results, stats = get_tls_prober().probe_all([row.name for row in rows])
+        now = datetime.utcnow()
+        updates = []
+        changed = 0
+        for row in rows:
+            result = results.get(row.name.strip().lower())
+            if result is None:
+                continue
+            # 错误信息可能超过列长度（255），截断后写入，避免整批更新被数据库拒绝
+            error = (result.error or '')[:255] or None
+            update = {'id': row.id, 'tls_checked_at': now, 'tls_error': error}
+            if result.not_after:
+                update['tls_expires_at'] = result.not_after
+                if row.tls_expires_at and result.not_after > row.tls_expires_at:
+                    update['tls_warning_sent'] = False
+                    update['tls_danger_sent'] = False
+            if (result.not_after and result.not_after != row.tls_expires_at) or error != row.tls_error:
+                changed += 1
+            updates.append(update)
+        
+        for start in range(0, len(updates), batch_size):
+            db.session.execute(db.update(Domain), updates[start:start + batch_size])
+        db.session.commit()
+    
+    if changed:
+        bump_domain_data_version()
+    
+    logger.info('证书检查完成', extra={'checked': stats['probes'], 'failed': stats['failed'],
+                                     'probes_per_second': stats['probes_per_second']})
+    alerts = check_certificate_expiry()
+    return {
+        'checked': len(rows),
+        'failed': stats['failed'],
+        'alerts': alerts,
+        'probes_per_second': round(stats['probes_per_second'], 1)
+    }
+
+def check_certificate_expiry():
+    """按域名的警告/危险阈值检查证书到期时间并发送提醒，返回安排发送的提醒数"""
+    with app.app_context():
+        config = smtp_settings.get()
+        if not config or not config.enabled:
+            logger.warning('SMTP未启用，跳过证书提醒', extra={'outcome': 'skipped'})
+            return 0
+        
+        # 只取出证书到期时间落在最大警告阈值内的域名
+        now = datetime.utcnow()
+        max_warning, max_danger = db.session.query(
+            db.func.max(Domain.warning_threshold), db.func.max(Domain.danger_threshold)
+        ).one()
+        max_threshold = max(max_warning or 30, max_danger or 7)
+        domains = Domain.query.filter(
+            Domain.tls_danger_sent.isnot(True),
+            Domain.tls_expires_at <= now + timedelta(days=max_threshold + 1)
+        ).order_by(Domain.tls_expires_at).all()
+        
+        danger_ids, warning_ids, messages = [], [], []
+        for domain in domains:
+            days_remaining = max(0, (domain.tls_expires_at - now).days)
+            alert_level = domain.alert_level(days_remaining)
+            if alert_level is None or (alert_level == 'warning' and domain.tls_warning_sent):
+                continue
+            if alert_level == 'danger':
+                subject = f"【紧急】域名 {domain.name} 的HTTPS证书即将过期！剩余 {days_remaining} 天"
+                danger_ids.append(domain.id)
+            else:
+                subject = f"【提醒】域名 {domain.name} 的HTTPS证书即将过期，剩余 {days_remaining} 天"
+                warning_ids.append(domain.id)
+            body = create_certificate_email_template(domain, days_remaining, alert_level)
+            messages.append((alert_key('certificate', domain.id, alert_level, domain.tls_expires_at),
+                             'certificate', subject, body))
+        
+        # 提醒邮件与证书提醒标志在同一个事务中提交
+        try:
+            count = enqueue_alerts(messages, config.admin_email)
+            if danger_ids:
+                db.session.execute(db.update(Domain).where(Domain.id.in_(danger_ids)).values(
+                    tls_danger_sent=True, tls_warning_sent=True))
+            if warning_ids:
+                db.session.execute(db.update(Domain).where(Domain.id.in_(warning_ids)).values(
+                    tls_warning_sent=True))
+            db.session.commit()
+        except IntegrityError:
+            # 另一个检查（例如手动检查与定时检查重叠）同时写入了相同的提醒，本次的标志和邮件一起回滚
+            db.session.rollback()
+            logger.warning('其他检查已写入相同的证书提醒，本次检查不做修改', extra={'outcome': 'skipped'})
+            return 0
+        wake_outbox_dispatcher()
+        ALERTS.labels('certificate', 'danger').inc(len(danger_ids))
+        ALERTS.labels('certificate', 'warning').inc(len(warning_ids))
+        
+        logger.info('证书提醒检查完成', extra={'danger': len(danger_ids), 'warning': len(warning_ids),
+                                             'emails': count})
+        return count
+
+# 批量导入域名
+def import_domains(stream, fmt, user_id, batch_size=None):
+    """逐行解析CSV/JSON Lines并分批插入域名，每批一个事务
+    
+    每行按 add_domain 的规则校验，出错的行跳过并记录行号和原因，不影响其他行
+    
+    Args:
+        stream: 二进制文件流
+        fmt: 'csv' 或 'jsonl'
+        user_id: 域名所属用户
+    
+    Returns:
+        dict: {'imported': 成功行数, 'failed': 失败行数, 'errors': [{'line', 'message'}]}
+    """
+    batch_size = batch_size or app.config['IMPORT_BATCH_SIZE']
+    max_errors = app.config['IMPORT_MAX_ERRORS']
+    now = datetime.utcnow()
+    imported = failed = 0
+    errors = []
+    batch = []
+    
+    def flush():
+        # Core批量INSERT（executemany），不经过ORM
+        db.session.connection().execute(Domain.__table__.insert(), batch)
+        summary_delta = DomainSummaryDelta(now)
+        for values in batch:
+            summary_delta.change(user_id, values['needs_renewal'], values['warning_at'], values['danger_at'],
+                                 values['expiration_date'])
+        summary_delta.apply()
+        db.session.commit()
+        count = len(batch)
+        batch.clear()
+        return count
+    
+    try:
+        for line_num, row in iter_rows(stream, fmt):
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                values = parse_domain_row(row, now)
+            except ValueError as e:
+                failed += 1
+                if len(errors) < max_errors:
+                    errors.append({'line': line_num, 'message': str(e)})
+                continue
+            values['next_alert_at'], values['warning_at'], values['danger_at'] = Domain.alert_times(
+                values['expiration_date'], values['needs_renewal'],
+                values['warning_threshold'], values['danger_threshold'])
+            values.update(user_id=user_id, warning_sent=False, danger_sent=False,
+                          tls_warning_sent=False, tls_danger_sent=False, last_checked=now)
+            batch.append(values)
+            if len(batch) >= batch_size:
+                imported += flush()
+        if batch:
+            imported += flush()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        # 中途出错时，已提交的批次仍然有效
+        if imported:
+            schedule_next_alert_check()
+            bump_domain_data_version()
+    logger.info('批量导入完成', extra={'imported': imported, 'failed': failed})
+    return {'imported': imported, 'failed': failed, 'errors': errors}
+
+# 流式导出域名
+def iter_domain_export(user_id, fmt, window_size=None):
+    """按到期日期分窗口读取用户的域名并逐块产出导出文本
+    
+    复用列表的键集分页，每个窗口单独查询，处理完后关闭会话释放ORM对象和读事务，
+    内存占用只与窗口大小有关，与域名总数无关
+    """
+    window_size = window_size or app.config['EXPORT_WINDOW_SIZE']
+    now = datetime.utcnow()
+    yield format_header(fmt)
+    query = Domain.query.filter(Domain.user_id == user_id)
+    cursor = None
+    while True:
+        domains, cursor = query_domain_page(query, cursor=cursor, limit=window_size)
+        chunk = format_records([export_record(view) for view in build_domain_views(domains, now)], fmt)
+        del domains
+        db.session.close()
+        yield chunk
+        if not cursor:
+            break
+
+# 域名状态筛选条件（基于预先计算的 warning_at / danger_at，可直接在数据库中比较）
+def domain_status_filter(status, now):
+    if status in ('permanent', 'info'):
+        return Domain.needs_renewal == False
+    renewing = Domain.needs_renewal == True
+    if status == 'danger':
+        return db.and_(renewing, Domain.danger_at <= now)
+    if status == 'warning':
+        return db.and_(renewing, Domain.warning_at <= now, Domain.danger_at > now)
+    if status == 'success':
+        return db.and_(renewing, Domain.warning_at > now, Domain.danger_at > now)
+    raise ValueError(f'无效的状态: {status}')
+
+# 状态汇总的计数 -> domain_status_filter 中对应的状态
+SUMMARY_STATUSES = {'danger': 'danger', 'warning': 'warning', 'healthy': 'success', 'permanent': 'permanent'}
+
+def summary_status(needs_renewal, warning_at, danger_at, now):
+    """按 domain_status_filter 的条件判断单个域名计入汇总的哪一项"""
+    if needs_renewal is None:
+        return None
+    if not needs_renewal:
+        return 'permanent'
+    if warning_at is None or danger_at is None:
+        return None
+    if danger_at <= now:
+        return 'danger'
+    if warning_at <= now:
+        return 'warning'
+    return 'healthy'
+
+def recompute_domain_summaries(user_ids=None, now=None):
+    """重新统计用户的状态汇总并写入 domain_summary（不提交，由调用方提交）
+
+    Args:
+        user_ids: 要统计的用户ID列表，为空时统计所有用户（一次 GROUP BY 扫描域名表）
+
+    Returns:
+        dict: {用户ID: 汇总行的字段}
+    """
+    now = now or datetime.utcnow()
+    renewing = Domain.needs_renewal == True
+
+    def count(status):
+        return db.func.sum(db.case((domain_status_filter(status, now), 1), else_=0))
+
+    def earliest(column):
+        return db.func.min(db.case((db.and_(renewing, column > now), column)))
+
+    query = db.session.query(
+        Domain.user_id, *(count(status) for status in SUMMARY_STATUSES.values()),
+        earliest(Domain.expiration_date), earliest(Domain.warning_at), earliest(Domain.danger_at)
+    ).group_by(Domain.user_id)
+    if user_ids is None:
+        user_ids = [user_id for user_id, in db.session.query(User.id)]
+    else:
+        query = query.filter(Domain.user_id.in_(user_ids))
+    rows = {row[0]: row[1:] for row in query}
+
+    summaries = {}
+    empty = (0,) * len(SUMMARY_STATUSES) + (None, None, None)
+    for user_id in user_ids:
+        *counts, next_expiration, next_warning, next_danger = rows.get(user_id, empty)
+        summary = {f'{name}_count': value or 0 for name, value in zip(SUMMARY_STATUSES, counts)}
+        summary.update(
+            user_id=user_id,
+            next_expiration=next_expiration,
+            valid_until=min((t for t in (next_expiration, next_warning, next_danger) if t), default=None),
+            computed_at=now
+        )
+        summaries[user_id] = summary
+
+    for summary in summaries.values():
+        store_domain_summary(summary)
+    return summaries
+
+def store_domain_summary(summary):
+    """写入一个用户的汇总行（UPDATE，没有这一行时 INSERT）
+
+    其他进程同时为同一用户插入时，INSERT 在保存点中失败并回滚保存点，改为 UPDATE 对方插入的行，
+    不影响当前事务中的其他修改
+    """
+    table = DomainSummary.__table__
+    values = {key: value for key, value in summary.items() if key != 'user_id'}
+    update = table.update().where(table.c.user_id == summary['user_id']).values(values)
+    if db.session.execute(update).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(summary))
+    except IntegrityError:
+        db.session.execute(update)
+
+class DomainSummaryDelta:
+    """一次写操作对各用户状态汇总的增量
+
+    修改域名前调用 remove(domain)，修改后调用 add(domain)，提交前调用 apply()。
+    汇总在 valid_until 之前没有域名跨过阈值，所以修改前的状态按当前时间判断即可与汇总中的计数对应；
+    汇总仍然有效时用一条原子 UPDATE 累加计数，否则（或还没有汇总）在同一事务中重新统计该用户
+    """
+
+    def __init__(self, now=None):
+        self.now = now or datetime.utcnow()
+        self.counts = {}
+        # 用户ID -> 新写入的域名中最早跨过阈值或到期的时间
+        self.change_times = {}
+
+    def add(self, domain):
+        self.change(domain.user_id, domain.needs_renewal, domain.warning_at, domain.danger_at,
+                    domain.expiration_date)
+
+    def remove(self, domain):
+        self.change(domain.user_id, domain.needs_renewal, domain.warning_at, domain.danger_at,
+                    domain.expiration_date, sign=-1)
+
+    def change(self, user_id, needs_renewal, warning_at, danger_at, expiration_date, sign=1):
+        counts = self.counts.setdefault(user_id, dict.fromkeys(SUMMARY_STATUSES, 0))
+        status = summary_status(needs_renewal, warning_at, danger_at, self.now)
+        if status:
+            counts[status] += sign
+        if sign > 0 and needs_renewal:
+            # 删除的域名不会缩短有效期，只有新写入的域名需要考虑
+            for change_time in (warning_at, danger_at, expiration_date):
+                if change_time and change_time > self.now and (
+                        user_id not in self.change_times or change_time < self.change_times[user_id]):
+                    self.change_times[user_id] = change_time
+
+    def apply(self):
+        """在当前事务中更新汇总（调用方随后提交）"""
+        if not self.counts:
+            return
+        # 先写入域名的修改，语句中的 next_expiration 子查询才能看到
+        db.session.flush()
+        stale = []
+        for user_id, counts in self.counts.items():
+            params = dict(counts)
+            params.update(summary_user_id=user_id, now=self.now, change_time=self.change_times.get(user_id))
+            if db.session.execute(summary_update_statement(), params).rowcount == 0:
+                stale.append(user_id)
+        if stale:
+            recompute_domain_summaries(stale, self.now)
+
+@lru_cache(maxsize=None)
+def summary_update_statement():
+    """按增量更新一个用户汇总的 UPDATE 语句（只构造一次，每次写入只绑定参数）
+
+    汇总已过有效期时不更新（rowcount 为 0），由调用方重新统计
+    """
+    table = DomainSummary.__table__
+    now = db.bindparam('now', type_=db.DateTime)
+    change_time = db.bindparam('change_time', type_=db.DateTime)
+    values = {f'{name}_count': table.c[f'{name}_count'] + db.bindparam(name, type_=db.Integer)
+              for name in SUMMARY_STATUSES}
+    # 按 (user_id, expiration_date) 索引取一条，删除或延后了最早到期的域名时也正确
+    values['next_expiration'] = db.select(db.func.min(Domain.expiration_date)).where(
+        Domain.user_id == table.c.user_id, Domain.needs_renewal == True, Domain.expiration_date > now
+    ).scalar_subquery()
+    # 新写入的域名更早跨过阈值或到期时缩短有效期
+    values['valid_until'] = db.case(
+        (db.and_(change_time.isnot(None),
+                 db.or_(table.c.valid_until.is_(None), table.c.valid_until > change_time)), change_time),
+        else_=table.c.valid_until
+    )
+    return table.update().where(
+        table.c.user_id == db.bindparam('summary_user_id', type_=db.Integer),
+        db.or_(table.c.valid_until.is_(None), table.c.valid_until > now)
+    ).values(values)
+
+def load_domain_summary(user_id=None):
+    """读取状态汇总（user_id 为空时合计所有用户），缺失或已过有效期的先重新统计
+
+    正常情况下只读取汇总表中的一行（或每个用户一行），与域名数量无关
+    """
+    now = datetime.utcnow()
+    table = DomainSummary.__table__
+    query = db.select(table)
+    if user_id is not None:
+        query = query.where(table.c.user_id == user_id)
+        user_ids = [user_id]
+    else:
+        user_ids = [uid for uid, in db.session.query(User.id)]
+    found = {row['user_id']: row for row in db.session.execute(query).mappings()}
+    stale = [uid for uid in user_ids if uid not in found
+             or (found[uid]['valid_until'] is not None and found[uid]['valid_until'] <= now)]
+    if stale:
+        found.update(recompute_domain_summaries(stale, now))
+        db.session.commit()
+    rows = [found[uid] for uid in user_ids if uid in found]
+
+    summary = {name: sum(row[f'{name}_count'] for row in rows) for name in SUMMARY_STATUSES}
+    summary['total'] = sum(summary.values())
+    next_expiration = min((row['next_expiration'] for row in rows if row['next_expiration']), default=None)
+    summary['next_expiration'] = next_expiration.strftime('%Y-%m-%d') if next_expiration else None
+    summary['next_expiration_days'] = (next_expiration - now).days if next_expiration else None
+    return summary
+
+def refresh_domain_summaries():
+    """重新统计所有用户的状态汇总
+
+    域名跨过阈值时计数会变化，手动填写的到期日期都在UTC零点，所以每天零点后统一重新统计一次；
+    其他时间的变化由 valid_until 在读取时发现
+    """
+    start = time.perf_counter()
+    with app.app_context():
+        summaries = recompute_domain_summaries()
+        db.session.commit()
+    logger.info('域名状态汇总已重新统计', extra={'users': len(summaries),
+                                               'duration': time.perf_counter() - start})
+
+# 分页游标：上一页最后一个域名的 (到期日期, ID)
+def encode_cursor(domain):
+    raw = f"{domain.expiration_date.isoformat()}|{domain.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    expiration, domain_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(expiration), int(domain_id)
+
+# 按到期日期键集分页查询域名
+def query_domain_page(query, status=None, prefix=None, cursor=None, limit=None):
+    """按 (到期日期, ID) 排序取一页域名
+    
+    使用键集分页而不是OFFSET，翻到后面的页也只需要一次索引范围扫描
+    
+    Returns:
+        tuple: (本页域名列表, 下一页游标或None)
+    """
+    limit = limit or app.config['DOMAIN_PAGE_SIZE']
+    if status:
+        query = query.filter(domain_status_filter(status, datetime.utcnow()))
+    if prefix:
+        query = query.filter(Domain.name.startswith(prefix, autoescape=True))
+    if cursor:
+        last_expiration, last_id = decode_cursor(cursor)
+        # 行值比较可以直接在 (user_id, expiration_date, id) 索引上定位起点，
+        # 拆成 OR 条件时只能从头扫描该用户的索引项
+        query = query.filter(
+            db.tuple_(Domain.expiration_date, Domain.id) > db.tuple_(last_expiration, last_id)
+        )
+    domains = query.order_by(Domain.expiration_date, Domain.id).limit(limit + 1).all()
+    next_cursor = encode_cursor(domains[limit - 1]) if len(domains) > limit else None
+    return domains[:limit], next_cursor
+
+# 域名列表接口返回的字段
+def serialize_domain(view):
+    """把 DomainView 转换为JSON字段"""
+    return {
+        'id': view.id,
+        'name': view.name,
+        'registrar': view.registrar,
+        'registration_date': view.registration_date.strftime('%Y-%m-%d') if view.registration_date else '',
+        'expiration_date': view.expiration_date.strftime('%Y-%m-%d'),
+        'renewal_period': view.renewal_period,
+        'renewal_price': view.renewal_price,
+        'renewal_url': view.renewal_url,
+        'currency': view.currency,
+        'warning_threshold': view.warning_threshold,
+        'danger_threshold': view.danger_threshold,
+        'needs_renewal': view.needs_renewal,
+        'status': view.status,
+        'days_remaining': view.days_remaining if view.needs_renewal else None,
+        'progress_percentage': view.progress_percentage,
+        'dns_status': view.dns_status,
+        'dns_ns_changed': view.dns_ns_changed,
+        'tls_expiration_date': view.tls_expires_at.strftime('%Y-%m-%d') if view.tls_expires_at else None,
+        'tls_days_remaining': view.tls_days_remaining,
+        'tls_status': view.tls_status
+    }
+
+# 首页渲染缓存
+# 域名数据只在增删改和续费时变化，剩余天数只在日期变化时变化，
+# 所以渲染结果按 (数据版本, UTC日期, 登录用户名) 缓存。数据版本保存在 data_version 表中，
+# 任何进程修改域名后都会加一，命中时只按主键查询这一行
+index_cache = {'key': None, 'pages': {}}
+index_cache_lock = threading.Lock()
+
+def bump_domain_data_version():
+    """域名数据提交后调用：数据库中的数据版本加一，使所有进程的首页缓存失效"""
+    table = DataVersion.__table__
+    values = {'version': table.c.version + 1, 'updated_at': datetime.utcnow()}
+    with app.app_context(), db.engine.begin() as conn:
+        update = table.update().where(table.c.name == 'domain').values(values)
+        if conn.execute(update).rowcount:
+            return
+        try:
+            # 还没有这一行（新建的数据库）；其他进程同时插入时改为加一
+            with conn.begin_nested():
+                conn.execute(table.insert().values(name='domain', version=1, updated_at=values['updated_at']))
+        except IntegrityError:
+            conn.execute(update)
+
+def load_domain_data_version():
+    """返回 (数据版本, 最后修改时间)，还没有修改过时为 (0, None)"""
+    row = db.session.execute(
+        db.select(DataVersion.version, DataVersion.updated_at).where(DataVersion.name == 'domain')
+    ).first()
+    return tuple(row) if row else (0, None)
+
+def render_index_page(username):
+    """返回 (HTML, ETag, Last-Modified)，优先使用缓存"""
+    now = datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    version, updated_at = load_domain_data_version()
+    # 跨天后剩余天数和状态都会变化
+    key = (version, today)
+    last_modified = max(updated_at, today) if updated_at else today
+    with index_cache_lock:
+        if index_cache['key'] != key:
+            index_cache['key'] = key
+            index_cache['pages'].clear()
+        cached = index_cache['pages'].get(username)
+    if cached:
+        return cached
+    
+    domains, next_cursor = query_domain_page(Domain.query)
+    html = render_template('index.html', domains=build_domain_views(domains), next_cursor=next_cursor,
+                           editable=False, show_empty=True, now=datetime.now())
+    # ETag取内容摘要，进程重启后缓存为空也不会误判
+    page = (html, hashlib.md5(html.encode()).hexdigest(), last_modified)
+    with index_cache_lock:
+        # 渲染期间其他请求读到了更新的数据版本则不缓存这次结果
+        if index_cache['key'] == key:
+            index_cache['pages'][username] = page
+    return page
 
 # 路由：首页
 @app.route('/')
 def index():
-    domains = Domain.query.all()
-    return render_template('index.html', domains=domains, now=datetime.now())
+    username = session.get('username')
+    html, etag, last_modified = render_index_page(username)
+    response = make_response(html)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # 每次都向服务器确认，未变化时返回304
+    response.cache_control.no_cache = True
+    if username:
+        response.cache_control.private = True
+    return response.make_conditional(request)
+
+# 路由：分页获取域名列表
+@app.route('/domain_list')
+def domain_list():
+    """分页获取域名列表
+    
+    参数: scope=all|mine, status=danger|warning|success|permanent, prefix, cursor, limit
+    """
+    scope = request.args.get('scope', 'all')
+    if scope == 'mine':
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'message': '请先登录'})
+        query = Domain.query.filter_by(user_id=session['user_id'])
+    else:
+        query = Domain.query
+    
+    try:
+        limit = request.args.get('limit', type=int) or app.config['DOMAIN_PAGE_SIZE']
+        limit = max(1, min(limit, app.config['DOMAIN_PAGE_SIZE_MAX']))
+        cursor = request.args.get('cursor')
+        domains, next_cursor = query_domain_page(
+            query,
+            status=request.args.get('status'),
+            prefix=request.args.get('prefix', '').strip(),
+            cursor=cursor,
+            limit=limit
+        )
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        return jsonify({'success': False, 'message': f'无效的查询参数: {str(e)}'})
+    
+    views = build_domain_views(domains)
+    return jsonify({
+        'success': True,
+        'domains': [serialize_domain(view) for view in views],
+        'html': render_template('_domain_cards.html', domains=views,
+                                editable=(scope == 'mine'), show_empty=not cursor),
+        'next_cursor': next_cursor
+    })
 
 # 路由：登录页
 @app.route('/login', methods=['GET', 'POST'])
@@ -577,8 +1797,25 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    domains = Domain.query.filter_by(user_id=session['user_id']).all()
-    return render_template('dashboard.html', domains=domains, now=datetime.now())
+    domains, next_cursor = query_domain_page(Domain.query.filter_by(user_id=session['user_id']))
+    return render_template('dashboard.html', domains=build_domain_views(domains), next_cursor=next_cursor,
+                           summary=load_domain_summary(session['user_id']),
+                           editable=True, show_empty=True, now=datetime.now())
+
+# 路由：域名状态汇总
+@app.route('/domain_summary')
+def domain_summary():
+    """各状态的域名数和最早到期日期
+    
+    参数: scope=all|mine
+    """
+    if request.args.get('scope', 'all') == 'mine':
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'message': '请先登录'})
+        summary = load_domain_summary(session['user_id'])
+    else:
+        summary = load_domain_summary()
+    return jsonify({'success': True, 'summary': summary})
 
 # 路由：SMTP配置页面
 @app.route('/smtp_config')
@@ -613,9 +1850,14 @@ def update_smtp_config():
         config.mail_default_sender = request.form.get('mail_default_sender')
         config.admin_email = request.form.get('admin_email')
         config.enabled = request.form.get('enabled') == 'true'
+        config.digest_mode = request.form.get('digest_mode') == 'true'
         
         db.session.add(config)
         db.session.commit()
+        # 提交后立即换成新快照，之后的检查和发送都使用新配置
+        smtp_settings.replace(settings_from_config(config))
+        # SMTP启用后尽快补发之前因未启用而积压的提醒
+        schedule_next_alert_check()
         
         return jsonify({'success': True, 'message': 'SMTP配置更新成功！'})
     except Exception as e:
@@ -630,109 +1872,19 @@ def test_smtp_config():
         return jsonify({'success': False, 'message': '只有管理员可以测试SMTP配置'})
     
     try:
-        config = SMTPConfig.query.first()
+        config = smtp_settings.get()
         if not config:
             return jsonify({'success': False, 'message': '请先配置SMTP设置'})
         
         # 测试邮件发送
         subject = "域名监控系统 - SMTP配置测试成功"
-        body = f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>SMTP配置测试</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            margin: 0;
-            padding: 0;
-            background-color: #f6f6f6;
-        }}
-        .container {{
-            max-width: 600px;
-            margin: 0 auto;
-            background-color: #ffffff;
-            border-radius: 8px;
-            overflow: hidden;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-        }}
-        .header {{
-            background: linear-gradient(135deg, #007bff, #ffffff);
-            color: white;
-            padding: 30px 20px;
-            text-align: center;
-        }}
-        .header h1 {{
-            margin: 0;
-            font-size: 24px;
-            font-weight: 600;
-        }}
-        .content {{
-            padding: 30px;
-        }}
-        .success-icon {{
-            font-size: 48px;
-            margin-bottom: 20px;
-            color: #28a745;
-        }}
-        .details {{
-            background-color: #f8f9fa;
-            border-left: 4px solid #007bff;
-            padding: 20px;
-            margin: 20px 0;
-            border-radius: 4px;
-        }}
-        .footer {{
-            background-color: #f8f9fa;
-            padding: 20px;
-            text-align: center;
-            font-size: 12px;
-            color: #666;
-            border-top: 1px solid #e9ecef;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div class="success-icon">✅</div>
-            <h1>SMTP配置测试成功</h1>
-        </div>
-        
-        <div class="content">
-            <p>恭喜！您的域名监控系统SMTP配置测试成功。</p>
-            
-            <div class="details">
-                <p><strong>测试详情：</strong></p>
-                <p>📧 收件人：{config.admin_email}</p>
-                <p>🔧 邮件服务器：{config.mail_server}:{config.mail_port}</p>
-                <p>⏰ 发送时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}</p>
-            </div>
-            
-            <p>如果您收到了这封邮件，说明您的SMTP配置已经正确设置，系统可以正常发送域名到期提醒邮件。</p>
-            
-            <p style="color: #666; font-size: 14px; margin-top: 30px;">
-                <strong>下一步：</strong><br>
-                请确保在系统中添加您要监控的域名，并设置合适的提醒阈值。<br>
-                系统将自动监控域名到期状态并及时发送提醒。
-            </p>
-        </div>
-        
-        <div class="footer">
-            <p>此邮件由 <strong>域名监控系统</strong> 自动发送</p>
-            <p>发送时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}</p>
-            <p style="margin-top: 10px; font-size: 10px; color: #999;">
-                此为系统自动发送的测试邮件，请勿直接回复
-            </p>
-        </div>
-    </div>
-</body>
-</html>
-        """
+        body = create_test_email_template(
+            config,
+            title='SMTP配置测试成功',
+            intro='恭喜！您的域名监控系统SMTP配置测试成功。',
+            outro='如果您收到了这封邮件，说明您的SMTP配置已经正确设置，系统可以正常发送域名到期提醒邮件。',
+            show_next_steps=True
+        )
         
         result = send_test_email(config, subject, config.admin_email, body)
         
@@ -786,14 +1938,57 @@ def add_domain():
             # 设置续费日期为注册日期
             renewal_date=registration_date if registration_date else datetime.utcnow()
         )
+        new_domain.refresh_alert_times()
         
         db.session.add(new_domain)
+        summary_delta = DomainSummaryDelta()
+        summary_delta.add(new_domain)
+        summary_delta.apply()
         db.session.commit()
+        schedule_next_alert_check()
+        bump_domain_data_version()
         
         return jsonify({'success': True, 'message': '域名添加成功！'})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': f'添加失败: {str(e)}'})
 
+# 路由：批量导入域名（CSV 或 JSON Lines）
+@app.route('/import_domains', methods=['POST'])
+@login_required
+def import_domains_route():
+    """上传文件字段为 file，格式按 format 参数或文件扩展名判断"""
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'success': False, 'message': '请选择要导入的文件'})
+    fmt = request.form.get('format') or request.args.get('format') or detect_format(upload.filename)
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'success': False, 'message': f'不支持的格式: {fmt}'})
+    try:
+        result = import_domains(upload.stream, fmt, session['user_id'])
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'导入失败: {str(e)}'})
+    return jsonify({
+        'success': True,
+        'message': f"导入完成：成功 {result['imported']} 个，失败 {result['failed']} 个",
+        **result
+    })
+
+# 路由：导出当前用户的全部域名（CSV 或 JSON Lines）
+@app.route('/export_domains')
+@login_required
+def export_domains():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'success': False, 'message': f'不支持的格式: {fmt}'})
+    filename = f"domains-{datetime.utcnow().strftime('%Y%m%d')}.{fmt}"
+    return Response(
+        stream_with_context(iter_domain_export(session['user_id'], fmt)),
+        mimetype=EXPORT_MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 # 路由：更新域名
 @app.route('/update_domain/<int:domain_id>', methods=['POST'])
 @login_required
@@ -805,6 +2000,9 @@ def update_domain(domain_id):
         if domain.user_id != session['user_id']:
             return jsonify({'success': False, 'message': '无权操作'})
         
+        summary_delta = DomainSummaryDelta()
+        summary_delta.remove(domain)
+        
         # 记录旧的注册日期，用于比较
         old_registration_date = domain.registration_date
         
@@ -840,10 +2038,16 @@ def update_domain(domain_id):
                 domain.renewal_date = new_registration_date
                 print(f"注册日期发生变化，更新 renewal_date 为: {domain.renewal_date}")
         
+        domain.refresh_alert_times()
+        summary_delta.add(domain)
+        summary_delta.apply()
         db.session.commit()
+        schedule_next_alert_check()
+        bump_domain_data_version()
         
         return jsonify({'success': True, 'message': '域名更新成功！'})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': f'更新失败: {str(e)}'})
 
 # 路由：删除域名
@@ -857,11 +2061,16 @@ def delete_domain(domain_id):
         if domain.user_id != session['user_id']:
             return jsonify({'success': False, 'message': '无权操作'})
         
+        summary_delta = DomainSummaryDelta()
+        summary_delta.remove(domain)
         db.session.delete(domain)
+        summary_delta.apply()
         db.session.commit()
+        bump_domain_data_version()
         
         return jsonify({'success': True, 'message': '域名删除成功！'})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': f'删除失败: {str(e)}'})
 
 # 路由：获取域名数据（用于编辑）
@@ -924,6 +2133,8 @@ def renew_domain(domain_id):
         # 记录旧的到期日期和续费日期
         old_expiration = domain.expiration_date
         old_renewal_date = domain.renewal_date
+        summary_delta = DomainSummaryDelta()
+        summary_delta.remove(domain)
         
         # 更新到期日期和续费日期
         domain.expiration_date = new_expiration
@@ -936,8 +2147,13 @@ def renew_domain(domain_id):
             domain.danger_sent = False
         if hasattr(domain, 'last_checked'):
             domain.last_checked = datetime.utcnow()
+        domain.refresh_alert_times()
+        summary_delta.add(domain)
+        summary_delta.apply()
         
         db.session.commit()
+        schedule_next_alert_check()
+        bump_domain_data_version()
         
         # 记录续费操作日志
         logger.info(f"域名续费成功 - 域名: {domain.name}, 旧到期日: {old_expiration.strftime('%Y-%m-%d')}, 新到期日: {new_expiration.strftime('%Y-%m-%d')}, 旧续费日: {old_renewal_date.strftime('%Y-%m-%d') if old_renewal_date else '无'}, 新续费日: {domain.renewal_date.strftime('%Y-%m-%d')}, 操作人: {session.get('username')}")
@@ -964,153 +2180,156 @@ def renew_domain(domain_id):
 def trigger_domain_check():
     """手动触发域名检查"""
     try:
-        print("=" * 50)
-        print("手动触发域名检查...")
-        
         # 检查SMTP配置
-        config = SMTPConfig.query.first()
+        config = smtp_settings.get()
         if not config:
-            print("❌ SMTP配置不存在")
             return jsonify({'success': False, 'message': 'SMTP配置不存在'})
         
         if not config.enabled:
-            print("❌ SMTP未启用")
             return jsonify({'success': False, 'message': 'SMTP未启用'})
         
-        print(f"✅ SMTP配置状态: 已启用")
-        print(f"📧 管理员邮箱: {config.admin_email}")
-        print(f"🔧 邮件服务器: {config.mail_server}:{config.mail_port}")
-        
-        # 检查域名数据
-        domains = Domain.query.all()
-        print(f"🌐 域名数量: {len(domains)}")
-        
-        for domain in domains:
-            days_remaining = domain.days_remaining()
-            print(f"  域名: {domain.name}, 剩余天数: {days_remaining}, 续费日期: {domain.renewal_date}, 到期日期: {domain.expiration_date}")
+        logger.info('手动触发域名检查', extra={'user': session.get('username')})
         
         # 执行检查
-        check_domain_expiry()
+        check_due_domains()
         
-        return jsonify({'success': True, 'message': '域名检查已完成，请查看控制台输出'})
+        return jsonify({'success': True, 'message': '域名检查已完成，请查看日志'})
     except Exception as e:
-        print(f"❌ 手动触发失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('手动触发域名检查失败')
         return jsonify({'success': False, 'message': f'检查失败: {str(e)}'})
 
+# 路由：通过RDAP刷新当前用户域名的到期日期和注册商
+@app.route('/refresh_registration', methods=['POST'])
+@login_required
+def refresh_registration():
+    try:
+        summary = refresh_domain_registrations(user_id=session['user_id'])
+        return jsonify({
+            'success': True,
+            'message': f"已查询 {summary['checked']} 个域名，更新 {summary['updated']} 个",
+            'summary': summary
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'刷新失败: {str(e)}'})
+
+# 路由：立即检查当前用户域名的DNS解析
+@app.route('/probe_dns', methods=['POST'])
+@login_required
+def probe_dns():
+    try:
+        summary = probe_domain_dns(user_id=session['user_id'])
+        return jsonify({
+            'success': True,
+            'message': f"已检查 {summary['checked']} 个域名，{summary['failed']} 个解析异常",
+            'summary': summary
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'DNS检查失败: {str(e)}'})
+
+# 路由：立即检查当前用户域名的HTTPS证书
+@app.route('/probe_certificates', methods=['POST'])
+@login_required
+def probe_certificates():
+    try:
+        summary = probe_domain_certificates(user_id=session['user_id'])
+        return jsonify({
+            'success': True,
+            'message': f"已检查 {summary['checked']} 个域名，{summary['failed']} 个失败，发送 {summary['alerts']} 封证书提醒",
+            'summary': summary
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'证书检查失败: {str(e)}'})
+
+# 路由：查看发件箱
+@app.route('/alert_outbox')
+@login_required
+def alert_outbox():
+    """各状态的邮件数和最近的邮件（默认只列出失败的），?status=pending|sending|sent|failed&limit="""
+    if session.get('username') != 'admin':
+        return jsonify({'success': False, 'message': '只有管理员可以查看发件箱'})
+    
+    status = request.args.get('status', STATUS_FAILED)
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    items = AlertOutbox.query.filter_by(status=status).order_by(AlertOutbox.id.desc()).limit(limit).all()
+    fmt = lambda value: value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+    return jsonify({
+        'success': True,
+        'counts': outbox_counts(db.engine, AlertOutbox.__table__),
+        'items': [{
+            'id': item.id,
+            'kind': item.kind,
+            'idempotency_key': item.idempotency_key,
+            'recipient': item.recipient,
+            'subject': item.subject,
+            'status': item.status,
+            'attempts': item.attempts,
+            'next_attempt_at': fmt(item.next_attempt_at),
+            'last_error': item.last_error,
+            'created_at': fmt(item.created_at),
+            'sent_at': fmt(item.sent_at),
+        } for item in items]
+    })
+
+# 路由：重新投递发件箱中的邮件
+@app.route('/alert_outbox/replay', methods=['POST'])
+@login_required
+def replay_alert_outbox():
+    """请求JSON: {"ids": [...]}，不传 ids 时重新投递所有失败的邮件"""
+    if session.get('username') != 'admin':
+        return jsonify({'success': False, 'message': '只有管理员可以重新投递邮件'})
+    
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if ids is not None:
+        try:
+            ids = parse_batch_ids(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
+    try:
+        count = get_outbox_dispatcher().replay(ids)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'重新投递失败: {str(e)}'})
+    return jsonify({'success': True, 'message': f'已重新投递 {count} 封邮件', 'count': count})
+
+# 路由：运行指标（Prometheus 文本格式）
+@app.route('/metrics')
+def metrics_endpoint():
+    """供 Prometheus 抓取；设置了 METRICS_TOKEN 时需要 Bearer 令牌"""
+    if not app.config['METRICS_ENABLED']:
+        return Response('metrics disabled\n', status=404, mimetype='text/plain')
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 # 路由：立即发送测试邮件
 @app.route('/send_test_now', methods=['POST'])
 @login_required
 def send_test_now():
     """立即发送测试邮件"""
     try:
-        print("🚀 立即发送测试邮件...")
-        
-        config = SMTPConfig.query.first()
+        config = smtp_settings.get()
         if not config or not config.enabled:
             return jsonify({'success': False, 'message': 'SMTP未启用或未配置'})
         
         subject = "域名监控系统 - 立即测试邮件"
-        body = f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>立即测试邮件</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            margin: 0;
-            padding: 0;
-            background-color: #f6f6f6;
-        }}
-        .container {{
-            max-width: 600px;
-            margin: 0 auto;
-            background-color: #ffffff;
-            border-radius: 8px;
-            overflow: hidden;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-        }}
-        .header {{
-            background: linear-gradient(135deg, #007bff, #ffffff);
-            color: white;
-            padding: 30px 20px;
-            text-align: center;
-        }}
-        .header h1 {{
-            margin: 0;
-            font-size: 24px;
-            font-weight: 600;
-        }}
-        .content {{
-            padding: 30px;
-        }}
-        .success-icon {{
-            font-size: 48px;
-            margin-bottom: 20px;
-            color: #28a745;
-        }}
-        .details {{
-            background-color: #f8f9fa;
-            border-left: 4px solid #007bff;
-            padding: 20px;
-            margin: 20px 0;
-            border-radius: 4px;
-        }}
-        .footer {{
-            background-color: #f8f9fa;
-            padding: 20px;
-            text-align: center;
-            font-size: 12px;
-            color: #666;
-            border-top: 1px solid #e9ecef;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div class="success-icon">✅</div>
-            <h1>立即测试邮件</h1>
-        </div>
-        
-        <div class="content">
-            <p>这是一封立即测试邮件，用于验证邮件发送功能是否正常。</p>
-            
-            <div class="details">
-                <p><strong>测试详情：</strong></p>
-                <p>📧 收件人：{config.admin_email}</p>
-                <p>🔧 邮件服务器：{config.mail_server}:{config.mail_port}</p>
-                <p>⏰ 发送时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}</p>
-            </div>
-            
-            <p>如果您收到了这封邮件，说明邮件发送功能正常工作。</p>
-        </div>
-        
-        <div class="footer">
-            <p>此邮件由 <strong>域名监控系统</strong> 自动发送</p>
-            <p>发送时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}</p>
-            <p style="margin-top: 10px; font-size: 10px; color: #999;">
-                此为系统自动发送的测试邮件，请勿直接回复
-            </p>
-        </div>
-    </div>
-</body>
-</html>
-        """
+        body = create_test_email_template(
+            config,
+            title='立即测试邮件',
+            intro='这是一封立即测试邮件，用于验证邮件发送功能是否正常。',
+            outro='如果您收到了这封邮件，说明邮件发送功能正常工作。'
+        )
         
         # 使用异步发送
         send_email_async(subject, config.admin_email, body)
         
-        return jsonify({'success': True, 'message': '测试邮件已发送，请查看控制台输出和邮箱'})
+        return jsonify({'success': True, 'message': '测试邮件已发送，请查看日志和邮箱'})
         
     except Exception as e:
-        print(f"❌ 立即测试失败: {str(e)}")
+        logger.exception('立即发送测试邮件失败')
         return jsonify({'success': False, 'message': f'测试失败: {str(e)}'})
 
 # 路由：重置域名邮件发送状态
@@ -1128,7 +2347,9 @@ def reset_domain_flags(domain_id):
         # 重置邮件发送状态
         domain.warning_sent = False
         domain.danger_sent = False
+        domain.refresh_alert_times()
         db.session.commit()
+        schedule_next_alert_check()
         
         return jsonify({
             'success': True, 
@@ -1151,10 +2372,12 @@ def reset_all_domain_flags():
             if domain.warning_sent or domain.danger_sent:
                 domain.warning_sent = False
                 domain.danger_sent = False
+                domain.refresh_alert_times()
                 reset_count += 1
         
         if reset_count > 0:
             db.session.commit()
+            schedule_next_alert_check()
             return jsonify({
                 'success': True, 
                 'message': f'已重置 {reset_count} 个域名的邮件发送状态'
@@ -1168,8 +2391,284 @@ def reset_all_domain_flags():
     except Exception as e:
         return jsonify({'success': False, 'message': f'重置失败: {str(e)}'})
 
-def setup_scheduler():
-    """设置定时任务调度器"""
+# 批量操作
+def parse_batch_ids(data):
+    """从请求JSON中取出去重后的域名ID列表"""
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ValueError('请选择要操作的域名')
+    try:
+        ids = list(dict.fromkeys(int(domain_id) for domain_id in ids))
+    except (TypeError, ValueError):
+        raise ValueError('无效的域名ID')
+    if len(ids) > app.config['BATCH_MAX_IDS']:
+        raise ValueError(f"一次最多操作 {app.config['BATCH_MAX_IDS']} 个域名")
+    return ids
+
+def load_owned_domains(ids, user_id):
+    """用一次查询取出所有域名并检查归属
+    
+    Returns:
+        tuple: ({ID: 属于当前用户的域名}, {ID: 失败结果})
+    """
+    domains = {domain.id: domain for domain in Domain.query.filter(Domain.id.in_(ids)).all()}
+    owned, failed = {}, {}
+    for domain_id in ids:
+        domain = domains.get(domain_id)
+        if domain is None:
+            failed[domain_id] = {'id': domain_id, 'success': False, 'message': '域名不存在'}
+        elif domain.user_id != user_id:
+            failed[domain_id] = {'id': domain_id, 'success': False, 'message': '无权操作此域名'}
+        else:
+            owned[domain_id] = domain
+    return owned, failed
+
+def batch_response(ids, owned, failed, message, details=None):
+    """按请求的ID顺序返回每个域名的结果
+    
+    Args:
+        details: 可选函数，为成功的域名返回附加字段
+    """
+    results = []
+    for domain_id in ids:
+        result = failed.get(domain_id)
+        if result is None:
+            domain = owned[domain_id]
+            result = {'id': domain_id, 'name': domain.name, 'success': True}
+            if details:
+                result.update(details(domain))
+        results.append(result)
+    return jsonify({'success': True, 'message': message, 'results': results})
+
+def extend_by_renewal_period(expiration_date, renewal_period):
+    """按续费周期（取其中的第一个数字作为年数，默认1年）延后到期日期，与仪表盘续费弹窗的计算一致"""
+    match = re.search(r'\d+', renewal_period or '')
+    years = int(match.group()) if match else 1
+    try:
+        return expiration_date.replace(year=expiration_date.year + years)
+    except ValueError:
+        # 2月29日延后到非闰年
+        return expiration_date.replace(year=expiration_date.year + years, day=28)
+
+# 路由：批量续费
+@app.route('/batch_renew_domains', methods=['POST'])
+@login_required
+def batch_renew_domains():
+    """请求JSON: {"ids": [...], "new_expiration_date": "YYYY-MM-DD"}，
+    不提供 new_expiration_date 时每个域名按各自的续费周期延后"""
+    data = request.get_json(silent=True)
+    try:
+        ids = parse_batch_ids(data)
+        new_expiration = data.get('new_expiration_date')
+        if new_expiration:
+            new_expiration = datetime.strptime(new_expiration, '%Y-%m-%d')
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    
+    try:
+        owned, failed = load_owned_domains(ids, session['user_id'])
+        now = datetime.utcnow()
+        summary_delta = DomainSummaryDelta(now)
+        for domain_id, domain in owned.items():
+            if not domain.needs_renewal:
+                failed[domain_id] = {'id': domain_id, 'name': domain.name, 'success': False, 'message': '永久域名无需续费'}
+                continue
+            summary_delta.remove(domain)
+            domain.expiration_date = new_expiration or extend_by_renewal_period(domain.expiration_date, domain.renewal_period)
+            domain.renewal_date = now
+            domain.warning_sent = False
+            domain.danger_sent = False
+            domain.last_checked = now
+            domain.refresh_alert_times()
+            summary_delta.add(domain)
+        summary_delta.apply()
+        # 所有修改在一个事务中提交，UPDATE 按批次执行
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'批量续费失败: {str(e)}'})
+    
+    renewed = [domain for domain_id, domain in owned.items() if domain_id not in failed]
+    if renewed:
+        schedule_next_alert_check()
+        bump_domain_data_version()
+    logger.info(f"批量续费 - 成功 {len(renewed)} 个, 失败 {len(failed)} 个, 操作人: {session.get('username')}")
+    return batch_response(
+        ids, owned, failed, f'已续费 {len(renewed)} 个域名，失败 {len(failed)} 个',
+        details=lambda domain: {'new_expiration': domain.expiration_date.strftime('%Y-%m-%d')}
+    )
+
+# 路由：批量修改域名字段
+@app.route('/batch_update_domains', methods=['POST'])
+@login_required
+def batch_update_domains():
+    """请求JSON: {"ids": [...], "fields": {"registrar": ..., "warning_threshold": ...}}，
+    所有域名的这些字段设为同一个值"""
+    data = request.get_json(silent=True)
+    try:
+        ids = parse_batch_ids(data)
+        values = parse_batch_fields(data.get('fields'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    
+    try:
+        owned, failed = load_owned_domains(ids, session['user_id'])
+        summary_delta = DomainSummaryDelta()
+        for domain in owned.values():
+            summary_delta.remove(domain)
+            for key, value in values.items():
+                setattr(domain, key, value)
+            domain.refresh_alert_times()
+            summary_delta.add(domain)
+        summary_delta.apply()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'批量修改失败: {str(e)}'})
+    
+    if owned:
+        schedule_next_alert_check()
+        bump_domain_data_version()
+    return batch_response(ids, owned, failed, f'已修改 {len(owned)} 个域名，失败 {len(failed)} 个')
+
+# 路由：批量删除
+@app.route('/batch_delete_domains', methods=['POST'])
+@login_required
+def batch_delete_domains():
+    """请求JSON: {"ids": [...]}"""
+    try:
+        ids = parse_batch_ids(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    
+    try:
+        owned, failed = load_owned_domains(ids, session['user_id'])
+        if owned:
+            summary_delta = DomainSummaryDelta()
+            # 移出会话，提交后仍可读取已加载的域名名称用于返回结果
+            for domain in owned.values():
+                summary_delta.remove(domain)
+                db.session.expunge(domain)
+            # 一条DELETE语句删除所有属于当前用户的域名
+            db.session.execute(
+                db.delete(Domain)
+                .where(Domain.id.in_(list(owned)), Domain.user_id == session['user_id'])
+                .execution_options(synchronize_session=False)
+            )
+            summary_delta.apply()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'批量删除失败: {str(e)}'})
+    
+    if owned:
+        schedule_next_alert_check()
+        bump_domain_data_version()
+    return batch_response(ids, owned, failed, f'已删除 {len(owned)} 个域名，失败 {len(failed)} 个')
+
+# 路由：批量重置邮件发送状态
+@app.route('/batch_reset_domain_flags', methods=['POST'])
+@login_required
+def batch_reset_domain_flags():
+    """请求JSON: {"ids": [...]}"""
+    try:
+        ids = parse_batch_ids(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    
+    try:
+        owned, failed = load_owned_domains(ids, session['user_id'])
+        for domain in owned.values():
+            domain.warning_sent = False
+            domain.danger_sent = False
+            domain.refresh_alert_times()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'批量重置失败: {str(e)}'})
+    
+    if owned:
+        schedule_next_alert_check()
+    return batch_response(ids, owned, failed, f'已重置 {len(owned)} 个域名的邮件发送状态，失败 {len(failed)} 个')
+
+def purge_alert_outbox():
+    deleted = get_outbox_dispatcher().purge(app.config['OUTBOX_RETENTION_DAYS'])
+    if deleted:
+        logger.info('发件箱清理完成', extra={'deleted': deleted,
+                                          'retention_days': app.config['OUTBOX_RETENTION_DAYS']})
+
+# 后台调度器（只在调度器主进程中由 start_scheduler 创建）
+scheduler = None
+# 调度器主进程租约（启用选举时由 setup_scheduler 创建）
+scheduler_lease = None
+
+def check_due_domains():
+    """检查提醒已到期的域名，然后按最早的下次提醒时间重新安排"""
+    try:
+        check_domain_expiry()
+    finally:
+        schedule_next_alert_check(retry_delay=app.config['ALERT_RETRY_SECONDS'])
+
+def schedule_next_alert_check(retry_delay=1):
+    """按最早的 next_alert_at 安排下一次检查，没有待提醒域名时不安排
+    
+    Args:
+        retry_delay: 最早的提醒时间已经过去（例如SMTP未启用导致未能发送）时，延迟多少秒再检查
+    """
+    if scheduler is None:
+        return
+    with app.app_context():
+        next_due = db.session.query(db.func.min(Domain.next_alert_at)).filter(
+            Domain.needs_renewal == True
+        ).scalar()
+    if next_due is None:
+        if scheduler.get_job('domain_due_check'):
+            scheduler.remove_job('domain_due_check')
+        return
+    from apscheduler.triggers.date import DateTrigger
+    import pytz
+    
+    now = datetime.utcnow()
+    run_at = next_due if next_due > now else now + timedelta(seconds=retry_delay)
+    scheduler.add_job(
+        func=check_due_domains,
+        trigger=DateTrigger(run_date=run_at, timezone=pytz.utc),
+        id='domain_due_check',
+        name='域名提醒到期检查',
+        replace_existing=True
+    )
+
+def sync_next_alert_check():
+    """主进程每次续约时调用
+    
+    其他进程修改域名后无法直接调整本进程的调度器，
+    所以数据库中最早的提醒时间早于已安排的检查（或尚未安排）时重新安排
+    """
+    if scheduler is None:
+        return
+    with app.app_context():
+        next_due = db.session.query(db.func.min(Domain.next_alert_at)).filter(
+            Domain.needs_renewal == True
+        ).scalar()
+    if next_due is None:
+        return
+    retry_delay = app.config['ALERT_RETRY_SECONDS']
+    # 最早的提醒时间已经过去时，已安排的重试只要不晚于 当前时间 + 重试间隔 就保留，
+    # 否则每次续约都会把重试往后推，永远不会执行
+    bound = max(next_due, datetime.utcnow() + timedelta(seconds=retry_delay)).replace(tzinfo=timezone.utc)
+    job = scheduler.get_job('domain_due_check')
+    if job and job.next_run_time and job.next_run_time <= bound:
+        return
+    schedule_next_alert_check(retry_delay=retry_delay)
+
+def start_scheduler():
+    """创建并启动定时任务调度器（未启用选举，或本进程成为主进程时调用）"""
+    global scheduler
+    # APScheduler 和 pytz 只在运行定时任务的进程中导入
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.cron import CronTrigger
+    import pytz
+    
     try:
         # 创建调度器
         scheduler = BackgroundScheduler()
@@ -1179,81 +2678,262 @@ def setup_scheduler():
         
         # 添加域名检查任务 - 每天上午8:30执行
         scheduler.add_job(
-            func=check_domain_expiry,
+            func=check_due_domains,
             trigger=CronTrigger(hour=8, minute=30, timezone=beijing_tz),
             id='domain_daily_check',
             name='域名到期每日检查',
             replace_existing=True
         )
         
-        # 添加快速测试任务 - 每10分钟执行一次（用于测试）
+        # 每天凌晨3:00通过RDAP刷新到期日期，赶在每日检查之前修正被自动续费的域名
+        if app.config['RDAP_REFRESH_ENABLED']:
+            scheduler.add_job(
+                func=refresh_domain_registrations,
+                trigger=CronTrigger(hour=3, minute=0, timezone=beijing_tz),
+                id='domain_registration_refresh',
+                name='域名注册信息刷新',
+                replace_existing=True
+            )
+        
+        # 定期检查DNS解析
+        if app.config['DNS_PROBE_ENABLED']:
+            scheduler.add_job(
+                func=probe_domain_dns,
+                trigger='interval',
+                minutes=app.config['DNS_PROBE_INTERVAL'],
+                id='domain_dns_probe',
+                name='域名DNS解析检查',
+                replace_existing=True
+            )
+        
+        # 定期检查HTTPS证书到期时间
+        if app.config['TLS_PROBE_ENABLED']:
+            scheduler.add_job(
+                func=probe_domain_certificates,
+                trigger='interval',
+                hours=app.config['TLS_PROBE_INTERVAL'],
+                id='domain_tls_probe',
+                name='域名HTTPS证书检查',
+                replace_existing=True
+            )
+        
+        # 每天凌晨4:00清理发件箱中早已发送成功的邮件
+        scheduler.add_job(
+            func=purge_alert_outbox,
+            trigger=CronTrigger(hour=4, minute=0, timezone=beijing_tz),
+            id='alert_outbox_purge',
+            name='发件箱清理',
+            replace_existing=True
+        )
+        
+        # 每天UTC零点后重新统计各用户的域名状态汇总（跨天后域名状态会变化）
         scheduler.add_job(
-            func=check_domain_expiry,
-            trigger=CronTrigger(minute='*/10'),  # 每10分钟
-            id='domain_test_check',
-            name='域名到期测试检查',
+            func=refresh_domain_summaries,
+            trigger=CronTrigger(hour=0, minute=1, timezone=pytz.utc),
+            id='domain_summary_refresh',
+            name='域名状态汇总统计',
             replace_existing=True
         )
         
         # 启动调度器
         scheduler.start()
-        
-        # 注册关闭钩子
-        atexit.register(lambda: scheduler.shutdown())
-        
-        print("=" * 60)
-        print("🚀 定时任务调度器已启动")
-        print("📅 每日检查: 上午8:30 (北京时间)")
-        print("🧪 测试检查: 每10分钟一次")
-        
-        # 检查SMTP状态
-        with app.app_context():
-            config = SMTPConfig.query.first()
-            if config and config.enabled:
-                print(f"✅ SMTP状态: 已启用 - {config.mail_server}:{config.mail_port}")
-                print(f"📧 管理员邮箱: {config.admin_email}")
-            else:
-                print("❌ SMTP状态: 未启用或未配置")
-        
-        print("=" * 60)
+        # 发件箱投递线程与调度器一起只在主进程中运行
+        get_outbox_dispatcher().start()
+        
+        # 按最早的提醒到期时间安排检查，域名变更时会重新安排
+        schedule_next_alert_check()
+        
+        due_job = scheduler.get_job('domain_due_check')
+        config = smtp_settings.get()
+        logger.info('定时任务调度器已启动', extra={
+            'jobs': ','.join(job.id for job in scheduler.get_jobs()),
+            'next_alert_check': due_job.next_run_time.isoformat() if due_job else None,
+            'smtp_enabled': bool(config and config.enabled),
+        })
+        if not (config and config.enabled):
+            logger.warning('SMTP未启用或未配置，到期提醒不会发送')
         
         return scheduler
         
-    except Exception as e:
-        print(f"❌ 调度器启动失败: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception('调度器启动失败')
         return None
 
+def stop_scheduler():
+    """停止调度器（失去主进程身份或退出时调用），正在执行的任务继续执行完"""
+    global scheduler
+    current, scheduler = scheduler, None
+    if current is not None and current.running:
+        current.shutdown(wait=False)
+        get_outbox_dispatcher().stop()
+        logger.info('定时任务调度器已停止')
 
-if __name__ == '__main__':
+def setup_scheduler():
+    """设置定时任务调度器
+    
+    启用主进程选举时先竞争数据库中的租约，只有持有租约的进程启动调度器；
+    主进程退出后其他进程在租约过期后接管
+    """
+    global scheduler_lease
+    if app.config['SCHEDULER_LEADER_ELECTION']:
+        from leader import LeaderLease
+
+
+        with app.app_context():
+            engine = db.engine
+        scheduler_lease = LeaderLease(
+            engine, SchedulerLease.__table__,
+            ttl=app.config['SCHEDULER_LEASE_TTL'],
+            interval=app.config['SCHEDULER_LEASE_INTERVAL'],
+            on_acquire=start_scheduler,
+            on_release=stop_scheduler,
+            on_renew=sync_next_alert_check
+        )
+        scheduler_lease.start()
+        if not scheduler_lease.is_leader:
+            logger.info('调度器租约由其他进程持有，本进程待命', extra={
+                'holder': scheduler_lease.holder, 'retry_interval': scheduler_lease.interval})
+    else:
+        start_scheduler()
+    
+    # 注册关闭钩子：先停止调度器并释放租约，再发送完队列中剩余的邮件
+    def shutdown():
+        if scheduler_lease is not None:
+            scheduler_lease.stop()
+        stop_scheduler()
+        if get_mail_dispatcher.instance is not None:
+            get_mail_dispatcher.instance.stop()
+    atexit.register(shutdown)
+    return scheduler
+
+
+def prepare_database():
+    """首次运行时初始化数据库，否则检查数据库结构是否需要迁移（需要时退出）"""
     from init_db import init_database
 
-    # 初始化数据库
-    if not os.path.exists('domain.db'):
+    with app.app_context():
+        first_run = not database_ready(db)
+    if first_run:
         init_database()
+        return
+    # 检查是否需要迁移
+    try:
+        with app.app_context():
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('domain')]
+            indexes = [index['name'] for index in inspector.get_indexes('domain')]
+            smtp_columns = [col['name'] for col in inspector.get_columns('smtp_config')]
+            if ('needs_renewal' not in columns or 'next_alert_at' not in columns
+                    or 'danger_at' not in columns
+                    or 'dns_status' not in columns
+                    or 'tls_expires_at' not in columns
+                    or 'ix_domain_expiration_date' not in indexes
+                    or 'ix_domain_user_expiration' not in indexes
+                    or 'digest_mode' not in smtp_columns
+                    or not inspector.has_table('scheduler_lease')
+                    or not inspector.has_table('alert_outbox')
+                    or not inspector.has_table('domain_summary')
+                    or not inspector.has_table('data_version')):
+                print("\n" + "=" * 60)
+                print("⚠️  检测到数据库需要迁移！")
+                print("=" * 60)
+                print("请先运行以下命令进行数据库迁移：")
+                print("  python migrate.py")
+                print("=" * 60)
+                print("迁移完成后，再运行 app.py 启动应用")
+                print("=" * 60 + "\n")
+                sys.exit(1)
+    except Exception as e:
+        print(f"⚠️  检查数据库结构时出错: {e}")
+        print("如果这是首次运行，请删除数据库（默认 instance/domain.db）后重新运行")
+        sys.exit(1)
+
+def init_request_hooks():
+    """注册请求指标和性能分析钩子（只在处理HTTP请求的进程中需要）"""
+    global request_profiler
+    if app.config['METRICS_ENABLED']:
+        app.before_request(start_request_timer)
+        app.after_request(record_request_metrics)
+    if app.config['PROFILING_ENABLED']:
+        from profiling import RequestProfiler
+
+        with app.app_context():
+            request_profiler = RequestProfiler(
+                db.engine,
+                slow_threshold=app.config['PROFILING_SLOW_MS'] / 1000,
+                profile_dir=app.config['PROFILING_DIR'],
+                sample_rate=app.config['PROFILING_SAMPLE_RATE'],
+                token=app.config['PROFILING_TOKEN']
+            ).init_app(app)
+
+def init_database_binding():
+    """把数据库绑定到应用：创建引擎（不建立连接）并设置 SQLite 连接参数"""
+    db.init_app(app)
+    init_storage(app, db)
+
+# 各运行模式需要初始化的子系统
+APP_MODES = {
+    'web': ('logging', 'storage', 'database', 'request_hooks', 'scheduler'),
+    'worker': ('logging', 'storage', 'database', 'scheduler'),
+    'cli': ('logging', 'storage'),
+}
+# 本进程已经初始化的子系统
+initialized_subsystems = set()
+
+def create_app(mode='web', run_scheduler=None):
+    """按运行模式初始化子系统并返回应用，重复调用时只初始化尚未初始化的部分
+    
+    导入本模块只创建应用、声明模型和注册路由；日志、数据库引擎、数据库检查、请求钩子和定时任务都在这里按需初始化。
+    邮件投递器、发件箱投递器和各检查器在第一次使用时才导入和创建（见 lazy_instance），不需要单独初始化
+    
+    Args:
+        mode: web（处理HTTP请求）、worker（只运行定时任务）或 cli（命令行脚本，只配置日志和数据库引擎）
+        run_scheduler: 是否运行定时任务，默认 worker 模式运行、web 模式按 SCHEDULER_ENABLED 决定
+    """
+    if mode not in APP_MODES:
+        raise ValueError(f'未知的运行模式: {mode}')
+    subsystems = list(APP_MODES[mode])
+    if 'scheduler' in subsystems:
+        enabled = run_scheduler if run_scheduler is not None else (mode == 'worker' or app.config['SCHEDULER_ENABLED'])
+        if not enabled:
+            subsystems.remove('scheduler')
+    for name in subsystems:
+        if name in initialized_subsystems:
+            continue
+        if name == 'logging':
+            configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+        elif name == 'storage':
+            init_database_binding()
+        elif name == 'database':
+            prepare_database()
+        elif name == 'request_hooks':
+            init_request_hooks()
+        elif name == 'scheduler':
+            setup_scheduler()
+        initialized_subsystems.add(name)
+    return app
+
+def run_worker():
+    """worker 模式：只运行定时任务，直到收到 SIGTERM 或 Ctrl+C"""
+    stop = threading.Event()
+    # SIGTERM 默认直接结束进程，不会执行 atexit 中的关闭钩子（释放租约、发送完剩余邮件）
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    logger.info('worker 进程已启动')
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    # python app.py [web|worker]
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'web'
+    if mode not in ('web', 'worker'):
+        print("用法: python app.py [web|worker]")
+        sys.exit(2)
+    create_app(mode)
+    if mode == 'worker':
+        run_worker()
     else:
-        # 检查是否需要迁移
-        try:
-            with app.app_context():
-                inspector = db.inspect(db.engine)
-                columns = [col['name'] for col in inspector.get_columns('domain')]
-                if 'needs_renewal' not in columns:
-                    print("\n" + "=" * 60)
-                    print("⚠️  检测到数据库需要迁移！")
-                    print("=" * 60)
-                    print("请先运行以下命令进行数据库迁移：")
-                    print("  python migrate.py")
-                    print("=" * 60)
-                    print("迁移完成后，再运行 app.py 启动应用")
-                    print("=" * 60 + "\n")
-                    exit(1)
-        except Exception as e:
-            print(f"⚠️  检查数据库结构时出错: {e}")
-            print("如果这是首次运行，请删除 domain.db 后重新运行")
-            exit(1)
-    
-    # 设置定时任务
-    scheduler = setup_scheduler()
-
-    app.run(host="0.0.0.0", port=8000, debug=True)
\ No newline at end of file
+        app.run(host="0.0.0.0", port=8000, debug=True)
@@ -0,0 +1 @@
+"""性能测试脚本，在项目根目录运行: python -m benchmarks.<脚本名>"""
@@ -0,0 +1,34 @@
+"""
+DNS解析检查吞吐量测试
+对比逐个检查和线程池并发检查
+运行方式: python -m benchmarks.bench_dns [域名数量] [替身延迟毫秒]
+"""
+
+import sys
+
+from dnsprobe import DNSProber
+from benchmarks.dns_stub import DNSStub, stub_records
+
+
+def report(name, stub, stats):
+    print(f"{name:<12} {stats['probes']:>6} 个  {stats['elapsed']:>7.3f} 秒  "
+          f"{stats['probes_per_second']:>9.1f} 个/秒  查询 {stub.queries:>6}  失败 {stats['failed']}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 10) / 1000
+    names = [f'bench-{i}.com' for i in range(count)]
+
+    with DNSStub(latency=latency) as stub:
+        _, stats = DNSProber(stub.address, workers=1).probe_all(names)
+        report('逐个检查', stub, stats)
+
+    with DNSStub(latency=latency) as stub:
+        results, stats = DNSProber(stub.address, workers=32).probe_all(names)
+        assert all(results[name].a == stub_records(name, 1) for name in names)
+        report('并发(32)', stub, stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+调度器主进程故障切换测试
+启动多个进程竞争同一个 SQLite 文件中的租约，反复强制杀死（SIGKILL，不释放租约）或正常停止当前主进程，
+检查任意时刻只有一个主进程，并统计其他进程接管所需的时间
+运行方式: python -m benchmarks.bench_leader [进程数] [轮数] [租约秒数]
+"""
+
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from app import SchedulerLease
+from leader import LeaderLease
+from storage import install_sqlite_pragmas, sqlite_pragmas
+
+
+def make_engine(path):
+    engine = create_engine(f'sqlite:///{path}')
+    install_sqlite_pragmas(engine, sqlite_pragmas({}))
+    return engine
+
+
+def worker(path, index, ttl, interval, events):
+    lease = LeaderLease(
+        make_engine(path), SchedulerLease.__table__, ttl=ttl, interval=interval,
+        holder=f'worker-{index}',
+        on_acquire=lambda: events.put(('acquire', index, time.time())),
+        on_release=lambda: events.put(('release', index, time.time())),
+    )
+
+    def terminate(signum, frame):
+        lease.stop()
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    lease.start()
+    while True:
+        time.sleep(1)
+
+
+def wait_acquire(events, timeout):
+    """等待下一次 acquire 事件，期间的 release 事件忽略"""
+    deadline = time.time() + timeout
+    while True:
+        kind, index, at = events.get(timeout=max(0.01, deadline - time.time()))
+        if kind == 'acquire':
+            return index, at
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    ttl = float(sys.argv[3]) if len(sys.argv) > 3 else 3
+    interval = ttl / 5
+    workdir = tempfile.mkdtemp(prefix='bench-leader-')
+    path = os.path.join(workdir, 'domain.db')
+    SchedulerLease.__table__.create(make_engine(path))
+
+    ctx = multiprocessing.get_context('spawn')
+    events = ctx.Queue()
+    processes = {}
+
+    def spawn(index):
+        process = ctx.Process(target=worker, args=(path, index, ttl, interval, events), daemon=True)
+        process.start()
+        processes[index] = process
+
+    print(f"{count} 个进程，租约 {ttl:g} 秒，每 {interval:g} 秒续约/尝试一次")
+    try:
+        for index in range(count):
+            spawn(index)
+        leader, _ = wait_acquire(events, 30)
+        next_index = count
+        results = {'SIGKILL': [], 'SIGTERM': []}
+        for round_num in range(rounds):
+            # 先确认这段时间没有其他进程同时成为主进程
+            time.sleep(interval * 3)
+            try:
+                kind, index, _ = events.get_nowait()
+                raise AssertionError(f'主进程 worker-{leader} 存活时 worker-{index} 发生了 {kind}')
+            except queue.Empty:
+                pass
+
+            sig = signal.SIGKILL if round_num % 2 == 0 else signal.SIGTERM
+            name = 'SIGKILL' if sig == signal.SIGKILL else 'SIGTERM'
+            killed_at = time.time()
+            os.kill(processes[leader].pid, sig)
+            processes[leader].join()
+            new_leader, acquired_at = wait_acquire(events, ttl * 4)
+            assert new_leader != leader
+            failover = acquired_at - killed_at
+            results[name].append(failover)
+            print(f"第 {round_num + 1} 轮: {name} worker-{leader} → worker-{new_leader} 接管用时 {failover:.2f} 秒")
+            leader = new_leader
+            # 补充一个进程，保持竞争者数量
+            spawn(next_index)
+            next_index += 1
+
+        for name, values in results.items():
+            if values:
+                print(f"{name}: 平均 {sum(values) / len(values):.2f} 秒, 最长 {max(values):.2f} 秒"
+                      f"（上限约为 {'租约+间隔' if name == 'SIGKILL' else '间隔'} "
+                      f"{ttl + interval if name == 'SIGKILL' else interval:.2f} 秒）")
+        print("✅ 每轮都只有一个主进程")
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
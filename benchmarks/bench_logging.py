@@ -0,0 +1,98 @@
+"""
+日志写出开销测试
+多个线程同时输出日志（类似检查任务和邮件发送线程），对比直接 print、同步的 StreamHandler
+和 logconfig.py 的队列方式下调用方花费的时间。
+分别写到 /dev/null 和每次写入都要等待的慢速输出（模拟日志管道被容器日志驱动拖慢）
+运行方式: python -m benchmarks.bench_logging [线程数] [每线程条数] [慢速输出每次写入的微秒数]
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+from logconfig import KeyValueFormatter, configure_logging, stop_logging
+
+
+class SlowSink:
+    """每次写入等待固定时间的输出流"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def run_threads(threads, count, emit):
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        barrier.wait()
+        for i in range(count):
+            emit(index, i)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def bench(sink, threads, count):
+    total = threads * count
+    logger = logging.getLogger('bench')
+
+    def print_line(index, i):
+        print(f"✅ 邮件已成功发送至 user{index}-{i}@example.com", file=sink, flush=True)
+
+    def log_record(index, i):
+        logger.info('邮件已发送', extra={'recipient': f'user{index}-{i}@example.com',
+                                        'duration': 0.012, 'outcome': 'sent'})
+
+    def log_debug(index, i):
+        logger.debug('域名提醒已安排', extra={'domain': f'd{index}-{i}.com', 'alert_level': 'warning'})
+
+    results = [('print', run_threads(threads, count, print_line))]
+
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(KeyValueFormatter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    results.append(('同步 StreamHandler', run_threads(threads, count, log_record)))
+
+    configure_logging('INFO', stream=sink)
+    results.append(('队列 QueueHandler（调用方）', run_threads(threads, count, log_record)))
+    start = time.perf_counter()
+    stop_logging()
+    flush = time.perf_counter() - start
+    results.append(('低于级别的 DEBUG 记录', run_threads(threads, count, log_debug)))
+
+    for name, elapsed in results:
+        print(f"  {name}: {elapsed:.2f} 秒, {total / elapsed:,.0f} 条/秒, {elapsed / total * 1e6:.1f} µs/条")
+    print(f"  队列方式中监听线程写完剩余记录用时 {flush:.2f} 秒")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+    with open(os.devnull, 'w', encoding='utf-8') as sink:
+        print(f"/dev/null: {threads} 个线程 x {count} 条")
+        bench(sink, threads, count)
+    slow_count = max(1, count // 20)
+    print(f"慢速输出（每次写入 {delay:g} µs）: {threads} 个线程 x {slow_count} 条")
+    bench(SlowSink(delay / 1e6), threads, slow_count)
+
+
+if __name__ == '__main__':
+    main()
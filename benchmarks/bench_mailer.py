@@ -0,0 +1,68 @@
+"""
+邮件投递吞吐量测试
+对比旧的“每封邮件一个线程 + 一次登录”方式和常驻投递器的会话复用方式
+运行方式: python -m benchmarks.bench_mailer [邮件数量]
+"""
+
+import sys
+import threading
+import time
+
+from mailer import MailDispatcher, SMTPSettings, build_message, open_smtp_connection
+from benchmarks.smtp_sink import SMTPSink
+
+
+def make_settings(port):
+    return SMTPSettings(
+        mail_server='127.0.0.1', mail_port=port, mail_use_tls=False,
+        mail_username='bench', mail_password='bench',
+        mail_default_sender='bench@example.com', admin_email='admin@example.com',
+        enabled=True
+    )
+
+
+def bench_thread_per_email(settings, count):
+    """旧方式：每封邮件一个线程，各自连接、登录、发送、退出"""
+    def send_one(i):
+        server = open_smtp_connection(settings)
+        server.send_message(build_message(settings, f'alert {i}', settings.admin_email, '<p>bench</p>'))
+        server.quit()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=send_one, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def bench_dispatcher(settings, count, workers):
+    """新方式：常驻投递器复用已登录的会话"""
+    dispatcher = MailDispatcher(lambda: settings, workers=workers, queue_size=count)
+    start = time.perf_counter()
+    for i in range(count):
+        dispatcher.submit(f'alert {i}', settings.admin_email, '<p>bench</p>')
+    dispatcher.queue.join()
+    elapsed = time.perf_counter() - start
+    dispatcher.stop()
+    return elapsed
+
+
+def report(name, sink, count, elapsed):
+    print(f"{name:<16} {count:>6} 封  {elapsed:>7.3f} 秒  {count / elapsed:>9.1f} 封/秒  "
+          f"连接 {sink.connections:>5}  登录 {sink.logins:>5}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with SMTPSink() as sink:
+        settings = make_settings(sink.port)
+        report('每封一个线程', sink, count, bench_thread_per_email(settings, count))
+    with SMTPSink() as sink:
+        settings = make_settings(sink.port)
+        report('投递器(2会话)', sink, count, bench_dispatcher(settings, count, workers=2))
+
+
+if __name__ == '__main__':
+    main()
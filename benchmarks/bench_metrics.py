@@ -0,0 +1,72 @@
+"""
+运行指标开销测试
+先测单次记录计数器/直方图的耗时，再用测试客户端请求登录页，
+对比开启和去掉请求计时钩子时的每请求耗时，以及 /metrics 输出一次的耗时
+运行方式: python -m benchmarks.bench_metrics [请求数]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from metrics import Registry
+
+
+def per_op(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def bench_primitives(count=200000):
+    registry = Registry()
+    counter = registry.counter('bench_total', '计数器', ['method', 'endpoint', 'status'])
+    histogram = registry.histogram('bench_seconds', '直方图', ['endpoint'])
+    print(f"计数器 labels().inc(): {per_op(lambda: counter.labels('GET', 'index', '200').inc(), count) * 1e9:.0f} ns")
+    print(f"直方图 labels().observe(): {per_op(lambda: histogram.labels('index').observe(0.012), count) * 1e9:.0f} ns")
+
+
+def bench_requests(count):
+    workdir = tempfile.mkdtemp(prefix='bench-metrics-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "domain.db")}'
+    from app import app, create_app, db, metrics, record_request_metrics, start_request_timer
+    create_app('cli')
+    with app.app_context():
+        db.create_all()
+    create_app('web', run_scheduler=False)
+    client = app.test_client()
+    try:
+        for _ in range(200):
+            client.get('/login')
+
+        def timed():
+            return per_op(lambda: client.get('/login'), count)
+
+        with_hooks = timed()
+        app.before_request_funcs[None].remove(start_request_timer)
+        app.after_request_funcs[None].remove(record_request_metrics)
+        without_hooks = timed()
+        app.before_request_funcs[None].append(start_request_timer)
+        app.after_request_funcs[None].append(record_request_metrics)
+        with_hooks = min(with_hooks, timed())
+
+        print(f"GET /login x {count}: 开启指标 {with_hooks * 1e6:.1f} µs/请求, "
+              f"关闭指标 {without_hooks * 1e6:.1f} µs/请求, "
+              f"差值 {(with_hooks - without_hooks) * 1e6:+.1f} µs（{(with_hooks / without_hooks - 1) * 100:+.1f}%）")
+        render = per_op(metrics.render, 200)
+        print(f"/metrics 输出: {render * 1e3:.2f} ms/次, {len(metrics.render())} 字节")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    bench_primitives()
+    bench_requests(count)
+
+
+if __name__ == '__main__':
+    main()
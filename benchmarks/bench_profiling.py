@@ -0,0 +1,91 @@
+"""
+请求性能分析开销测试
+分别在未启用和启用 PROFILING_ENABLED 的子进程中请求仪表盘，对比每个请求的耗时；
+启用时另外测一次带 X-Profile 头（运行 cProfile 并保存结果）的请求耗时
+运行方式: python -m benchmarks.bench_profiling [请求数] [域名数量]
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+
+def measure(count, domains, profile_requests):
+    from werkzeug.security import generate_password_hash
+    from app import app, create_app, db, Domain, User
+
+    create_app('cli')
+    with app.app_context():
+        db.create_all()
+        user = User(username='admin', password=generate_password_hash('admin123'))
+        db.session.add(user)
+        db.session.commit()
+        now = datetime.utcnow()
+        db.session.execute(Domain.__table__.insert(), [{
+            'name': f'bench-{i}.com', 'expiration_date': now + timedelta(days=i % 700),
+            'renewal_date': now, 'user_id': user.id, 'needs_renewal': True,
+            'warning_threshold': 30, 'danger_threshold': 7,
+        } for i in range(domains)])
+        db.session.commit()
+    create_app('web', run_scheduler=False)
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    for _ in range(50):
+        client.get('/dashboard')
+
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get('/dashboard')
+    plain = (time.perf_counter() - start) / count
+
+    profiled = None
+    if profile_requests:
+        start = time.perf_counter()
+        for _ in range(profile_requests):
+            client.get('/dashboard', headers={'X-Profile': '1'})
+        profiled = (time.perf_counter() - start) / profile_requests
+    return plain, profiled
+
+
+def run(enabled, count, domains):
+    workdir = tempfile.mkdtemp(prefix='bench-profiling-')
+    env = {
+        'DATABASE_URL': f'sqlite:///{os.path.join(workdir, "domain.db")}',
+        'PROFILING_ENABLED': 'true' if enabled else 'false',
+        'PROFILING_DIR': os.path.join(workdir, 'profiles'),
+        'PROFILING_SLOW_MS': '60000',
+        'LOG_LEVEL': 'WARNING',
+    }
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            return executor.submit(measure, count, domains, 20 if enabled else 0).result()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    domains = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    disabled, _ = run(False, count, domains)
+    enabled, profiled = run(True, count, domains)
+    print(f"GET /dashboard x {count}（{domains} 个域名）")
+    print(f"  未启用:            {disabled * 1e3:.3f} ms/请求")
+    print(f"  启用（SQL统计+Server-Timing）: {enabled * 1e3:.3f} ms/请求（{(enabled / disabled - 1) * 100:+.1f}%）")
+    print(f"  启用并运行 cProfile: {profiled * 1e3:.3f} ms/请求")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+RDAP查询吞吐量测试
+对比逐个查询和并发查询，并验证缓存命中时不再发出请求
+运行方式: python -m benchmarks.bench_rdap [域名数量] [替身延迟毫秒]
+"""
+
+import sys
+import time
+
+from rdap import RDAPRefresher, _http_get_json, parse_rdap_domain
+from benchmarks.rdap_stub import RDAPStub, stub_expiration
+
+
+def bench_sequential(stub, names):
+    """逐个查询（每个域名等待上一个返回）"""
+    start = time.perf_counter()
+    for name in names:
+        parse_rdap_domain(name, _http_get_json(f'{stub.base_url}domain/{name}', 10))
+    return time.perf_counter() - start
+
+
+def report(name, count, requests, elapsed):
+    print(f"{name:<20} {count:>6} 个  {elapsed:>7.3f} 秒  {count / elapsed:>9.1f} 次/秒  请求 {requests:>6}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    names = [f'bench-{i}.{("com", "net", "org")[i % 3]}' for i in range(count)]
+
+    with RDAPStub(latency=latency) as stub:
+        elapsed = bench_sequential(stub, names)
+        report('逐个查询', count, stub.requests, elapsed)
+
+    with RDAPStub(latency=latency) as stub:
+        refresher = RDAPRefresher(bootstrap_url=stub.bootstrap_url, concurrency=20, rate_limit=0)
+        results, stats = refresher.refresh(names)
+        assert stats['errors'] == 0, stats
+        assert all(results[name].expiration_date == stub_expiration(name) for name in names)
+        report('并发(20)', count, stub.requests, stats['elapsed'])
+
+        # 第二轮全部命中缓存
+        before = stub.requests
+        _, stats = refresher.refresh(names)
+        print(f"{'缓存命中':<20} {stats['cache_hits']:>6} 个  {stats['elapsed']:>7.3f} 秒  "
+              f"新增请求 {stub.requests - before}")
+
+    # 每个注册局限速：所有域名指向同一个替身，rate_limit 次/秒
+    rate = 50
+    with RDAPStub(latency=latency) as stub:
+        refresher = RDAPRefresher(base_url=stub.base_url, concurrency=20, rate_limit=rate)
+        sample = names[:min(count, 200)]
+        _, stats = refresher.refresh(sample)
+        report(f'并发+限速({rate}/秒)', len(sample), stub.requests, stats['elapsed'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+域名卡片渲染性能测试
+对比直接把ORM对象交给模板（每张卡片多次调用 status()/progress_percentage()/days_remaining()）
+和每个请求先构建 DomainView 再渲染的耗时
+运行方式: python -m benchmarks.bench_render [域名数量]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app import app, Domain, build_domain_views
+
+# 改用 DomainView 之前的卡片模板（仪表盘版本）
+LEGACY_CARDS = """{% for domain in domains %}
+<div class="col-md-6 col-lg-4">
+    <div class="card domain-card">
+        <div class="card-body">
+            <div class="d-flex justify-content-between align-items-center mb-3">
+                <h5 class="card-title">
+                    {{ domain.name }}
+                    {% if not domain.needs_renewal %}
+                    <span class="badge bg-info ms-2" title="永久域名，无需续期">
+                        <i class="bi bi-infinity"></i> 永久
+                    </span>
+                    {% endif %}
+                </h5>
+                <span class="badge bg-{{ domain.status() }}">
+                    {% if domain.status() == 'info' %}永久
+                    {% elif domain.status() == 'success' %}正常
+                    {% elif domain.status() == 'warning' %}警告
+                    {% else %}危险
+                    {% endif %}
+                </span>
+            </div>
+            
+            <div class="progress-container">
+                {% if domain.needs_renewal %}
+                <div class="progress-circle" data-percent="{{ domain.progress_percentage() }}" data-status="{{ domain.status() }}">
+                    <span class="progress-text">{{ domain.progress_percentage() }}%</span>
+                </div>
+                <div>剩余 {{ domain.days_remaining() }} 天</div>
+                {% else %}
+                <div class="progress-circle" data-percent="100" data-status="info">
+                    <span class="progress-text">∞</span>
+                </div>
+                <div>永久有效</div>
+                {% endif %}
+            </div>
+            
+            <div class="domain-details">
+                <p><strong>注册商:</strong> {{ domain.registrar or '未知' }}</p>
+                <p><strong>注册日期:</strong> {{ domain.registration_date.strftime('%Y-%m-%d') if domain.registration_date else '未知' }}</p>
+                <p><strong>到期日期:</strong> {{ domain.expiration_date.strftime('%Y-%m-%d') }}</p>
+                <p><strong>续费周期:</strong> {{ domain.renewal_period or '未知' }}</p>
+                <p><strong>续费价格:</strong> {{ domain.renewal_price or '未知' }} {{ domain.currency }}</p>
+                <p><strong>警告阈值:</strong> {{ domain.warning_threshold }} 天</p>
+                <p><strong>危险阈值:</strong> {{ domain.danger_threshold }} 天</p>
+            </div>
+            
+            <div class="action-buttons">
+                <button class="btn btn-outline-primary edit-domain" data-domain-id="{{ domain.id }}" data-bs-toggle="modal" data-bs-target="#editDomainModal">
+                    <i class="bi bi-pencil"></i> 编辑
+                </button>
+                {% if domain.needs_renewal %}
+                    {% if domain.renewal_url %}
+                    <a href="{{ domain.renewal_url }}" target="_blank" class="btn btn-outline-success renew-domain" 
+                        data-domain-id="{{ domain.id }}" 
+                        data-domain-name="{{ domain.name }}"
+                        data-renewal-period="{{ domain.renewal_period }}"
+                        data-current-expiration="{{ domain.expiration_date.strftime('%Y-%m-%d') }}">
+                        <i class="bi bi-arrow-repeat"></i> 续费
+                    </a>
+                    {% else %}
+                    <button class="btn btn-outline-secondary" disabled>
+                        <i class="bi bi-arrow-repeat"></i> 续费
+                    </button>
+                    {% endif %}
+                {% endif %}
+                <button class="btn btn-outline-danger delete-domain" data-domain-id="{{ domain.id }}">
+                    <i class="bi bi-trash"></i> 删除
+                </button>
+            </div>
+        </div>
+    </div>
+</div>
+{% endfor %}"""
+
+
+def make_domains(count):
+    """在内存中生成域名对象（不写数据库）"""
+    random.seed(42)
+    now = datetime.utcnow()
+    domains = []
+    for i in range(count):
+        renewal_date = now - timedelta(days=random.randint(0, 365))
+        domains.append(Domain(
+            id=i + 1,
+            name=f'bench-{i}.com',
+            registrar='Bench Registrar',
+            registration_date=renewal_date,
+            expiration_date=now + timedelta(days=random.randint(-10, 730)),
+            renewal_period='1年',
+            renewal_price='10',
+            renewal_url='https://example.com/renew' if i % 2 else None,
+            renewal_date=renewal_date,
+            currency='USD',
+            warning_threshold=30,
+            danger_threshold=7,
+            user_id=1,
+            needs_renewal=(i % 20 != 0)
+        ))
+    return domains
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    domains = make_domains(count)
+    with app.app_context():
+        legacy = app.jinja_env.from_string(LEGACY_CARDS)
+        cards = app.jinja_env.get_template('_domain_cards.html')
+        before = timed(lambda: legacy.render(domains=domains))
+        after = timed(lambda: cards.render(domains=build_domain_views(domains), editable=True))
+    print(f"渲染 {count} 张域名卡片（取3次最好成绩）")
+    print(f"  ORM对象直接渲染:      {before * 1000:>8.1f} ms")
+    print(f"  DomainView(含构建):   {after * 1000:>8.1f} ms")
+    print(f"  提升: {before / after:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+启动耗时测试
+在新的子进程中按不同运行模式启动应用，测量从启动解释器到可以工作（Web 模式为处理完第一个请求，
+worker 模式为调度器已启动）所用的时间和导入的模块数。
+另外测量空解释器和只导入 Flask / Flask-SQLAlchemy 的耗时，作为无法通过延迟初始化省下的下限。
+默认同时在基线提交（仓库的第一个提交，--baseline 指定其他提交）的临时 git worktree 中测量导入应用
+和处理第一个请求的耗时，输出各场景与基线的比值，以及扣除 Flask / Flask-SQLAlchemy 导入耗时后
+（即应用自身的启动开销）的比值；基线中命令行脚本也要导入整个 app.py，所以 cli 场景与基线的“导入 app”对比
+运行方式: python -m benchmarks.bench_startup [每个场景的次数] [--baseline 提交 | --no-baseline]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READY = "import sys, time; print(time.time(), len(sys.modules))"
+
+# (名称, 代码, 对比的基线场景)
+SCENARIOS = [
+    ('空解释器', '', None),
+    ('导入 flask + flask_sqlalchemy', 'import flask, flask_sqlalchemy', None),
+    ('导入 app', 'import app', 'import'),
+    ('cli（命令行脚本）', "from app import create_app; create_app('cli')", 'import'),
+    ('web（不运行定时任务）',
+     "from app import app, create_app; create_app('web', run_scheduler=False); app.test_client().get('/login')",
+     'web'),
+    ('web（同时运行定时任务）',
+     "from app import app, create_app; create_app('web', run_scheduler=True); app.test_client().get('/login')",
+     'web'),
+    ('worker', "from app import create_app; create_app('worker')", None),
+]
+
+# 基线提交中对应的场景：导入即完成全部初始化（不含调度器，基线只在 __main__ 中启动调度器）
+BASELINE_SCENARIOS = {
+    'import': ('导入 app', 'import app'),
+    'web': ('导入 app + 第一个请求', "from app import app; app.test_client().get('/login')"),
+}
+
+
+def run_once(code, env, cwd=ROOT):
+    start = time.time()
+    result = subprocess.run([sys.executable, '-c', f'{code}\n{READY}'], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    ready, modules = result.stdout.split()[-2:]
+    return float(ready) - start, int(modules)
+
+
+def measure(runs, env, count):
+    """runs 为 {键: (代码, 工作目录)}，各预热一次后轮流运行 count 轮（机器负载的变化对各场景影响相同），
+    返回 {键: (最快, 中位数, 模块数)}"""
+    for code, cwd in runs.values():
+        run_once(code, env, cwd)
+    samples = {key: [] for key in runs}
+    for _ in range(count):
+        for key, (code, cwd) in runs.items():
+            samples[key].append(run_once(code, env, cwd))
+    results = {}
+    for key, values in samples.items():
+        times = [elapsed for elapsed, _ in values]
+        results[key] = (min(times), statistics.median(times), values[-1][1])
+    return results
+
+
+def git(*args):
+    return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时测试')
+    parser.add_argument('count', type=int, nargs='?', default=10, help='每个场景的次数，默认 10')
+    parser.add_argument('--baseline', help='对比的基线提交，默认为仓库的第一个提交')
+    parser.add_argument('--no-baseline', action='store_true', help='不测量基线')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    env = dict(os.environ,
+               DATABASE_URL=f'sqlite:///{os.path.join(workdir, "domain.db")}',
+               LOG_LEVEL='WARNING',
+               # 每次都由新进程直接启动调度器，不等待上一个进程的租约
+               SCHEDULER_LEADER_ELECTION='false')
+    try:
+        # 先建好数据库，之后各场景只做结构检查
+        run_once("from app import create_app; create_app('web', run_scheduler=False)", env)
+        print(f"每个场景启动 {args.count} 次")
+
+        runs = {('current', name): (code, ROOT) for name, code, _ in SCENARIOS}
+        ref = None
+        if not args.no_baseline:
+            ref = args.baseline or git('rev-list', '--max-parents=0', 'HEAD').splitlines()[0]
+            baseline_path = os.path.join(workdir, 'baseline')
+            git('worktree', 'add', '--detach', baseline_path, ref)
+            # 基线不读取 DATABASE_URL，数据库在 worktree 的 instance 目录中；这些场景都不访问数据库
+            runs.update({('baseline', key): (code, baseline_path) for key, (_, code) in BASELINE_SCENARIOS.items()})
+        try:
+            results = measure(runs, env, args.count)
+        finally:
+            if ref:
+                git('worktree', 'remove', '--force', baseline_path)
+
+        line = lambda name, result: f"  {name}: 最快 {result[0] * 1e3:.0f} ms, 中位数 {result[1] * 1e3:.0f} ms, {result[2]} 个模块"
+        if ref:
+            print(f"基线 {git('rev-parse', '--short', ref)}:")
+            for key, (name, _) in BASELINE_SCENARIOS.items():
+                print(line(name, results[('baseline', key)]))
+        print(f"当前 {git('rev-parse', '--short', 'HEAD')}:")
+        floor = results[('current', '导入 flask + flask_sqlalchemy')][1]
+        for name, _, compare in SCENARIOS:
+            result = results[('current', name)]
+            text = line(name, result)
+            if ref and compare:
+                before = results[('baseline', compare)][1]
+                text += f"（中位数为基线的 x{result[1] / before:.2f}"
+                if before > floor:
+                    text += f"，扣除 Flask 导入后为 x{max(result[1] - floor, 0) / (before - floor):.2f}"
+                text += "）"
+            print(text)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
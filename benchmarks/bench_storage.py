@@ -0,0 +1,130 @@
+"""
+SQLite并发读写测试
+多个写线程不断做小事务（类似检查任务标记提醒、网页保存域名），同时多个读线程查询仪表盘第一页，
+对比默认日志模式（DELETE）和 storage.py 的 WAL 设置下的吞吐量、延迟和锁错误数
+运行方式: python -m benchmarks.bench_storage [持续秒数] [写线程数] [读线程数]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from app import db, Domain, User
+from storage import install_sqlite_pragmas, sqlite_pragmas
+
+DOMAIN_COUNT = 5000
+
+
+def make_engine(path, pragmas, pool_size):
+    engine = create_engine(f'sqlite:///{path}', pool_size=pool_size, max_overflow=0)
+    install_sqlite_pragmas(engine, pragmas)
+    return engine
+
+
+def seed(engine):
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{'id': 1, 'username': 'bench', 'password': '-'}])
+        conn.execute(insert(Domain.__table__), [{
+            'name': f'bench-{i}.com',
+            'expiration_date': now + timedelta(days=i % 730),
+            'renewal_date': now,
+            'user_id': 1,
+            'needs_renewal': True,
+            'warning_threshold': 30,
+            'danger_threshold': 7,
+        } for i in range(DOMAIN_COUNT)])
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(name, pragmas, duration, writers, readers):
+    workdir = tempfile.mkdtemp(prefix='bench-storage-')
+    try:
+        engine = make_engine(os.path.join(workdir, 'domain.db'), pragmas, writers + readers)
+        seed(engine)
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'writes': 0, 'reads': 0, 'locked': 0, 'write_latency': [], 'read_latency': []}
+
+        def writer(seed_value):
+            rng = random.Random(seed_value)
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(update(Domain.__table__)
+                                     .where(Domain.__table__.c.id == rng.randint(1, DOMAIN_COUNT))
+                                     .values(last_checked=datetime.utcnow()))
+                except OperationalError:
+                    with lock:
+                        result['locked'] += 1
+                    continue
+                with lock:
+                    result['writes'] += 1
+                    result['write_latency'].append(time.perf_counter() - start)
+
+        def reader():
+            table = Domain.__table__
+            query = (select(table).where(table.c.user_id == 1)
+                     .order_by(table.c.expiration_date, table.c.id).limit(30))
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(query).all()
+                except OperationalError:
+                    with lock:
+                        result['locked'] += 1
+                    continue
+                with lock:
+                    result['reads'] += 1
+                    result['read_latency'].append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{name:<14} 写 {result['writes'] / duration:>8.1f} 次/秒  "
+          f"p99 {percentile(result['write_latency'], 99) * 1000:>7.1f} ms   "
+          f"读 {result['reads'] / duration:>8.1f} 次/秒  "
+          f"p50 {percentile(result['read_latency'], 50) * 1000:>6.2f} ms  "
+          f"p99 {percentile(result['read_latency'], 99) * 1000:>7.1f} ms   "
+          f"锁错误 {result['locked']}")
+    return result
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    print(f"{DOMAIN_COUNT} 个域名，{writers} 个写线程 + {readers} 个读线程，每种设置 {duration:g} 秒")
+    # 旧配置：默认日志模式，只有 sqlite3 模块自带的5秒忙等待
+    run('默认(DELETE)', [], duration, writers, readers)
+    run('WAL(storage)', sqlite_pragmas({}), duration, writers, readers)
+
+
+if __name__ == '__main__':
+    main()
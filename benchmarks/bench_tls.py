@@ -0,0 +1,36 @@
+"""
+HTTPS证书检查吞吐量测试
+对比逐个握手和线程池并发握手，并校验读到的证书到期时间
+运行方式: python -m benchmarks.bench_tls [域名数量] [替身延迟毫秒]
+"""
+
+import sys
+from datetime import datetime, timedelta
+
+from tlsprobe import TLSProber
+from benchmarks.tls_stub import TLSStub
+
+
+def report(name, stub, stats):
+    print(f"{name:<12} {stats['probes']:>6} 个  {stats['elapsed']:>7.3f} 秒  "
+          f"{stats['probes_per_second']:>9.1f} 个/秒  握手 {stub.handshakes:>6}  失败 {stats['failed']}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    names = [f'bench-{i}.com' for i in range(count)]
+
+    with TLSStub(days=45, latency=latency) as stub:
+        _, stats = TLSProber(address=stub.address, workers=1).probe_all(names)
+        report('逐个握手', stub, stats)
+
+    with TLSStub(days=45, latency=latency) as stub:
+        results, stats = TLSProber(address=stub.address, workers=32).probe_all(names)
+        expected = datetime.utcnow() + timedelta(days=45)
+        assert all(abs(results[name].not_after - expected) < timedelta(minutes=5) for name in names)
+        report('并发(32)', stub, stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+本地DNS替身服务器
+对任意域名返回确定性的A / AAAA / NS记录，以 missing- 开头的域名返回NXDOMAIN，
+nameservers 可以按域名覆盖NS记录（用于模拟NS变更），用于测试和性能测试
+"""
+
+import hashlib
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from dnsprobe import TYPE_A, TYPE_AAAA, TYPE_NS, encode_name
+
+
+def stub_records(name, qtype):
+    digest = hashlib.md5(name.encode()).digest()
+    if qtype == TYPE_A:
+        return [f'10.{digest[0]}.{digest[1]}.{digest[2]}']
+    if qtype == TYPE_AAAA:
+        return [f'fd00::{digest[0]:x}:{digest[1]:x}']
+    if qtype == TYPE_NS:
+        return [f'ns1.{name}', f'ns2.{name}']
+    return []
+
+
+class _DNSHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        server = self.server
+        with server.lock:
+            server.queries += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        query_id = struct.unpack('!H', data[:2])[0]
+        offset, labels = 12, []
+        while data[offset]:
+            labels.append(data[offset + 1:offset + 1 + data[offset]].decode())
+            offset += 1 + data[offset]
+        name = '.'.join(labels).lower()
+        qtype = struct.unpack('!H', data[offset + 1:offset + 3])[0]
+        question = data[12:offset + 5]
+
+        if name.startswith('missing-'):
+            rcode, records = 3, []
+        elif qtype == TYPE_NS and name in server.nameservers:
+            rcode, records = 0, server.nameservers[name]
+        else:
+            rcode, records = 0, stub_records(name, qtype)
+
+        answers = b''
+        for value in records:
+            if qtype == TYPE_A:
+                rdata = socket.inet_pton(socket.AF_INET, value)
+            elif qtype == TYPE_AAAA:
+                rdata = socket.inet_pton(socket.AF_INET6, value)
+            else:
+                rdata = encode_name(value)
+            # 名称使用指向问题部分的压缩指针
+            answers += b'\xc0\x0c' + struct.pack('!HHIH', qtype, 1, 300, len(rdata)) + rdata
+        header = struct.pack('!HHHHHH', query_id, 0x8180 | rcode, 1, len(records), 0, 0)
+        sock.sendto(header + question + answers, self.client_address)
+
+
+class DNSStub(socketserver.ThreadingUDPServer):
+    """在后台线程运行的DNS替身，latency 模拟上游的响应延迟（秒）"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), _DNSHandler)
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.nameservers = {}
+        self.queries = 0
+
+    @property
+    def address(self):
+        return self.server_address[:2]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
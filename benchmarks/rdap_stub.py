@@ -0,0 +1,94 @@
+"""
+本地RDAP替身服务器
+/domain/<域名> 返回带到期日期和注册商的RDAP响应（到期日期由域名确定性生成），
+/dns.json 返回把指定顶级域名都指向本服务器的IANA引导文件，用于性能测试
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_expiration(name):
+    """替身服务器为域名给出的到期日期"""
+    days = int(hashlib.md5(name.encode()).hexdigest()[:4], 16) % 730
+    return datetime(2030, 1, 1) + timedelta(days=days)
+
+
+class _RDAPHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/rdap+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if self.path == '/dns.json':
+            base_url = f'http://127.0.0.1:{server.port}/'
+            self.send_json(200, {'services': [[list(server.tlds), [base_url]]]})
+            return
+        if not self.path.startswith('/domain/'):
+            self.send_json(404, {'errorCode': 404})
+            return
+        name = self.path[len('/domain/'):].lower()
+        self.send_json(200, {
+            'objectClassName': 'domain',
+            'ldhName': name,
+            'events': [
+                {'eventAction': 'registration', 'eventDate': '2015-06-01T00:00:00Z'},
+                {'eventAction': 'expiration', 'eventDate': stub_expiration(name).strftime('%Y-%m-%dT%H:%M:%SZ')},
+            ],
+            'entities': [{
+                'objectClassName': 'entity',
+                'roles': ['registrar'],
+                'vcardArray': ['vcard', [['version', {}, 'text', '4.0'], ['fn', {}, 'text', 'Stub Registrar']]],
+            }],
+        })
+
+
+class RDAPStub(ThreadingHTTPServer):
+    """在后台线程运行的RDAP替身，latency 模拟注册局的响应延迟（秒）"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, tlds=('com', 'net', 'org')):
+        super().__init__((host, port), _RDAPHandler)
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.tlds = tlds
+        self.requests = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}/'
+
+    @property
+    def bootstrap_url(self):
+        return f'http://127.0.0.1:{self.port}/dns.json'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
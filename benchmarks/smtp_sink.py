@@ -0,0 +1,77 @@
+"""
+本地SMTP替身服务器
+只实现发送邮件所需的最小命令集（EHLO/AUTH/MAIL/RCPT/DATA/NOOP/QUIT），
+收到的邮件只计数不保存，用于性能测试
+"""
+
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 sink ESMTP')
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line in (b'.\r\n', b'.\n'):
+                    in_data = False
+                    with server.lock:
+                        server.messages += 1
+                    self.reply('250 OK')
+                continue
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b'250-sink\r\n250-AUTH PLAIN LOGIN\r\n250 OK\r\n')
+            elif command.startswith('HELO'):
+                self.reply('250 sink')
+            elif command.startswith('AUTH'):
+                with server.lock:
+                    server.logins += 1
+                self.reply('235 Authentication successful')
+            elif command.startswith('DATA'):
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL / RCPT / RSET / NOOP
+                self.reply('250 OK')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """在后台线程运行的SMTP替身，统计连接数、登录次数和收到的邮件数"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # 旧的发送方式会同时发起大量连接，默认的监听队列(5)不够用
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
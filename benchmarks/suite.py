@@ -0,0 +1,356 @@
+"""
+离线性能测试套件
+按指定规模（默认 1k / 100k / 1M）生成模拟的域名表，到期日期按真实组合分布：
+少量已过期、大部分在未来三年内、一部分永久域名，另有一部分域名使用自定义阈值。
+每个规模在独立的子进程和临时 SQLite 数据库中运行，邮件发往进程内的 SMTP 替身（benchmarks/smtp_sink.py），
+测量以下项目并把结果写入JSON，便于不同提交之间对比：
+
+* check_cold / check_steady：首次检查（大量提醒待发）和提醒已发送后的例行检查
+* outbox_drain：把首次检查写入发件箱的邮件全部投递到 SMTP 替身
+* dashboard / index / index_cached：仪表盘、首页（每次重新渲染）和首页缓存命中
+* add_domain：逐个添加域名的接口吞吐量
+* email_template：单封提醒邮件的渲染耗时
+
+运行方式:
+    python -m benchmarks.suite [--sizes 1k,100k,1m] [--out 结果.json]
+    python -m benchmarks.suite --compare 旧结果.json 新结果.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+INSERT_CHUNK = 10000
+USER_COUNT = 10
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    for suffix, factor in (('k', 1000), ('m', 1000000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def size_label(size):
+    if size >= 1000000 and size % 1000000 == 0:
+        return f'{size // 1000000}m'
+    if size >= 1000 and size % 1000 == 0:
+        return f'{size // 1000}k'
+    return str(size)
+
+
+def summarize(samples):
+    """耗时样本（秒）的统计，单位毫秒"""
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'min_ms': ordered[0] * 1000,
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'mean_ms': statistics.fmean(ordered) * 1000,
+    }
+
+
+def sample(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def synthetic_rows(count, user_ids, now, seed=42):
+    """生成 count 个域名的列值（含预先计算的提醒时间），按 INSERT_CHUNK 分批返回"""
+    from app import Domain
+
+    rng = random.Random(seed)
+    batch = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            needs_renewal = False
+            expiration = now + timedelta(days=36500)
+        elif roll < 0.07:
+            # 已过期但还没续费
+            needs_renewal = True
+            expiration = now - timedelta(days=rng.randint(1, 30), hours=rng.randint(0, 23))
+        else:
+            needs_renewal = True
+            expiration = now + timedelta(days=rng.randint(0, 3 * 365), hours=rng.randint(0, 23))
+        if rng.random() < 0.8:
+            warning, danger = 30, 7
+        else:
+            warning, danger = rng.randint(14, 60), rng.randint(3, 13)
+        period = rng.choice((1, 1, 1, 2, 5))
+        renewal_date = expiration - timedelta(days=365 * period) if needs_renewal else now - timedelta(days=rng.randint(0, 3650))
+        next_alert_at, warning_at, danger_at = Domain.alert_times(expiration, needs_renewal, warning, danger)
+        batch.append({
+            'name': f'bench-{i}.{rng.choice(("com", "net", "org", "io", "cn"))}',
+            'registrar': rng.choice(('Bench Registrar', 'Example NIC', 'Test Domains Inc.')),
+            'registration_date': renewal_date,
+            'expiration_date': expiration,
+            'renewal_period': f'{period}年',
+            'renewal_price': str(rng.choice((8, 10, 12, 35, 60))),
+            'renewal_url': 'https://example.com/renew' if i % 2 else None,
+            'renewal_date': renewal_date,
+            'currency': 'USD',
+            'warning_threshold': warning,
+            'danger_threshold': danger,
+            'user_id': user_ids[i % len(user_ids)],
+            'warning_sent': False,
+            'danger_sent': False,
+            'last_checked': now,
+            'needs_renewal': needs_renewal,
+            'next_alert_at': next_alert_at,
+            'warning_at': warning_at,
+            'danger_at': danger_at,
+        })
+        if len(batch) >= INSERT_CHUNK:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def populate(count, sink_port):
+    """建表并写入用户、SMTP配置和 count 个模拟域名，返回用时（秒）"""
+    from werkzeug.security import generate_password_hash
+    from app import app, create_app, db, Domain, SMTPConfig, User, smtp_settings
+
+    start = time.perf_counter()
+    # 只绑定数据库，建表后 run_size 再按 Web 模式初始化
+    create_app('cli')
+    with app.app_context():
+        db.create_all()
+        password = generate_password_hash('admin123')
+        users = [User(username='admin' if i == 0 else f'user{i}', password=password) for i in range(USER_COUNT)]
+        db.session.add_all(users)
+        db.session.add(SMTPConfig(
+            mail_server='127.0.0.1', mail_port=sink_port, mail_use_tls=False,
+            mail_username='bench', mail_password='bench', mail_default_sender='bench@example.com',
+            admin_email='admin@example.com', enabled=True, digest_mode=False
+        ))
+        db.session.commit()
+        user_ids = [user.id for user in users]
+        now = datetime.utcnow()
+        for batch in synthetic_rows(count, user_ids, now):
+            db.session.execute(Domain.__table__.insert(), batch)
+            db.session.commit()
+    smtp_settings.invalidate()
+    return time.perf_counter() - start
+
+
+def run_size(size, repeat, adds, templates):
+    """在当前进程（已设置 DATABASE_URL）中测试一个规模，返回结果字典"""
+    from app import (app, db, Domain, bump_domain_data_version, check_domain_expiry, create_app,
+                     create_email_template, get_mail_dispatcher, get_outbox_dispatcher, refresh_domain_summaries)
+    from benchmarks.smtp_sink import SMTPSink
+
+    results = {'domains': size}
+    with SMTPSink() as sink:
+        results['populate_s'] = populate(size, sink.port)
+        # 与线上 Web 进程一致：配置日志、注册请求钩子，不启动定时任务
+        create_app('web', run_scheduler=False)
+
+        start = time.perf_counter()
+        summary = check_domain_expiry()
+        results['check_cold'] = {
+            'seconds': time.perf_counter() - start,
+            'candidates': summary['candidates'],
+            'alerts': summary['danger'] + summary['warning'],
+            'emails': summary['emails'],
+        }
+
+        start = time.perf_counter()
+        delivery = get_outbox_dispatcher().drain()
+        elapsed = time.perf_counter() - start
+        results['outbox_drain'] = {
+            'seconds': elapsed,
+            'sent': delivery['sent'],
+            'failed': delivery['failed'] + delivery['retrying'],
+            'messages_per_second': delivery['sent'] / elapsed if elapsed > 0 else 0.0,
+            'sink_messages': sink.messages,
+        }
+
+        steady = sample(check_domain_expiry, repeat)
+        results['check_steady'] = summarize(steady)
+
+        client = app.test_client()
+        client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+        results['dashboard'] = summarize(sample(lambda: client.get('/dashboard'), repeat * 3))
+
+        def render_index():
+            # 每次都让首页缓存失效，测量查询 + 渲染
+            bump_domain_data_version()
+            client.get('/')
+        results['index'] = summarize(sample(render_index, repeat * 3))
+        client.get('/')
+        results['index_cached'] = summarize(sample(lambda: client.get('/'), repeat * 10))
+
+        # 状态汇总：读取物化的计数 / 每晚重新统计所有用户 / 对照：加载全部域名逐个判断状态
+        results['summary'] = summarize(sample(lambda: client.get('/domain_summary'), repeat * 10))
+        results['summary_recompute'] = summarize(sample(refresh_domain_summaries, repeat))
+
+        def scan_statuses():
+            with app.app_context():
+                counts = {}
+                for domain in Domain.query.yield_per(5000):
+                    status = domain.status()
+                    counts[status] = counts.get(status, 0) + 1
+                db.session.remove()
+        results['summary_scan'] = summarize(sample(scan_statuses, 1 if size >= 1_000_000 else repeat))
+
+        expiration = (datetime.utcnow() + timedelta(days=400)).strftime('%Y-%m-%d')
+        start = time.perf_counter()
+        for i in range(adds):
+            response = client.post('/add_domain', data={
+                'name': f'added-{i}.com', 'expiration_date': expiration, 'needs_renewal': 'on'})
+            assert response.json['success'], response.json
+        elapsed = time.perf_counter() - start
+        results['add_domain'] = {'count': adds, 'seconds': elapsed, 'per_second': adds / elapsed}
+
+        with app.app_context():
+            domains = Domain.query.filter(Domain.needs_renewal == True).limit(templates).all()
+            start = time.perf_counter()
+            for domain in domains:
+                create_email_template(domain, domain.days_remaining(), 'warning')
+            elapsed = time.perf_counter() - start
+            results['email_template'] = {'count': len(domains), 'per_email_us': elapsed / max(1, len(domains)) * 1e6}
+            db.session.remove()
+        get_mail_dispatcher().stop()
+    return results
+
+
+def run_isolated(size, repeat, adds, templates):
+    """在子进程中用独立的临时数据库测试一个规模"""
+    workdir = tempfile.mkdtemp(prefix='bench-suite-')
+    saved = {key: os.environ.get(key) for key in ('DATABASE_URL', 'LOG_LEVEL')}
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "domain.db")}'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    try:
+        # spawn：子进程在上面的环境变量下重新导入应用
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            return executor.submit(run_size, size, repeat, adds, templates).result()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def headline(result):
+    """每个规模用于对比的主要数值（越小越好）"""
+    return {
+        'check_cold_s': result['check_cold']['seconds'],
+        'check_steady_ms': result['check_steady']['median_ms'],
+        'outbox_drain_s': result['outbox_drain']['seconds'],
+        'dashboard_ms': result['dashboard']['median_ms'],
+        'index_ms': result['index']['median_ms'],
+        'index_cached_ms': result['index_cached']['median_ms'],
+        'add_domain_ms': result['add_domain']['seconds'] / result['add_domain']['count'] * 1000,
+        'email_template_us': result['email_template']['per_email_us'],
+        # 较早的结果中没有状态汇总
+        'summary_ms': result['summary']['median_ms'] if 'summary' in result else None,
+        'summary_recompute_ms': result['summary_recompute']['median_ms'] if 'summary_recompute' in result else None,
+    }
+
+
+def print_result(label, result):
+    print(f"== {label}（{result['domains']} 个域名，生成用时 {result['populate_s']:.1f} 秒）")
+    cold = result['check_cold']
+    print(f"  首次检查:   {cold['seconds']:.2f} 秒, 候选 {cold['candidates']}, 提醒 {cold['alerts']}, 邮件 {cold['emails']}")
+    drain = result['outbox_drain']
+    print(f"  发件箱投递: {drain['seconds']:.2f} 秒, {drain['sent']} 封, {drain['messages_per_second']:.0f} 封/秒")
+    for name in ('check_steady', 'dashboard', 'index', 'index_cached', 'summary', 'summary_recompute', 'summary_scan'):
+        if name not in result:
+            continue
+        stats = result[name]
+        print(f"  {name:<12} 中位 {stats['median_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms（{stats['n']} 次）")
+    print(f"  add_domain   {result['add_domain']['per_second']:.0f} 次/秒")
+    print(f"  邮件模板     {result['email_template']['per_email_us']:.0f} µs/封")
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('commit')} → {new['meta'].get('commit')}（比值 < 1 表示变快）")
+    for label, result in new['results'].items():
+        if label not in old['results']:
+            continue
+        before, after = headline(old['results'][label]), headline(result)
+        print(f"== {label}")
+        for key, value in after.items():
+            if value is None or before[key] is None:
+                continue
+            ratio = value / before[key] if before[key] else float('nan')
+            print(f"  {key:<18} {before[key]:>10.2f} → {value:>10.2f}  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线性能测试套件')
+    parser.add_argument('--sizes', default='1k,100k,1m', help='域名数量，逗号分隔，支持 k/m 后缀，默认 1k,100k,1m')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复次数（页面请求为其数倍），默认 5')
+    parser.add_argument('--adds', type=int, default=200, help='add_domain 请求数，默认 200')
+    parser.add_argument('--templates', type=int, default=500, help='渲染的邮件模板数，默认 500')
+    parser.add_argument('--out', help='结果JSON路径，默认 benchmarks/results/<时间>-<提交>.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='对比两个结果文件后退出')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+        },
+        'results': {},
+    }
+    for size in [parse_size(text) for text in args.sizes.split(',') if text.strip()]:
+        label = size_label(size)
+        result = run_isolated(size, args.repeat, args.adds, args.templates)
+        report['results'][label] = result
+        print_result(label, result)
+
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                   f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {out}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
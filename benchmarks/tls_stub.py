@@ -0,0 +1,67 @@
+"""
+本地自签名HTTPS替身服务器
+启动时用 openssl 生成一张指定有效天数的自签名证书，只完成TLS握手后关闭连接，用于测试和性能测试
+"""
+
+import os
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+
+
+def make_self_signed_cert(directory, days, common_name='localhost'):
+    """生成自签名证书，返回 (证书路径, 私钥路径)"""
+    cert = os.path.join(directory, f'{common_name}-{days}.crt')
+    key = os.path.join(directory, f'{common_name}-{days}.key')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+        '-keyout', key, '-out', cert, '-days', str(days), '-subj', f'/CN={common_name}'
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+class _HandshakeHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        try:
+            with server.context.wrap_socket(self.request, server_side=True) as tls:
+                with server.lock:
+                    server.handshakes += 1
+                tls.recv(1)
+        except (ssl.SSLError, OSError):
+            pass
+
+
+class TLSStub(socketserver.ThreadingTCPServer):
+    """在后台线程运行的自签名HTTPS替身，证书有效期为 days 天，latency 模拟网络往返延迟（秒）"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, days=30, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), _HandshakeHandler)
+        self.directory = tempfile.mkdtemp()
+        cert, key = make_self_signed_cert(self.directory, days)
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(cert, key)
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.handshakes = 0
+
+    @property
+    def address(self):
+        return self.server_address[:2]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
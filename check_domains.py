@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+域名到期检查脚本
+不经过Web进程执行一次到期检查并发送提醒，可以放在其他机器的cron中运行。
+域名很多时可以把域名表切分为多个分片（按ID范围或ID取模），在进程池中并行检查，最后合并为一份汇总。
+各分片只把提醒写入发件箱（汇总模式下为暂存的汇总片段，与提醒标志在同一个事务中提交），
+全部完成后由本进程把汇总片段合并为一封邮件，再统一投递发件箱中到期的邮件
+运行方式: python check_domains.py [--shards 分片数] [--mode range|hash] [--workers 进程数] [--json 文件路径]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app import (app, db, check_domain_expiry, create_app, describe_shard, get_mail_dispatcher, get_outbox_dispatcher,
+                 merge_digest_parts, plan_shards, smtp_settings)
+
+
+def run_shard(shard, defer_digest):
+    """在当前进程中检查一个分片，返回统计"""
+    # spawn 方式启动的子进程重新导入了 app，需要再配置一次日志
+    create_app('cli')
+    return check_domain_expiry(shard, defer_digest=defer_digest)
+
+
+def merge_summaries(summaries):
+    total = {'shards': len(summaries), 'candidates': 0, 'danger': 0, 'warning': 0,
+             'emails': 0, 'errors': 0}
+    for summary in summaries:
+        for key in ('candidates', 'danger', 'warning', 'emails', 'errors'):
+            total[key] += summary[key]
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='执行一次域名到期检查')
+    parser.add_argument('--shards', type=int, default=1, help='分片数，默认 1（不分片）')
+    parser.add_argument('--mode', choices=['range', 'hash'], default='range',
+                        help='分片方式：range 按ID范围，hash 按ID取模，默认 range')
+    parser.add_argument('--workers', type=int, help='并行进程数，默认为分片数和CPU核数中较小的一个')
+    parser.add_argument('--json', metavar='PATH', help='把汇总和各分片的统计以JSON写入文件')
+    args = parser.parse_args()
+    create_app('cli')
+
+    config = smtp_settings.get()
+    if not config or not config.enabled:
+        print("❌ SMTP未启用或未配置，跳过域名检查")
+        return 1
+
+    start = time.perf_counter()
+    if args.shards <= 1:
+        shards = [None]
+    else:
+        with app.app_context():
+            shards = plan_shards(args.shards, args.mode)
+            db.session.close()
+    # 汇总模式下各分片只写入汇总片段，最后合并为一封邮件
+    defer_digest = bool(config.digest_mode) and len(shards) > 1
+    workers = min(args.workers or os.cpu_count() or 1, len(shards)) or 1
+
+    if workers <= 1:
+        summaries = [run_shard(shard, defer_digest) for shard in shards]
+    else:
+        # spawn：子进程重新导入应用，不继承父进程的数据库连接
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            summaries = list(executor.map(run_shard, shards, [defer_digest] * len(shards)))
+
+    total = merge_summaries(summaries)
+    if config.digest_mode:
+        # 同时合并之前中断未合并的片段
+        total['emails'] += merge_digest_parts(config.admin_email)
+
+    # 投递发件箱中所有到期的邮件（包括之前失败、已到重试时间的），等待发送完成
+    delivery = get_outbox_dispatcher().drain()
+    get_mail_dispatcher().stop()
+    total.update(sent=delivery['sent'], retrying=delivery['retrying'], failed=delivery['failed'])
+    total['elapsed'] = time.perf_counter() - start
+    total['workers'] = workers
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'summary': total,
+                'shards': [{key: value for key, value in summary.items() if key != 'alerts'}
+                           for summary in summaries]
+            }, f, ensure_ascii=False, indent=2)
+    print("=" * 60)
+    for summary in summaries:
+        print(f"  分片 {describe_shard(summary['shard'])}: 候选 {summary['candidates']}, "
+              f"危险 {summary['danger']}, 警告 {summary['warning']}, 错误 {summary['errors']}, "
+              f"用时 {summary['elapsed']:.2f} 秒")
+    print(f"📊 检查汇总: {total['shards']} 个分片 / {workers} 个进程, 候选 {total['candidates']} 个, "
+          f"提醒 {total['danger'] + total['warning']} 个（危险 {total['danger']} / 警告 {total['warning']}）, "
+          f"新提醒邮件 {total['emails']} 封, 投递成功 {total['sent']} / 等待重试 {total['retrying']} / 失败 {total['failed']}, "
+          f"用时 {total['elapsed']:.2f} 秒")
+    return 1 if total['errors'] or total['retrying'] or total['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+DNS解析健康检查模块
+用固定大小的线程池并发查询每个域名的 A / AAAA / NS 记录，
+直接向指定的DNS服务器发送UDP查询，每次查询都有超时，便于在测试中指向本地替身服务器
+"""
+
+import json
+import random
+import socket
+import struct
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_AAAA = 28
+TYPE_OPT = 41
+
+RCODE_NXDOMAIN = 3
+
+# 单个域名的检查结果
+# status: ok / nxdomain（域名不存在）/ no_address（没有A和AAAA记录）/ timeout / error
+DNSResult = namedtuple('DNSResult', ['name', 'status', 'a', 'aaaa', 'ns', 'error'])
+
+
+class DNSQueryError(Exception):
+    """DNS服务器返回了无法使用的响应"""
+
+
+def parse_resolver(value):
+    """把 "host"、"host:port" 或 "[IPv6]:port" 解析为 (host, port)"""
+    if value.startswith('['):
+        host, _, port = value[1:].partition(']')
+        return host, int(port.lstrip(':') or 53)
+    if value.count(':') == 1:
+        host, port = value.split(':')
+        return host, int(port)
+    return value, 53
+
+
+def system_resolver():
+    """读取 /etc/resolv.conf 中的第一个DNS服务器"""
+    try:
+        with open('/etc/resolv.conf') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    return parts[1], 53
+    except OSError:
+        pass
+    return '8.8.8.8', 53
+
+
+def encode_name(name):
+    labels = name.rstrip('.').encode('idna').split(b'.')
+    return b''.join(struct.pack('!B', len(label)) + label for label in labels) + b'\x00'
+
+
+def build_query(name, qtype, query_id):
+    """构造递归查询报文，附带EDNS0声明1232字节的UDP缓冲区，避免NS记录较多时被截断"""
+    header = struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 1)
+    question = encode_name(name) + struct.pack('!HH', qtype, 1)
+    opt = b'\x00' + struct.pack('!HHIH', TYPE_OPT, 1232, 0, 0)
+    return header + question + opt
+
+
+def _read_name(data, offset):
+    """读取可能带压缩指针的域名，返回 (域名, 名称之后的偏移量)"""
+    labels = []
+    end = None
+    for _ in range(128):
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+        elif length == 0:
+            return '.'.join(labels).lower(), (end if end is not None else offset + 1)
+        else:
+            labels.append(data[offset + 1:offset + 1 + length].decode('ascii', 'replace'))
+            offset += 1 + length
+    raise DNSQueryError('域名压缩指针循环')
+
+
+def parse_response(data, query_id, qtype):
+    """解析响应报文
+
+    Returns:
+        tuple: (rcode, 应答中与查询类型相同的记录值列表)
+    """
+    if len(data) < 12:
+        raise DNSQueryError('响应报文过短')
+    response_id, flags, qdcount, ancount = struct.unpack('!HHHH', data[:8])
+    if response_id != query_id or not flags & 0x8000:
+        raise DNSQueryError('响应ID不匹配')
+    rcode = flags & 0x000F
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(data, offset)
+        offset += 4
+    records = []
+    for _ in range(ancount):
+        _, offset = _read_name(data, offset)
+        rtype, _, _, rdlength = struct.unpack('!HHIH', data[offset:offset + 10])
+        offset += 10
+        rdata = data[offset:offset + rdlength]
+        if rtype == qtype == TYPE_A:
+            records.append(socket.inet_ntop(socket.AF_INET, rdata))
+        elif rtype == qtype == TYPE_AAAA:
+            records.append(socket.inet_ntop(socket.AF_INET6, rdata))
+        elif rtype == qtype == TYPE_NS:
+            records.append(_read_name(data, offset)[0])
+        offset += rdlength
+    return rcode, sorted(set(records))
+
+
+def resolve(name, qtype, resolver, timeout=2.0, retries=1):
+    """向 resolver 发送一次UDP查询，超时后最多重试 retries 次
+
+    Returns:
+        tuple: (rcode, 记录值列表)
+    """
+    family = socket.AF_INET6 if ':' in resolver[0] else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(resolver)
+        for attempt in range(retries + 1):
+            query_id = random.getrandbits(16)
+            sock.send(build_query(name, qtype, query_id))
+            try:
+                while True:
+                    data = sock.recv(4096)
+                    try:
+                        return parse_response(data, query_id, qtype)
+                    except DNSQueryError:
+                        # 上一次超时查询的迟到响应，继续等待本次的响应
+                        if data[:2] == struct.pack('!H', query_id):
+                            raise
+            except socket.timeout:
+                if attempt == retries:
+                    raise
+
+
+def encode_records(result):
+    """把解析结果压缩为JSON字符串保存，省略空的记录类型"""
+    records = {key: value for key, value in (('A', result.a), ('AAAA', result.aaaa), ('NS', result.ns)) if value}
+    return json.dumps(records, separators=(',', ':'), sort_keys=True) if records else None
+
+
+def decode_records(text):
+    """encode_records 的逆操作，返回 {'A': [...], 'AAAA': [...], 'NS': [...]}"""
+    records = json.loads(text) if text else {}
+    return {key: records.get(key, []) for key in ('A', 'AAAA', 'NS')}
+
+
+class DNSProber:
+    """并发检查一组域名的DNS解析
+
+    Args:
+        resolver: (host, port)，为空时使用系统配置的第一个DNS服务器
+        workers: 同时检查的域名数
+        timeout: 单次查询的超时秒数
+        retries: 单次查询超时后的重试次数
+    """
+
+    def __init__(self, resolver=None, workers=32, timeout=2.0, retries=1):
+        self.resolver = resolver or system_resolver()
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+
+    def probe(self, name):
+        """检查单个域名（依次查询A、AAAA、NS）"""
+        answers = {}
+        try:
+            for qtype in (TYPE_A, TYPE_AAAA, TYPE_NS):
+                rcode, records = resolve(name, qtype, self.resolver, self.timeout, self.retries)
+                if rcode == RCODE_NXDOMAIN:
+                    return DNSResult(name, 'nxdomain', [], [], [], None)
+                if rcode != 0:
+                    raise DNSQueryError(f'DNS服务器返回错误码 {rcode}')
+                answers[qtype] = records
+        except socket.timeout:
+            return DNSResult(name, 'timeout', [], [], [], '查询超时')
+        except (OSError, DNSQueryError, UnicodeError, struct.error, IndexError) as e:
+            return DNSResult(name, 'error', [], [], [], str(e) or type(e).__name__)
+        a, aaaa, ns = answers[TYPE_A], answers[TYPE_AAAA], answers[TYPE_NS]
+        return DNSResult(name, 'ok' if a or aaaa else 'no_address', a, aaaa, ns, None)
+
+    def probe_all(self, names):
+        """并发检查一组域名
+
+        Returns:
+            tuple: ({域名: DNSResult}, 统计信息)
+        """
+        names = list(dict.fromkeys(name.strip().lower() for name in names if name and name.strip()))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = dict(zip(names, executor.map(self.probe, names)))
+        elapsed = time.perf_counter() - start
+        stats = {
+            'probes': len(names),
+            'failed': sum(1 for result in results.values() if result.status != 'ok'),
+            'elapsed': elapsed,
+            'probes_per_second': len(names) / elapsed if elapsed > 0 else 0.0,
+        }
+        return results, stats
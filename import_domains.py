@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+域名批量导入脚本
+从CSV或JSON Lines文件逐行导入域名，每批一个事务，输出每行的错误
+运行方式: python import_domains.py 文件路径 [--user 用户名] [--format csv|jsonl] [--batch-size 行数]
+
+CSV表头 / JSON字段: name, registrar, registration_date, expiration_date, renewal_period,
+renewal_price, renewal_url, currency, needs_renewal, warning_threshold, danger_threshold
+"""
+
+import argparse
+import sys
+import time
+
+from app import app, User, create_app, import_domains
+from domain_io import detect_format
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入域名')
+    parser.add_argument('path', help='CSV 或 JSON Lines 文件')
+    parser.add_argument('--user', default='admin', help='域名所属用户名，默认 admin')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='文件格式，默认按扩展名判断')
+    parser.add_argument('--batch-size', type=int, help='每个事务插入的行数')
+    args = parser.parse_args()
+    create_app('cli')
+
+    with app.app_context():
+        user = User.query.filter_by(username=args.user).first()
+        if not user:
+            print(f"❌ 用户 {args.user} 不存在")
+            return 1
+
+        start = time.perf_counter()
+        with open(args.path, 'rb') as f:
+            result = import_domains(f, args.format or detect_format(args.path), user.id,
+                                    batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+
+    for error in result['errors']:
+        print(f"  第 {error['line']} 行: {error['message']}")
+    if result['failed'] > len(result['errors']):
+        print(f"  ……另有 {result['failed'] - len(result['errors'])} 行错误未列出")
+    print(f"✅ 导入 {result['imported']} 行，失败 {result['failed']} 行，用时 {elapsed:.2f} 秒")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from app import app, db, User, init_smtp_config
+from app import app, db, User, create_app, init_smtp_config
 from werkzeug.security import generate_password_hash
 
 def init_database():
@@ -19,4 +19,6 @@ def init_database():
         print("数据库初始化完成！")
 
 if __name__ == '__main__':
+    # 命令行运行时只需要日志，不检查数据库结构、不启动定时任务和投递器
+    create_app('cli')
     init_database()
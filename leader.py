@@ -0,0 +1,174 @@
+"""
+调度器主进程选举模块
+多个进程（如多个WSGI worker）共用一个数据库时，用数据库中的一行租约选出唯一的主进程运行定时任务。
+持有者每隔 interval 秒续约一次，把到期时间推后 ttl 秒；持有者退出时主动释放，
+意外退出时租约在 ttl 秒后过期，其他进程在下一次尝试时接管
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+
+def default_holder_id():
+    """主机名:进程号:随机后缀，同一进程中的每个租约对象也互不相同"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class LeaderLease:
+    """基于数据库行的主进程租约
+
+    租约表需要有 name（主键）、holder、expires_at、heartbeat_at、acquired_at 列。
+    获取和续约都是一条带条件的UPDATE：只有租约属于自己或已过期时才会更新成功，
+    因此同一时刻最多只有一个进程认为自己是主进程（各进程的时钟需要同步）
+
+    Args:
+        engine: SQLAlchemy 引擎
+        table: 租约表
+        name: 租约名称，同名租约的进程之间互斥
+        ttl: 租约有效秒数，持有者意外退出后最多这么久由其他进程接管
+        interval: 续约/尝试获取的间隔秒数，应明显小于 ttl
+        on_acquire: 成为主进程时调用
+        on_release: 失去主进程身份（续约失败或停止）时调用
+        on_renew: 作为主进程每次续约成功后调用
+    """
+
+    def __init__(self, engine, table, name='scheduler', ttl=15, interval=5, holder=None,
+                 on_acquire=None, on_release=None, on_renew=None):
+        self.engine = engine
+        self.table = table
+        self.name = name
+        self.ttl = ttl
+        self.interval = interval
+        self.holder = holder or default_holder_id()
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self.on_renew = on_renew
+        self.is_leader = False
+        self._deadline = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """先同步尝试一次（单进程时启动后立即成为主进程），再在后台线程中定期续约"""
+        self.tick()
+        self._thread = threading.Thread(target=self._run, name=f'leader-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止续约；如果是主进程则释放租约，让其他进程立即接管"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 5)
+        with self._lock:
+            if self.is_leader:
+                self._lose()
+                try:
+                    self.release()
+                except SQLAlchemyError as e:
+                    logger.warning('释放调度器租约失败: %s', e, extra={'lease': self.name, 'holder': self.holder})
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.tick()
+
+    def tick(self):
+        """尝试获取或续约一次，按结果切换主进程身份"""
+        with self._lock:
+            if self._stop.is_set() and self._thread is not None:
+                return
+            try:
+                acquired = self.try_acquire()
+            except SQLAlchemyError as e:
+                # 数据库暂时不可用：在本地记录的租约到期前保持身份，之后主动放弃
+                logger.warning('调度器租约续约失败: %s', e, extra={'lease': self.name, 'holder': self.holder})
+                if self.is_leader and time.monotonic() >= self._deadline:
+                    self._lose()
+                return
+            if acquired:
+                self._deadline = time.monotonic() + self.ttl
+                if not self.is_leader:
+                    self.is_leader = True
+                    logger.info('成为调度器主进程', extra={'lease': self.name, 'holder': self.holder})
+                    self._call(self.on_acquire)
+                else:
+                    self._call(self.on_renew)
+            elif self.is_leader:
+                self._lose()
+
+    def _lose(self):
+        self.is_leader = False
+        logger.info('不再是调度器主进程', extra={'lease': self.name, 'holder': self.holder})
+        self._call(self.on_release)
+
+    def _call(self, callback):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception:
+            logger.exception('调度器租约回调出错', extra={'lease': self.name})
+
+    def try_acquire(self):
+        """获取或续约租约
+
+        Returns:
+            bool: 本进程是否持有租约
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        table = self.table
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(table)
+                .where(table.c.name == self.name,
+                       or_(table.c.holder == self.holder, table.c.expires_at < now))
+                .values(
+                    # 续约时保留原接管时间，接管时记录当前时间
+                    acquired_at=case((table.c.holder == self.holder, table.c.acquired_at), else_=now),
+                    holder=self.holder,
+                    expires_at=expires_at,
+                    heartbeat_at=now,
+                )
+            )
+            if result.rowcount == 1:
+                return True
+        try:
+            with self.engine.begin() as conn:
+                if conn.execute(select(table.c.name).where(table.c.name == self.name)).first():
+                    return False
+                conn.execute(insert(table).values(
+                    name=self.name, holder=self.holder, expires_at=expires_at,
+                    heartbeat_at=now, acquired_at=now
+                ))
+            return True
+        except IntegrityError:
+            # 其他进程同时插入了租约行
+            return False
+
+    def release(self):
+        """把自己持有的租约标记为已过期"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(self.table)
+                .where(self.table.c.name == self.name, self.table.c.holder == self.holder)
+                .values(expires_at=datetime(1970, 1, 1))
+            )
+
+    def current(self):
+        """读取租约行，返回 (持有者, 到期时间)，没有租约时返回 None"""
+        table = self.table
+        with self.engine.connect() as conn:
+            row = conn.execute(select(table.c.holder, table.c.expires_at)
+                               .where(table.c.name == self.name)).first()
+        return tuple(row) if row else None
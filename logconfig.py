@@ -0,0 +1,113 @@
+"""
+日志配置模块
+业务代码只把日志记录放入内存队列（QueueHandler），由后台监听线程（QueueListener）格式化并写出，
+检查任务和发送线程不会因为写标准输出而互相等待。
+记录的附加字段（extra={...}，如 domain、alert_level、duration、outcome）在文本格式中以 key=value 追加在消息后，
+在 JSON 格式中作为独立的字段输出
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# LogRecord 自带的属性，其余属性都是通过 extra 传入的附加字段
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+_atexit_registered = False
+
+
+def record_fields(record):
+    """取出日志记录的附加字段"""
+    return {key: value for key, value in record.__dict__.items()
+            if key not in _STANDARD_ATTRS and not key.startswith('_')}
+
+
+def _format_field(value):
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    text = str(value)
+    return json.dumps(text, ensure_ascii=False) if not text or any(c in text for c in ' ="\n') else text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """文本格式：时间 级别 记录器: 消息 key=value ..."""
+
+    def __init__(self, fmt='%(asctime)s %(levelname)s %(name)s: %(message)s', datefmt=None):
+        super().__init__(fmt, datefmt)
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={_format_field(value)}' for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON格式：每条记录一行，便于日志系统按字段检索"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'severity': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(record_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """只在调用线程中合并消息参数和异常信息，格式化留给监听线程"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level='INFO', fmt='text', stream=None):
+    """把根记录器的输出改为经过队列的后台写出（重复调用时替换之前的设置）
+
+    Args:
+        level: 日志级别名称或数值
+        fmt: text 或 json
+        stream: 输出流，默认标准输出
+    """
+    global _listener, _atexit_registered
+    stop_logging()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else KeyValueFormatter())
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [_QueueHandler(log_queue)]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    if not _atexit_registered:
+        # 退出时写完队列中剩余的记录
+        atexit.register(stop_logging)
+        _atexit_registered = True
+    return _listener
+
+
+def stop_logging():
+    """停止监听线程，写完队列中剩余的记录"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
@@ -0,0 +1,317 @@
+"""
+邮件投递模块
+常驻后台的发送线程 + 有界队列，每个线程持有一个已登录的SMTP会话并复用，
+避免每封邮件都新建线程、重新握手和登录。
+smtplib 和 email 在第一次构造或发送邮件时才导入，不发邮件的进程不需要加载
+"""
+
+import logging
+import queue
+import time
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# SMTP连接参数快照（与数据库会话无关，可以在线程间安全传递）
+SMTPSettings = namedtuple('SMTPSettings', [
+    'mail_server', 'mail_port', 'mail_use_tls', 'mail_username',
+    'mail_password', 'mail_default_sender', 'admin_email', 'enabled', 'digest_mode'
+], defaults=(False,))
+
+
+def settings_from_config(config):
+    """把SMTPConfig模型转换为不可变的SMTPSettings"""
+    return SMTPSettings(
+        mail_server=config.mail_server,
+        mail_port=config.mail_port,
+        mail_use_tls=config.mail_use_tls,
+        mail_username=config.mail_username,
+        mail_password=config.mail_password,
+        mail_default_sender=config.mail_default_sender,
+        admin_email=config.admin_email,
+        enabled=config.enabled,
+        digest_mode=bool(config.digest_mode)
+    )
+
+
+class SettingsCache:
+    """进程内的SMTP配置快照缓存
+
+    第一次读取时调用 loader 从数据库加载，之后直接返回同一个不可变快照；
+    配置更新后用 replace() 原子地换成新快照。ttl 秒后重新加载，
+    让多进程部署中其他进程的修改最终也能生效（0表示不过期）
+
+    Args:
+        loader: 无参函数，返回当前的SMTPSettings（未配置时返回None）
+        ttl: 快照的最长有效秒数
+    """
+
+    _MISSING = object()
+
+    def __init__(self, loader, ttl=300):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._settings = self._MISSING
+        self._loaded_at = 0.0
+        self._generation = 0
+        self.loads = 0
+
+    def get(self):
+        settings = self._settings
+        if settings is not self._MISSING and not self._expired():
+            return settings
+        with self._lock:
+            if self._settings is not self._MISSING and not self._expired():
+                return self._settings
+            generation = self._generation
+        # 加载时不持有锁，避免数据库变慢时阻塞所有发送线程
+        settings = self.loader()
+        with self._lock:
+            self.loads += 1
+            if self._generation == generation:
+                self._store(settings)
+            elif self._settings is not self._MISSING:
+                # 加载期间配置被 replace()，以新快照为准
+                settings = self._settings
+        return settings
+
+    def replace(self, settings):
+        """用新快照替换缓存（配置提交后调用），正在进行的加载结果会被丢弃"""
+        with self._lock:
+            self._generation += 1
+            self._store(settings)
+
+    def invalidate(self):
+        """丢弃缓存，下次读取时重新加载"""
+        with self._lock:
+            self._generation += 1
+            self._settings = self._MISSING
+
+    def _store(self, settings):
+        self._settings = settings
+        self._loaded_at = time.monotonic()
+
+    def _expired(self):
+        return bool(self.ttl) and time.monotonic() - self._loaded_at > self.ttl
+
+
+def build_message(settings, subject, recipient, body, message_id=None):
+    """构造HTML邮件，message_id 用于让重发的同一封邮件在收件端可以去重"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    msg = MIMEMultipart()
+    msg['From'] = settings.mail_default_sender
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    if message_id:
+        msg['Message-ID'] = message_id
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+
+def open_smtp_connection(settings, timeout=30):
+    """建立并登录SMTP连接"""
+    import smtplib
+
+    # 根据端口选择连接方式：465使用SSL，其他端口使用普通连接，可能需要TLS
+    if settings.mail_port == 465:
+        server = smtplib.SMTP_SSL(settings.mail_server, settings.mail_port, timeout=timeout)
+    else:
+        server = smtplib.SMTP(settings.mail_server, settings.mail_port, timeout=timeout)
+        if settings.mail_use_tls:
+            server.starttls()
+    server.login(settings.mail_username, settings.mail_password)
+    return server
+
+
+def _connection_key(settings):
+    """决定会话能否复用的连接参数"""
+    return (settings.mail_server, settings.mail_port, settings.mail_use_tls,
+            settings.mail_username, settings.mail_password)
+
+
+class _SMTPSession:
+    """单个发送线程持有的SMTP会话，断开或闲置过久时自动重连"""
+
+    def __init__(self, idle_timeout, connect_timeout):
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.server = None
+        self.key = None
+        self.last_used = 0.0
+
+    def get(self, settings):
+        import smtplib
+
+        key = _connection_key(settings)
+        if self.server is not None and self.key != key:
+            # SMTP配置已变更，旧会话不能再用
+            self.close()
+        if self.server is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            # 闲置过久的会话可能已被服务器断开，用NOOP探测一下
+            try:
+                if self.server.noop()[0] != 250:
+                    self.close()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self.server is None:
+            self.server = open_smtp_connection(settings, timeout=self.connect_timeout)
+            self.key = key
+        return self.server
+
+    def send(self, settings, msg):
+        import smtplib
+
+        try:
+            self.get(settings).send_message(msg)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError):
+            # 会话失效，重连后重试一次；收件人被拒、认证失败等 SMTPException（也是 OSError 的子类）
+            # 是永久错误，重试也不会成功，直接交给调用方
+            self.close()
+            self.get(settings).send_message(msg)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        import smtplib
+
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self.server = None
+        self.key = None
+
+
+class MailDispatcher:
+    """常驻的邮件投递器
+
+    Args:
+        settings_provider: 无参函数，返回当前的SMTPSettings（未配置时返回None）
+        workers: 发送线程数，即SMTP会话池大小
+        queue_size: 待发送队列的最大长度
+        idle_timeout: 会话闲置超过该秒数后，复用前先用NOOP探测
+        observer: 每封邮件发送完成后在发送线程中调用 observer(是否成功, 耗时秒数)，用于统计指标
+    """
+
+    _STOP = object()
+
+    def __init__(self, settings_provider, workers=2, queue_size=1000,
+                 idle_timeout=60, connect_timeout=30, observer=None):
+        self.settings_provider = settings_provider
+        self.observer = observer
+        self.workers = workers
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started_at = None
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        """启动发送线程（重复调用无副作用）"""
+        with self._lock:
+            if self._threads:
+                return
+            self._started_at = time.monotonic()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'mail-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, subject, recipient, body, timeout=5, on_result=None, message_id=None):
+        """把邮件放入发送队列，队列已满时最多等待timeout秒
+
+        Args:
+            on_result: 发送完成后在发送线程中调用 on_result(是否成功, 错误信息)
+            message_id: 邮件的 Message-ID 头
+
+        Returns:
+            bool: 是否成功入队
+        """
+        self.start()
+        try:
+            self.queue.put((subject, recipient, body, on_result, message_id), timeout=timeout)
+            return True
+        except queue.Full:
+            logger.error('邮件队列已满，丢弃邮件', extra={'recipient': recipient, 'subject': subject,
+                                                      'outcome': 'dropped'})
+            return False
+
+    def stop(self, timeout=30):
+        """发送完队列中剩余的邮件后关闭所有会话"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        for _ in threads:
+            self.queue.put(self._STOP)
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        stats = self.stats()
+        logger.info('邮件投递器已关闭', extra={'sent': stats['sent'], 'failed': stats['failed'],
+                                              'messages_per_second': stats['messages_per_second']})
+
+    def stats(self):
+        """投递统计，吞吐量按启动以来的时间计算"""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'pending': self.queue.qsize(),
+            'elapsed': elapsed,
+            'messages_per_second': self.sent / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _run(self):
+        session = _SMTPSession(self.idle_timeout, self.connect_timeout)
+        try:
+            while True:
+                item = self.queue.get()
+                try:
+                    if item is self._STOP:
+                        return
+                    self._deliver(session, *item)
+                finally:
+                    self.queue.task_done()
+        finally:
+            session.close()
+
+    def _deliver(self, session, subject, recipient, body, on_result=None, message_id=None):
+        error = None
+        started = time.perf_counter()
+        try:
+            settings = self.settings_provider()
+            if not settings or not settings.enabled:
+                error = 'SMTP未启用或未配置'
+            else:
+                session.send(settings, build_message(settings, subject, recipient, body, message_id))
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        duration = time.perf_counter() - started
+        if error is not None:
+            logger.warning('发送邮件失败: %s', error, extra={'recipient': recipient, 'duration': duration,
+                                                          'outcome': 'failed'})
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug('邮件已发送', extra={'recipient': recipient, 'duration': duration, 'outcome': 'sent'})
+        with self._lock:
+            if error is None:
+                self.sent += 1
+            else:
+                self.failed += 1
+        if self.observer is not None:
+            try:
+                self.observer(error is None, duration)
+            except Exception:
+                logger.exception('邮件发送统计出错')
+        if on_result is not None:
+            try:
+                on_result(error is None, error)
+            except Exception:
+                logger.exception('邮件发送结果回调出错')
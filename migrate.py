@@ -9,15 +9,20 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import text
-from datetime import datetime
-import os
+from datetime import datetime, timedelta
+from storage import configure_storage, database_ready, init_storage
 
 # 创建Flask应用实例用于迁移
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///domain.db'
+configure_storage(app)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
+init_storage(app, db)
+
+# 定义User模型（仅用于迁移，Domain的外键需要引用它）
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
 
 # 定义Domain模型（仅用于迁移）
 class Domain(db.Model):
@@ -25,7 +30,7 @@ class Domain(db.Model):
     name = db.Column(db.String(255), nullable=False)
     registrar = db.Column(db.String(255))
     registration_date = db.Column(db.DateTime)
-    expiration_date = db.Column(db.DateTime, nullable=False)
+    expiration_date = db.Column(db.DateTime, nullable=False, index=True)
     renewal_period = db.Column(db.String(50))
     renewal_price = db.Column(db.String(255))
     renewal_url = db.Column(db.String(500))
@@ -38,15 +43,90 @@ class Domain(db.Model):
     danger_sent = db.Column(db.Boolean, default=False)
     last_checked = db.Column(db.DateTime, default=datetime.utcnow)
     needs_renewal = db.Column(db.Boolean, default=True)
+    next_alert_at = db.Column(db.DateTime, index=True)
+    warning_at = db.Column(db.DateTime)
+    danger_at = db.Column(db.DateTime)
+    dns_status = db.Column(db.String(16))
+    dns_records = db.Column(db.String(2000))
+    dns_checked_at = db.Column(db.DateTime)
+    dns_ns_changed_at = db.Column(db.DateTime)
+    tls_expires_at = db.Column(db.DateTime)
+    tls_checked_at = db.Column(db.DateTime)
+    tls_error = db.Column(db.String(255))
+    tls_warning_sent = db.Column(db.Boolean, default=False)
+    tls_danger_sent = db.Column(db.Boolean, default=False)
+    
+    __table_args__ = (
+        db.Index('ix_domain_user_expiration', 'user_id', 'expiration_date', 'id'),
+    )
+
+# 定义调度器租约表（仅用于迁移）
+class SchedulerLease(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, nullable=False)
+    acquired_at = db.Column(db.DateTime, nullable=False)
+
+# 定义提醒邮件发件箱表（仅用于迁移）
+class AlertOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    alert_key = db.Column(db.String(255), nullable=False, index=True)
+    idempotency_key = db.Column(db.String(255), nullable=False, unique=True)
+    kind = db.Column(db.String(20), nullable=False)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(500), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32))
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_alert_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
+# 定义域名状态汇总表（仅用于迁移）
+class DomainSummary(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    danger_count = db.Column(db.Integer, nullable=False, default=0)
+    warning_count = db.Column(db.Integer, nullable=False, default=0)
+    healthy_count = db.Column(db.Integer, nullable=False, default=0)
+    permanent_count = db.Column(db.Integer, nullable=False, default=0)
+    next_expiration = db.Column(db.DateTime)
+    valid_until = db.Column(db.DateTime)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+# 定义数据版本表（仅用于迁移）
+class DataVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+def compute_alert_times(domain):
+    """计算 next_alert_at、warning_at 和 danger_at（与 app.py 中 Domain.refresh_alert_times 的规则一致）"""
+    if domain.needs_renewal is False or not domain.expiration_date:
+        return None, None, None
+    danger = domain.danger_threshold if domain.danger_threshold is not None else 7
+    warning = domain.warning_threshold if domain.warning_threshold is not None else 30
+    change_time = lambda threshold: domain.expiration_date - timedelta(days=threshold + 1) + timedelta(seconds=1)
+    if domain.danger_sent:
+        next_alert_at = None
+    else:
+        next_alert_at = change_time(danger if domain.warning_sent else max(warning, danger))
+    return next_alert_at, change_time(warning), change_time(danger)
 
 def migrate_database():
     """迁移数据库，添加缺失的字段"""
     with app.app_context():
         try:
-            # 检查数据库文件是否存在
-            if not os.path.exists('instance/domain.db'):
+            # 检查数据库是否已初始化
+            if not database_ready(db):
                 print("=" * 60)
-                print("❌ 数据库文件 domain.db 不存在")
+                print(f"❌ 数据库 {db.engine.url} 中没有数据表")
                 print("=" * 60)
                 print("请先运行 app.py 初始化数据库")
                 return False
@@ -91,6 +171,99 @@ def migrate_database():
                 print("✅ needs_renewal 字段添加成功")
                 migration_needed = True
             
+            next_alert_added = False
+            if 'next_alert_at' not in columns:
+                print("\n➕ 添加 next_alert_at 字段...")
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN next_alert_at DATETIME'))
+                db.session.execute(text('CREATE INDEX ix_domain_next_alert_at ON domain (next_alert_at)'))
+                db.session.commit()
+                print("✅ next_alert_at 字段添加成功")
+                migration_needed = True
+                next_alert_added = True
+            
+            if 'danger_at' not in columns:
+                print("\n➕ 添加 warning_at / danger_at 字段...")
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN warning_at DATETIME'))
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN danger_at DATETIME'))
+                db.session.commit()
+                print("✅ warning_at / danger_at 字段添加成功")
+                migration_needed = True
+                next_alert_added = True
+            
+            if 'dns_status' not in columns:
+                print("\n➕ 添加 DNS 检查字段...")
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN dns_status VARCHAR(16)'))
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN dns_records VARCHAR(2000)'))
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN dns_checked_at DATETIME'))
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN dns_ns_changed_at DATETIME'))
+                db.session.commit()
+                print("✅ DNS 检查字段添加成功")
+                migration_needed = True
+            
+            if 'tls_expires_at' not in columns:
+                print("\n➕ 添加 HTTPS 证书检查字段...")
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN tls_expires_at DATETIME'))
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN tls_checked_at DATETIME'))
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN tls_error VARCHAR(255)'))
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN tls_warning_sent BOOLEAN DEFAULT FALSE'))
+                db.session.execute(text('ALTER TABLE domain ADD COLUMN tls_danger_sent BOOLEAN DEFAULT FALSE'))
+                db.session.commit()
+                print("✅ HTTPS 证书检查字段添加成功")
+                migration_needed = True
+            
+            # SMTP配置表新增的字段
+            smtp_columns = [col['name'] for col in inspector.get_columns('smtp_config')]
+            if 'digest_mode' not in smtp_columns:
+                print("\n➕ 添加 digest_mode 字段...")
+                db.session.execute(text('ALTER TABLE smtp_config ADD COLUMN digest_mode BOOLEAN NOT NULL DEFAULT FALSE'))
+                db.session.commit()
+                print("✅ digest_mode 字段添加成功")
+                migration_needed = True
+            
+            # 为到期日期添加索引，域名检查只扫描临近到期的记录
+            indexes = [index['name'] for index in inspector.get_indexes('domain')]
+            if 'ix_domain_expiration_date' not in indexes:
+                print("\n➕ 添加 expiration_date 索引...")
+                db.session.execute(text('CREATE INDEX ix_domain_expiration_date ON domain (expiration_date)'))
+                db.session.commit()
+                print("✅ expiration_date 索引添加成功")
+                migration_needed = True
+            
+            if 'ix_domain_user_expiration' not in indexes:
+                print("\n➕ 添加 (user_id, expiration_date) 索引...")
+                db.session.execute(text('CREATE INDEX ix_domain_user_expiration ON domain (user_id, expiration_date, id)'))
+                db.session.commit()
+                print("✅ (user_id, expiration_date) 索引添加成功")
+                migration_needed = True
+            
+            # 调度器主进程选举使用的租约表
+            if not inspector.has_table('scheduler_lease'):
+                print("\n➕ 创建 scheduler_lease 表...")
+                SchedulerLease.__table__.create(db.engine)
+                print("✅ scheduler_lease 表创建成功")
+                migration_needed = True
+            
+            # 提醒邮件发件箱表
+            if not inspector.has_table('alert_outbox'):
+                print("\n➕ 创建 alert_outbox 表...")
+                AlertOutbox.__table__.create(db.engine)
+                print("✅ alert_outbox 表创建成功")
+                migration_needed = True
+            
+            # 域名状态汇总表（首次读取时按用户统计）
+            if not inspector.has_table('domain_summary'):
+                print("\n➕ 创建 domain_summary 表...")
+                DomainSummary.__table__.create(db.engine)
+                print("✅ domain_summary 表创建成功")
+                migration_needed = True
+            
+            # 数据版本表（多进程共享的首页缓存键，第一次修改域名时写入）
+            if not inspector.has_table('data_version'):
+                print("\n➕ 创建 data_version 表...")
+                DataVersion.__table__.create(db.engine)
+                print("✅ data_version 表创建成功")
+                migration_needed = True
+            
             if not migration_needed:
                 print("\n✅ 数据库已是最新版本，无需迁移")
                 return True
@@ -109,6 +282,13 @@ def migrate_database():
                 db.session.commit()
                 print(f"\n✅ 已为 {renewal_date_count} 个域名设置 renewal_date")
             
+            # 为现有域名计算下一次提醒时间和状态变化时间
+            if next_alert_added:
+                for domain in domains:
+                    domain.next_alert_at, domain.warning_at, domain.danger_at = compute_alert_times(domain)
+                db.session.commit()
+                print(f"\n✅ 已为 {len(domains)} 个域名计算提醒时间")
+            
             # 验证迁移结果
             inspector = db.inspect(db.engine)
             new_columns = [col['name'] for col in inspector.get_columns('domain')]
@@ -0,0 +1,248 @@
+"""
+提醒邮件发件箱
+检查任务不直接发送邮件，而是把邮件写入发件箱表，与提醒标志的更新在同一个事务中提交：
+事务回滚时邮件和标志一起撤销，不会丢失也不会重复。
+投递器分批取出到期的待发邮件交给 MailDispatcher 发送，失败的按指数退避重试，
+超过最大次数后标记为失败，可以在管理接口中查看并重新投递
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+# 暂存：分片检查写入的汇总邮件片段，等待合并为一封汇总邮件，投递器不取
+STATUS_HELD = 'held'
+
+
+def message_id_for(key):
+    """由幂等键生成固定的 Message-ID，同一条提醒重发时收件端可以识别为同一封邮件"""
+    return f'<{hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]}@domain-monitor>'
+
+
+def backoff_delay(attempts, base_delay, max_delay):
+    """第 attempts 次失败后的重试等待秒数：base_delay * 2^(attempts-1)，不超过 max_delay"""
+    return min(max_delay, base_delay * 2 ** max(0, attempts - 1))
+
+
+class OutboxDispatcher:
+    """从发件箱表取出待发邮件并投递
+
+    发件箱表需要有 id、idempotency_key、recipient、subject、body、status、attempts、
+    next_attempt_at、claim_token、last_error、sent_at 列。
+    取件时用 claim_token 标记本次取出的行，并把 next_attempt_at 推后 claim_timeout 秒：
+    多个进程同时投递也不会重复发送，投递进程意外退出时这些行在超时后重新可取
+
+    Args:
+        engine: SQLAlchemy 引擎
+        table: 发件箱表
+        mailer: MailDispatcher
+        batch_size: 每批取出的邮件数
+        max_attempts: 最多尝试次数，超过后标记为失败
+        base_delay / max_delay: 重试退避的初始和最大秒数
+        claim_timeout: 取件的有效秒数，超时后其他进程可以重新取出；本进程最多等待其中的 80% 后记录结果
+        poll_interval: 后台线程检查发件箱的间隔秒数
+    """
+
+    def __init__(self, engine, table, mailer, batch_size=100, max_attempts=8,
+                 base_delay=60, max_delay=6 * 3600, claim_timeout=300, poll_interval=10):
+        self.engine = engine
+        self.table = table
+        self.mailer = mailer
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._drain_lock = threading.Lock()
+
+    def start(self):
+        """启动后台投递线程（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='alert-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        """有新邮件写入发件箱后调用，后台线程立即检查而不等到下一个间隔"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except SQLAlchemyError:
+                logger.exception('发件箱投递出错')
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def drain(self):
+        """投递所有已到期的待发邮件，直到发件箱中没有到期的邮件
+
+        Returns:
+            dict: {'sent': 成功数, 'retrying': 等待重试数, 'failed': 放弃数}
+        """
+        stats = {'sent': 0, 'retrying': 0, 'failed': 0}
+        start = time.perf_counter()
+        with self._drain_lock:
+            while not self._stop.is_set():
+                batch = self.dispatch_batch()
+                for key in stats:
+                    stats[key] += batch[key]
+                if not any(batch.values()):
+                    break
+        if stats['sent'] or stats['retrying'] or stats['failed']:
+            logger.info('发件箱投递完成', extra={**stats, 'duration': time.perf_counter() - start})
+        return stats
+
+    def claim(self):
+        """取出一批到期的邮件，返回行列表"""
+        table = self.table
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = or_(table.c.status == STATUS_PENDING, table.c.status == STATUS_SENDING)
+        with self.engine.begin() as conn:
+            ids = conn.execute(
+                select(table.c.id)
+                .where(due, table.c.next_attempt_at <= now)
+                .order_by(table.c.next_attempt_at, table.c.id)
+                .limit(self.batch_size)
+            ).scalars().all()
+            if not ids:
+                return []
+            # 条件更新：其他进程已经取走的行不会被重复取出
+            conn.execute(
+                update(table)
+                .where(table.c.id.in_(ids), due, table.c.next_attempt_at <= now)
+                .values(status=STATUS_SENDING, claim_token=token,
+                        next_attempt_at=now + timedelta(seconds=self.claim_timeout))
+            )
+        with self.engine.connect() as conn:
+            return conn.execute(select(table).where(table.c.claim_token == token)
+                                .order_by(table.c.id)).all()
+
+    def dispatch_batch(self):
+        """取出一批邮件交给发送线程，等待全部完成后一次性记录结果"""
+        rows = self.claim()
+        if not rows:
+            return {'sent': 0, 'retrying': 0, 'failed': 0}
+
+        results = {}
+        done = threading.Condition()
+
+        def record(row_id, ok, error):
+            with done:
+                results[row_id] = (ok, error)
+                done.notify_all()
+
+        for row in rows:
+            submitted = self.mailer.submit(
+                row.subject, row.recipient, row.body,
+                on_result=lambda ok, error, row_id=row.id: record(row_id, ok, error),
+                message_id=message_id_for(row.idempotency_key)
+            )
+            if not submitted:
+                record(row.id, False, '邮件队列已满')
+
+        # 在取件超时（之后其他进程可以重新取出这些行）之前停止等待并记录结果，留出写回的时间
+        deadline = time.monotonic() + self.claim_timeout * 0.8
+        with done:
+            while len(results) < len(rows) and time.monotonic() < deadline:
+                done.wait(deadline - time.monotonic())
+            results = dict(results)
+        return self.record_results(rows, results)
+
+    def record_results(self, rows, results):
+        """写回一批邮件的发送结果
+
+        只更新仍由本次取件持有（claim_token 未变）的行：取件超时后被其他进程重新取出的行
+        以对方的结果为准，本次迟到的结果不覆盖对方的状态
+        """
+        table = self.table
+        now = datetime.utcnow()
+        stats = {'sent': 0, 'retrying': 0, 'failed': 0}
+        sent_ids = {row.id for row in rows if results.get(row.id, (False,))[0]}
+        with self.engine.begin() as conn:
+            if sent_ids:
+                stats['sent'] = conn.execute(
+                    update(table).where(table.c.id.in_(list(sent_ids)), table.c.claim_token == rows[0].claim_token)
+                    .values(status=STATUS_SENT, sent_at=now, claim_token=None, last_error=None,
+                            attempts=table.c.attempts + 1)
+                ).rowcount
+            for row in rows:
+                if row.id in sent_ids:
+                    continue
+                error = results.get(row.id, (False, '发送超时'))[1]
+                attempts = row.attempts + 1
+                if attempts >= self.max_attempts:
+                    values = {'status': STATUS_FAILED}
+                    outcome = 'failed'
+                else:
+                    delay = backoff_delay(attempts, self.base_delay, self.max_delay)
+                    values = {'status': STATUS_PENDING, 'next_attempt_at': now + timedelta(seconds=delay)}
+                    outcome = 'retrying'
+                stats[outcome] += conn.execute(
+                    update(table).where(table.c.id == row.id, table.c.claim_token == row.claim_token)
+                    .values(attempts=attempts, claim_token=None, last_error=(error or '')[:500], **values)
+                ).rowcount
+        return stats
+
+    def replay(self, ids=None):
+        """把失败的邮件（或指定ID的未发送邮件）重新放回待发状态，返回重新投递的数量
+
+        暂存的汇总片段不是邮件，不会被放回待发状态
+        """
+        table = self.table
+        condition = (table.c.status == STATUS_FAILED if ids is None
+                     else and_(table.c.id.in_(ids), table.c.status.notin_((STATUS_SENT, STATUS_HELD))))
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(table).where(condition)
+                .values(status=STATUS_PENDING, attempts=0, next_attempt_at=datetime.utcnow(),
+                        claim_token=None)
+            )
+        self.wake()
+        return result.rowcount
+
+    def purge(self, older_than_days):
+        """删除发送成功超过指定天数的邮件，返回删除的数量"""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                delete(self.table).where(self.table.c.status == STATUS_SENT, self.table.c.sent_at < cutoff)
+            )
+        return result.rowcount
+
+    def counts(self):
+        """各状态的邮件数"""
+        return outbox_counts(self.engine, self.table)
+
+
+def outbox_counts(engine, table):
+    """发件箱中各状态的邮件数（不需要投递器，指标和管理接口直接调用）"""
+    with engine.connect() as conn:
+        rows = conn.execute(select(table.c.status, func.count()).group_by(table.c.status)).all()
+    return {status: count for status, count in rows}
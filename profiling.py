@@ -0,0 +1,138 @@
+"""
+请求性能分析模块
+为每个请求记录总耗时、SQL语句数和SQL总耗时（通过 SQLAlchemy 引擎事件统计），
+在响应中加入 Server-Timing 头（浏览器开发者工具的“计时”面板可以直接查看），
+超过阈值的慢请求写入日志；按需或按比例对单个请求运行 cProfile，把结果保存为 .prof 文件。
+只在启用时注册请求钩子和引擎事件，未启用时没有任何额外开销
+"""
+
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request, session
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# 请求头 X-Profile: 1 表示希望对本次请求运行 cProfile
+PROFILE_HEADER = 'X-Profile'
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+
+
+class RequestProfiler:
+    """请求性能分析
+
+    Args:
+        engine: 要统计SQL的 SQLAlchemy 引擎
+        slow_threshold: 慢请求阈值（秒），超过时写一条 WARNING 日志
+        profile_dir: cProfile 结果的保存目录
+        sample_rate: 自动运行 cProfile 的请求比例（0 表示只在请求带 X-Profile 头时运行）
+        token: 设置后带 X-Profile-Token 头的请求也可以要求 cProfile（否则只有管理员可以）
+    """
+
+    def __init__(self, engine, slow_threshold=0.5, profile_dir='profiles', sample_rate=0.0, token=None):
+        self.engine = engine
+        self.slow_threshold = slow_threshold
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.token = token
+        self._local = threading.local()
+        # 同一时刻只运行一个 cProfile（解释器不支持多个分析器同时启用）
+        self._profile_lock = threading.Lock()
+
+    def init_app(self, app):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        return self
+
+    # SQL统计：只累计当前线程正在处理的请求
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = getattr(self._local, 'stats', None)
+        if stats is not None:
+            stats['started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = getattr(self._local, 'stats', None)
+        if stats is not None and stats['started'] is not None:
+            stats['count'] += 1
+            stats['time'] += time.perf_counter() - stats['started']
+            stats['started'] = None
+
+    def _wants_profile(self):
+        if request.headers.get(PROFILE_HEADER) == '1':
+            if self.token and request.headers.get(PROFILE_TOKEN_HEADER) == self.token:
+                return True
+            return session.get('username') == 'admin'
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self):
+        self._local.stats = {'count': 0, 'time': 0.0, 'started': None}
+        g.profiler_started = time.perf_counter()
+        g.profiler_profile = None
+        if self._wants_profile() and self._profile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # 其他分析器（如调试器）已经启用
+                self._profile_lock.release()
+            else:
+                g.profiler_profile = profile
+
+    def _finish(self, response):
+        stats = getattr(self._local, 'stats', None)
+        self._local.stats = None
+        started = g.pop('profiler_started', None)
+        profile = g.pop('profiler_profile', None)
+        if profile is not None:
+            profile.disable()
+            self._profile_lock.release()
+        if stats is None or started is None:
+            return response
+
+        duration = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        response.headers.add('Server-Timing', f'app;dur={duration * 1000:.1f}')
+        response.headers.add('Server-Timing',
+                             f'db;dur={stats["time"] * 1000:.1f};desc="{stats["count"]} queries"')
+        if profile is not None:
+            path = self._dump(profile, endpoint)
+            if path:
+                response.headers['X-Profile-File'] = os.path.basename(path)
+        if duration >= self.slow_threshold:
+            logger.warning('慢请求', extra={
+                'method': request.method, 'path': request.path, 'endpoint': endpoint,
+                'status': response.status_code, 'duration': duration,
+                'sql_count': stats['count'], 'sql_time': stats['time'],
+            })
+        return response
+
+    def _teardown(self, exc):
+        # 请求未经过 after_request（例如响应生成前出错）时也要停止 cProfile 并释放锁
+        profile = g.pop('profiler_profile', None)
+        if profile is not None:
+            profile.disable()
+            self._profile_lock.release()
+        self._local.stats = None
+
+    def _dump(self, profile, endpoint):
+        """保存 cProfile 结果，可用 python -m pstats 或 snakeviz 查看"""
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            name = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}-{re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)}.prof"
+            path = os.path.join(self.profile_dir, name)
+            profile.dump_stats(path)
+        except OSError as e:
+            logger.warning('保存性能分析结果失败: %s', e)
+            return None
+        logger.info('已保存请求性能分析结果', extra={'endpoint': endpoint, 'file': path})
+        return path
@@ -0,0 +1,228 @@
+"""
+RDAP域名注册信息查询模块
+用asyncio并发查询所有域名的到期日期和注册商，
+按注册局限速、缓存查询结果，供后台定时刷新 Domain.expiration_date / registrar
+"""
+
+import asyncio
+import json
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+IANA_BOOTSTRAP_URL = 'https://data.iana.org/rdap/dns.json'
+
+# 被限流后重试前最多等待的秒数（等待期间占用一个并发名额）
+MAX_RETRY_AFTER = 10
+
+# 单个域名的查询结果，查询失败时 error 不为空
+RDAPResult = namedtuple('RDAPResult', [
+    'name', 'expiration_date', 'registration_date', 'registrar', 'error'
+])
+
+
+def retry_after_seconds(value, default=1.0, maximum=MAX_RETRY_AFTER):
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析时返回 default，结果限制在 [0, maximum]"""
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    if seconds != seconds:  # NaN
+        return default
+    return min(max(seconds, 0.0), maximum)
+
+
+def parse_rdap_datetime(value):
+    """把RDAP的ISO 8601时间转换为naive UTC datetime"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_rdap_domain(name, data):
+    """从RDAP domain响应中取出到期日期、注册日期和注册商"""
+    events = {}
+    for event in data.get('events', []):
+        events.setdefault(event.get('eventAction'), event.get('eventDate'))
+
+    registrar = None
+    for entity in data.get('entities', []):
+        if 'registrar' not in entity.get('roles', []):
+            continue
+        # vcardArray: ["vcard", [["fn", {}, "text", "Registrar Name"], ...]]
+        for field in (entity.get('vcardArray') or [None, []])[1]:
+            if field and field[0] == 'fn':
+                registrar = field[3]
+                break
+        break
+
+    return RDAPResult(
+        name=name,
+        expiration_date=parse_rdap_datetime(events.get('expiration')),
+        registration_date=parse_rdap_datetime(events.get('registration')),
+        registrar=registrar,
+        error=None
+    )
+
+
+def _http_get_json(url, timeout):
+    request = urllib.request.Request(url, headers={
+        'Accept': 'application/rdap+json, application/json',
+        'User-Agent': 'domain-monitor-system'
+    })
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+class _RateLimiter:
+    """单个注册局的请求限速（每秒最多rate次），只在事件循环线程中使用"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class RDAPRefresher:
+    """并发查询域名注册信息
+
+    Args:
+        bootstrap_url: IANA RDAP引导文件地址，用于按顶级域名找到注册局的RDAP服务
+        base_url: 固定的RDAP服务地址（设置后不再读取引导文件，用于本地测试）
+        concurrency: 同时进行的查询数
+        rate_limit: 每个注册局每秒最多的请求数，0表示不限速
+        cache_ttl: 查询结果缓存秒数
+        timeout: 单次HTTP请求超时秒数
+    """
+
+    def __init__(self, bootstrap_url=IANA_BOOTSTRAP_URL, base_url=None, concurrency=20,
+                 rate_limit=5, cache_ttl=6 * 3600, timeout=10):
+        self.bootstrap_url = bootstrap_url
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self._cache = {}
+        self._bootstrap = None
+        self._bootstrap_loaded_at = 0.0
+
+    def refresh(self, names):
+        """同步入口：查询一组域名
+
+        Returns:
+            tuple: ({域名: RDAPResult}, 统计信息)
+        """
+        return asyncio.run(self.lookup_all(names))
+
+    async def lookup_all(self, names):
+        start = time.perf_counter()
+        stats = {'lookups': 0, 'cache_hits': 0, 'errors': 0}
+        results = {}
+        pending = []
+        now = time.monotonic()
+        for name in dict.fromkeys(name.strip().lower() for name in names if name):
+            cached = self._cache.get(name)
+            if cached and cached[0] > now:
+                results[name] = cached[1]
+                stats['cache_hits'] += 1
+            else:
+                pending.append(name)
+
+        if pending:
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                fetch = lambda url: loop.run_in_executor(executor, _http_get_json, url, self.timeout)
+                bootstrap = await self._load_bootstrap(fetch)
+                semaphore = asyncio.Semaphore(self.concurrency)
+                limiters = {}
+
+                async def lookup(name):
+                    try:
+                        result = await self._lookup(name, bootstrap, fetch, semaphore, limiters)
+                    except Exception as e:
+                        # 单个域名的意外错误只记为该域名查询失败，不中断其他域名
+                        result = RDAPResult(name, None, None, None, str(e) or type(e).__name__)
+                    results[name] = result
+                    if result.error:
+                        stats['errors'] += 1
+                    else:
+                        # 只缓存成功的结果，失败的下次重新查询
+                        self._cache[name] = (time.monotonic() + self.cache_ttl, result)
+
+                await asyncio.gather(*(lookup(name) for name in pending))
+            stats['lookups'] = len(pending)
+
+        stats['elapsed'] = time.perf_counter() - start
+        stats['lookups_per_second'] = stats['lookups'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+        return results, stats
+
+    async def _load_bootstrap(self, fetch):
+        """读取IANA引导文件，得到 {顶级域名: RDAP服务地址}"""
+        if self.base_url:
+            return None
+        if self._bootstrap is not None and time.monotonic() - self._bootstrap_loaded_at < self.cache_ttl:
+            return self._bootstrap
+        data = await fetch(self.bootstrap_url)
+        bootstrap = {}
+        for tlds, urls in data.get('services', []):
+            # 优先使用https地址
+            url = sorted(urls, key=lambda u: not u.startswith('https'))[0]
+            for tld in tlds:
+                bootstrap[tld.lower()] = url
+        self._bootstrap = bootstrap
+        self._bootstrap_loaded_at = time.monotonic()
+        return bootstrap
+
+    async def _lookup(self, name, bootstrap, fetch, semaphore, limiters):
+        try:
+            ascii_name = name.encode('idna').decode('ascii')
+        except UnicodeError as e:
+            return RDAPResult(name, None, None, None, f'无效的域名: {e}')
+
+        if self.base_url:
+            base_url = self.base_url
+        else:
+            base_url = bootstrap.get(ascii_name.rsplit('.', 1)[-1])
+            if not base_url:
+                return RDAPResult(name, None, None, None, '该顶级域名没有RDAP服务')
+
+        url = base_url.rstrip('/') + '/domain/' + ascii_name
+        limiter = limiters.setdefault(urlsplit(base_url).netloc, _RateLimiter(self.rate_limit))
+        async with semaphore:
+            for attempt in range(2):
+                await limiter.wait()
+                try:
+                    return parse_rdap_domain(name, await fetch(url))
+                except urllib.error.HTTPError as e:
+                    if e.code == 429 and attempt == 0:
+                        # 被注册局限流，等待后重试一次
+                        await asyncio.sleep(retry_after_seconds(e.headers.get('Retry-After') if e.headers else None))
+                        continue
+                    return RDAPResult(name, None, None, None, f'HTTP {e.code}')
+                except Exception as e:
+                    return RDAPResult(name, None, None, None, str(e))
@@ -103,11 +103,11 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // 编辑域名按钮点击事件
-    const editButtons = document.querySelectorAll('.edit-domain');
-    editButtons.forEach(button => {
-        button.addEventListener('click', function() {
-            const domainId = this.getAttribute('data-domain-id');
+    // 编辑域名按钮点击事件 - 使用事件委托，分页加载的卡片也能工作
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('.edit-domain');
+        if (button) {
+            const domainId = button.getAttribute('data-domain-id');
             console.log('Editing domain ID:', domainId);
 
             // 获取域名数据并填充表单
@@ -162,7 +162,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 console.error('Error:', error);
                 alert('获取域名数据失败，请检查网络连接或刷新页面重试');
             });
-        });
+        }
     });
 
     // 编辑域名表单提交
@@ -201,10 +201,10 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // 删除域名按钮点击事件
-    const deleteButtons = document.querySelectorAll('.delete-domain');
-    deleteButtons.forEach(button => {
-        button.addEventListener('click', function() {
-            const domainId = this.getAttribute('data-domain-id');
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('.delete-domain');
+        if (button) {
+            const domainId = button.getAttribute('data-domain-id');
 
             if (confirm('确定要删除这个域名吗？此操作不可恢复。')) {
                 fetch(`/delete_domain/${domainId}`, {
@@ -224,7 +224,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     alert('删除失败，请重试');
                 });
             }
-        });
+        }
     });
 
     // 辅助函数：安全地设置表单字段值
@@ -238,23 +238,23 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // 续费功能
-    const renewButtons = document.querySelectorAll('.renew-domain');
     const renewConfirmModal = new bootstrap.Modal(document.getElementById('renewConfirmModal'));
     const confirmRenewalBtn = document.getElementById('confirmRenewalBtn');
     const renewalConfirmedCheckbox = document.getElementById('renewalConfirmed');
     
     // 续费按钮点击事件
-    renewButtons.forEach(button => {
-        button.addEventListener('click', function(e) {
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('.renew-domain');
+        if (button) {
             e.preventDefault(); // 阻止默认的链接跳转
             
-            const domainId = this.getAttribute('data-domain-id');
-            const domainName = this.getAttribute('data-domain-name');
-            const renewalPeriod = this.getAttribute('data-renewal-period');
-            const currentExpiration = this.getAttribute('data-current-expiration');
+            const domainId = button.getAttribute('data-domain-id');
+            const domainName = button.getAttribute('data-domain-name');
+            const renewalPeriod = button.getAttribute('data-renewal-period');
+            const currentExpiration = button.getAttribute('data-current-expiration');
             
             // 打开续费网址在新标签页
-            window.open(this.href, '_blank');
+            window.open(button.href, '_blank');
             
             // 填充模态框数据
             document.getElementById('renew_domain_id').value = domainId;
@@ -277,7 +277,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // 显示确认模态框
             renewConfirmModal.show();
-        });
+        }
     });
     
     // 确认复选框状态改变事件
@@ -321,6 +321,71 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    // 批量操作
+    const batchToolbar = document.getElementById('batchToolbar');
+    const batchSelectedCount = document.getElementById('batchSelectedCount');
+    const batchActions = {
+        renew: { url: '/batch_renew_domains', confirm: '确定要按各自的续费周期续费选中的 {n} 个域名吗？' },
+        reset: { url: '/batch_reset_domain_flags', confirm: '确定要重置选中的 {n} 个域名的邮件发送状态吗？' },
+        delete: { url: '/batch_delete_domains', confirm: '确定要删除选中的 {n} 个域名吗？此操作不可恢复。' }
+    };
+    
+    function selectedDomainIds() {
+        return Array.from(document.querySelectorAll('.domain-select:checked')).map(input => parseInt(input.value));
+    }
+    
+    function updateBatchToolbar() {
+        const count = selectedDomainIds().length;
+        batchSelectedCount.textContent = count;
+        batchToolbar.classList.toggle('d-none', count === 0);
+        batchToolbar.classList.toggle('d-flex', count > 0);
+    }
+    
+    document.addEventListener('change', function(e) {
+        if (e.target.classList.contains('domain-select')) {
+            updateBatchToolbar();
+        }
+    });
+    
+    document.getElementById('batchSelectAll').addEventListener('click', function() {
+        document.querySelectorAll('.domain-select').forEach(input => { input.checked = true; });
+        updateBatchToolbar();
+    });
+    
+    document.getElementById('batchClear').addEventListener('click', function() {
+        document.querySelectorAll('.domain-select').forEach(input => { input.checked = false; });
+        updateBatchToolbar();
+    });
+    
+    batchToolbar.addEventListener('click', function(e) {
+        const button = e.target.closest('[data-batch-action]');
+        if (!button) return;
+        const action = batchActions[button.getAttribute('data-batch-action')];
+        const ids = selectedDomainIds();
+        if (!ids.length || !confirm(action.confirm.replace('{n}', ids.length))) return;
+        
+        fetch(action.url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ids: ids })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                alert('操作失败: ' + data.message);
+                return;
+            }
+            const failures = data.results.filter(result => !result.success)
+                .map(result => `${result.name || result.id}: ${result.message}`);
+            alert(data.message + (failures.length ? '\n\n' + failures.join('\n') : ''));
+            window.location.reload();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('操作失败，请重试');
+        });
+    });
+    
     // 计算新的到期日期函数
     function calculateNewExpirationDate(currentDate, renewalPeriod) {
         const current = new Date(currentDate);
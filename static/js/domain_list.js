@@ -0,0 +1,116 @@
+// 域名列表分页加载（首页和仪表盘共用）
+document.addEventListener('DOMContentLoaded', function() {
+    const domainList = document.getElementById('domain-list');
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    const statusFilter = document.getElementById('statusFilter');
+    const prefixFilter = document.getElementById('prefixFilter');
+    if (!domainList || !loadMoreBtn) {
+        return;
+    }
+
+    let nextCursor = domainList.getAttribute('data-next-cursor') || '';
+    let loading = false;
+    let requestSeq = 0;
+
+    // 加载一页域名，reset为true时按当前筛选条件从第一页重新加载
+    function loadPage(reset) {
+        if (loading && !reset) {
+            return;
+        }
+        if (!reset && !nextCursor) {
+            return;
+        }
+
+        const params = new URLSearchParams({scope: domainList.getAttribute('data-scope') || 'all'});
+        if (statusFilter && statusFilter.value) {
+            params.set('status', statusFilter.value);
+        }
+        if (prefixFilter && prefixFilter.value.trim()) {
+            params.set('prefix', prefixFilter.value.trim());
+        }
+        if (!reset) {
+            params.set('cursor', nextCursor);
+        }
+
+        // 筛选条件变化时丢弃之前还未返回的请求结果
+        const seq = ++requestSeq;
+        loading = true;
+        loadMoreBtn.disabled = true;
+
+        fetch(`/domain_list?${params.toString()}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('网络响应不正常');
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (seq !== requestSeq) {
+                return;
+            }
+            if (!data.success) {
+                alert('加载域名列表失败: ' + data.message);
+                return;
+            }
+
+            const fragment = document.createElement('div');
+            fragment.innerHTML = data.html;
+            if (reset) {
+                domainList.innerHTML = '';
+            }
+            while (fragment.firstChild) {
+                domainList.appendChild(fragment.firstChild);
+            }
+            initProgressCircles(domainList);
+
+            nextCursor = data.next_cursor || '';
+            loadMoreBtn.classList.toggle('d-none', !nextCursor);
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('加载域名列表失败，请重试');
+        })
+        .finally(() => {
+            if (seq === requestSeq) {
+                loading = false;
+                loadMoreBtn.disabled = false;
+            }
+        });
+    }
+
+    loadMoreBtn.addEventListener('click', function() {
+        loadPage(false);
+    });
+
+    // 滚动到底部时自动加载下一页
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadPage(false);
+            }
+        }, {rootMargin: '200px'});
+        observer.observe(loadMoreBtn);
+    }
+
+    if (statusFilter) {
+        statusFilter.addEventListener('change', function() {
+            loadPage(true);
+        });
+        // 点击状态汇总卡片按该状态筛选
+        document.querySelectorAll('#domain-summary [data-status]').forEach(card => {
+            card.addEventListener('click', function() {
+                statusFilter.value = this.dataset.status;
+                loadPage(true);
+            });
+        });
+    }
+
+    // 输入前缀时稍作延迟再查询，避免每个按键都发请求
+    if (prefixFilter) {
+        let timer = null;
+        prefixFilter.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(() => loadPage(true), 300);
+        });
+    }
+});
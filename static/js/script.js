@@ -54,10 +54,9 @@ function initNavbar() {
     });
 }
 
-// 通用功能初始化
-function initCommonFeatures() {
-    // 初始化进度圈
-    const progressCircles = document.querySelectorAll('.progress-circle');
+// 初始化进度圈（分页加载的新卡片也需要调用）
+function initProgressCircles(root) {
+    const progressCircles = (root || document).querySelectorAll('.progress-circle');
     progressCircles.forEach(circle => {
         const percent = circle.getAttribute('data-percent');
         const status = circle.getAttribute('data-status');
@@ -82,22 +81,29 @@ function initCommonFeatures() {
             circle.style.setProperty('--status-color', statusColor);
         }
     });
+}
 
-    // 处理详情切换按钮
-    const toggleButtons = document.querySelectorAll('.details-toggle');
-    toggleButtons.forEach(button => {
-        button.addEventListener('click', function() {
-            const icon = this.querySelector('i');
-            if (icon) {
-                if (icon.classList.contains('bi-chevron-down')) {
-                    icon.classList.replace('bi-chevron-down', 'bi-chevron-up');
-                    this.innerHTML = '隐藏详细信息 <i class="bi bi-chevron-up"></i>';
-                } else {
-                    icon.classList.replace('bi-chevron-up', 'bi-chevron-down');
-                    this.innerHTML = '显示详细信息 <i class="bi bi-chevron-down"></i>';
-                }
+// 通用功能初始化
+function initCommonFeatures() {
+    // 初始化进度圈
+    initProgressCircles(document);
+
+    // 处理详情切换按钮 - 使用事件委托，分页加载的卡片也能工作
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('.details-toggle');
+        if (!button) {
+            return;
+        }
+        const icon = button.querySelector('i');
+        if (icon) {
+            if (icon.classList.contains('bi-chevron-down')) {
+                icon.classList.replace('bi-chevron-down', 'bi-chevron-up');
+                button.innerHTML = '隐藏详细信息 <i class="bi bi-chevron-up"></i>';
+            } else {
+                icon.classList.replace('bi-chevron-up', 'bi-chevron-down');
+                button.innerHTML = '显示详细信息 <i class="bi bi-chevron-down"></i>';
             }
-        });
+        }
     });
 }
 
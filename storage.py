@@ -0,0 +1,98 @@
+"""
+数据库存储配置
+数据库地址从环境变量 DATABASE_URL 读取，默认使用 SQLite 文件，也可以是任何 SQLAlchemy 支持的数据库（如 PostgreSQL、MySQL）。
+SQLite 在每个连接建立时开启 WAL 并设置忙等待、同步级别、内存映射和页缓存，
+让调度线程、发送线程和网页请求的读写不再互相阻塞；服务器数据库使用连接池参数
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_DATABASE_URL = 'sqlite:///domain.db'
+
+
+def _env_int(environ, key, default):
+    value = environ.get(key)
+    return int(value) if value not in (None, '') else default
+
+
+def database_url(environ=os.environ):
+    """读取数据库地址，兼容 postgres:// 写法"""
+    url = environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def sqlite_pragmas(environ=os.environ):
+    """每个SQLite连接建立时执行的PRAGMA（按顺序）
+
+    journal_mode=WAL: 读不阻塞写、写不阻塞读，同一时刻仍只有一个写事务
+    busy_timeout: 遇到写锁时等待的毫秒数，而不是立即报 database is locked
+    synchronous=NORMAL: WAL 模式下只在检查点时 fsync，断电可能丢失最后的事务但不会损坏数据库
+    mmap_size / cache_size: 内存映射读取的字节数和页缓存大小（负数为KiB）
+    """
+    return [
+        ('journal_mode', environ.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('busy_timeout', _env_int(environ, 'SQLITE_BUSY_TIMEOUT', 5000)),
+        ('synchronous', environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('mmap_size', _env_int(environ, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        ('cache_size', _env_int(environ, 'SQLITE_CACHE_SIZE', -20000)),
+    ]
+
+
+def engine_options(url, environ=os.environ):
+    """SQLAlchemy create_engine 参数
+
+    SQLite 使用 SQLAlchemy 的默认连接池；服务器数据库按环境变量设置连接池大小，
+    并在取出连接前探测，避免使用已被服务器关闭的连接
+    """
+    if is_sqlite(url):
+        return {}
+    return {
+        'pool_size': _env_int(environ, 'DB_POOL_SIZE', 5),
+        'max_overflow': _env_int(environ, 'DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int(environ, 'DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int(environ, 'DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_storage(app, environ=os.environ):
+    """把数据库地址和连接参数写入 Flask 配置（在创建 SQLAlchemy 实例之前调用）"""
+    url = database_url(environ)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url, environ)
+    app.config['SQLITE_PRAGMAS'] = sqlite_pragmas(environ) if is_sqlite(url) else []
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """在引擎的每个新连接上执行PRAGMA，非SQLite引擎不做任何事"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def init_storage(app, db):
+    """为已创建的 SQLAlchemy 实例安装连接设置"""
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS'))
+
+
+def database_ready(db):
+    """数据库中是否已经建好表（用于判断首次运行）"""
+    return db.inspect(db.engine).has_table('domain')
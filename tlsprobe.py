@@ -0,0 +1,117 @@
+"""
+HTTPS证书到期检查模块
+用固定大小的线程池并发连接每个域名的443端口完成TLS握手，读取叶子证书的 notAfter。
+握手时不校验证书链，这样已过期或自签名的证书也能读到到期时间
+"""
+
+import socket
+import ssl
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# 单个域名的检查结果，失败时 not_after 为空、error 不为空
+CertResult = namedtuple('CertResult', ['name', 'not_after', 'error'])
+
+
+def _read_tlv(data, offset):
+    """读取一个DER元素，返回 (标签, 内容起始偏移, 内容结束偏移)"""
+    tag = data[offset]
+    length = data[offset + 1]
+    start = offset + 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[start:start + size], 'big')
+        start += size
+    return tag, start, start + length
+
+
+def _parse_asn1_time(tag, value):
+    text = value.decode('ascii').rstrip('Z')
+    if tag == 0x17:
+        # UTCTime: YYMMDDHHMMSS，50 以下为 20xx 年
+        year = int(text[:2])
+        text = str(2000 + year if year < 50 else 1900 + year) + text[2:]
+    return datetime.strptime(text[:14], '%Y%m%d%H%M%S')
+
+
+def parse_certificate_not_after(der):
+    """从DER编码的X.509证书中取出 notAfter（naive UTC datetime）"""
+    _, cert_start, _ = _read_tlv(der, 0)
+    _, offset, _ = _read_tlv(der, cert_start)  # tbsCertificate
+    tag, _, end = _read_tlv(der, offset)
+    if tag == 0xA0:
+        # 可选的 version 字段
+        offset = end
+    for _ in range(3):
+        # serialNumber, signature, issuer
+        _, _, offset = _read_tlv(der, offset)
+    _, validity_start, _ = _read_tlv(der, offset)
+    _, _, not_before_end = _read_tlv(der, validity_start)
+    tag, start, end = _read_tlv(der, not_before_end)
+    return _parse_asn1_time(tag, der[start:end])
+
+
+def parse_address(value, default_port=443):
+    """把 "host" 或 "host:port" 解析为 (host, port)"""
+    host, _, port = value.rpartition(':') if value.count(':') == 1 else (value, '', '')
+    return host, int(port) if port else default_port
+
+
+def fetch_leaf_certificate(name, address, timeout=5.0):
+    """连接 address 完成TLS握手（SNI为域名），返回叶子证书的DER编码"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    with socket.create_connection(address, timeout=timeout) as sock:
+        with context.wrap_socket(sock, server_hostname=name) as tls:
+            return tls.getpeercert(binary_form=True)
+
+
+class TLSProber:
+    """并发检查一组域名的HTTPS证书到期时间
+
+    Args:
+        port: 连接的端口
+        workers: 同时进行的握手数
+        timeout: 连接和握手的超时秒数
+        address: 固定的连接地址 (host, port)，设置后所有域名都连接到这里，仍以域名作为SNI（用于本地测试）
+    """
+
+    def __init__(self, port=443, workers=32, timeout=5.0, address=None):
+        self.port = port
+        self.workers = workers
+        self.timeout = timeout
+        self.address = address
+
+    def probe(self, name):
+        try:
+            address = self.address or (name.encode('idna').decode('ascii'), self.port)
+            der = fetch_leaf_certificate(name, address, self.timeout)
+            if not der:
+                return CertResult(name, None, '服务器未提供证书')
+            return CertResult(name, parse_certificate_not_after(der), None)
+        except socket.timeout:
+            return CertResult(name, None, '连接超时')
+        except (OSError, ssl.SSLError, UnicodeError, ValueError, IndexError) as e:
+            return CertResult(name, None, str(e) or type(e).__name__)
+
+    def probe_all(self, names):
+        """并发检查一组域名
+
+        Returns:
+            tuple: ({域名: CertResult}, 统计信息)
+        """
+        names = list(dict.fromkeys(name.strip().lower() for name in names if name and name.strip()))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = dict(zip(names, executor.map(self.probe, names)))
+        elapsed = time.perf_counter() - start
+        stats = {
+            'probes': len(names),
+            'failed': sum(1 for result in results.values() if result.error),
+            'elapsed': elapsed,
+            'probes_per_second': len(names) / elapsed if elapsed > 0 else 0.0,
+        }
+        return results, stats
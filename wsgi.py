@@ -0,0 +1,9 @@
+"""
+WSGI 入口
+运行方式: gunicorn wsgi:app
+多个 Web 进程时建议设置 SCHEDULER_ENABLED=false，并另外运行一个 python app.py worker 进程执行定时任务
+"""
+
+from app import create_app
+
+app = create_app('web')